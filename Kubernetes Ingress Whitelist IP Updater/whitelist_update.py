@@ -7,7 +7,9 @@ for different environments. It allows adding specific IP addresses to the whitel
 while preserving the existing configuration and formatting.
 
 Usage:
-    ./whitelist_update.py --env [dev|stage|preprod|prod] [--files file1.yaml,file2.yaml]
+    ./whitelist_update.py --env [dev|stage|preprod|prod ...] [--files file1.yaml,file2.yaml]
+    ./whitelist_update.py --all-envs [--files file1.yaml,file2.yaml] [--workers N]
+    ./whitelist_update.py --plan|--apply desired.json [--env ...] [--patch-output FILE]
 
 Examples:
     # Update all default files in DEV environment
@@ -16,6 +18,25 @@ Examples:
     # Update specific files in PROD environment
     ./whitelist_update.py --env prod --files "your-ingress-frontend.yaml,your-ingress-price-api-service.yaml"
 
+    # Update default files in every environment in one run
+    ./whitelist_update.py --all-envs
+
+    # Update PREPROD and PROD together
+    ./whitelist_update.py --env preprod prod
+
+    # Find every ingress carrying the annotation instead of using DEFAULT_FILES
+    ./whitelist_update.py --all-envs --discover
+
+    # Update and rewrite the whitelist in collapsed form
+    ./whitelist_update.py --env dev --normalize
+
+    # Preview and apply add/remove/replace changes from a desired-state file
+    ./whitelist_update.py --plan desired.json --discover
+    ./whitelist_update.py --apply desired.json --discover
+
+    # Emit kustomize patches instead of rewriting files
+    ./whitelist_update.py --plan desired.json --discover --patch-output patches.json
+
 Environment Configurations:
     - dev: Development environment (includes Dev and Sandbox IPs)
     - stage: Staging/QA environment
@@ -24,17 +45,26 @@ Environment Configurations:
 
 The script will:
 1. Validate the environment and target files
-2. Check for existing IP addresses to avoid duplicates
+2. Check for existing IP addresses and covering CIDR ranges to avoid duplicates
 3. Update the whitelist while preserving file formatting
-4. Provide detailed output of changes made
+4. Write changed files atomically (temp file + fsync + rename), processing
+   files concurrently and leaving unchanged files untouched
+5. Provide detailed output of changes made
 
 Author: ASKoshelenko
-Version: 1.0.0
+Version: 1.1.0
 """
 
 import os
+import sys
+import json
+import hashlib
 import argparse
-from typing import List, Dict, Optional
+import tempfile
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from ipaddress import collapse_addresses, ip_network
+from typing import Any, Callable, List, Dict, Optional, TextIO, Tuple
 
 # Environment configuration with paths and corresponding IPs
 ENV_CONFIG: Dict[str, Dict[str, any]] = {
@@ -82,14 +112,166 @@ DEFAULT_FILES: List[str] = [
     'your-ingress-tax-service.yaml'
 ]
 
-def update_whitelist(file_path: str, new_ips: List[str], ip_descriptions: Dict[str, str]) -> bool:
+# Annotation updated by this script, and all annotations tracked by the discovery index
+WHITELIST_ANNOTATION: str = 'nginx.ingress.kubernetes.io/whitelist-source-range'
+INDEXED_ANNOTATIONS: Tuple[str, ...] = (
+    WHITELIST_ANNOTATION,
+    'nginx.ingress.kubernetes.io/allowlist-source-range',
+)
+
+# Discovery indexes live in the user cache directory, one per environment path,
+# so they never end up in the manifest (GitOps) repository
+INDEX_CACHE_DIR: str = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                    'whitelist_update')
+INDEX_VERSION: int = 1
+
+# Number of files processed concurrently
+DEFAULT_WORKERS: int = 8
+
+def atomic_write(file_path: str, content: str) -> None:
+    """
+    Atomically replace a file's content.
+
+    The content is written to a temporary file in the same directory, flushed and
+    fsynced, then renamed over the original. A crash at any point leaves either the
+    old or the new file, never a truncated one. The original permissions are kept.
+
+    Args:
+        file_path (str): Path of the file to replace
+        content (str): New file content
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        if os.path.exists(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    # Persist the rename itself
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+class WhitelistIndex:
+    """
+    Interval index over the entries of a whitelist annotation.
+
+    Entries are parsed as networks and collapsed per address family into sorted,
+    non-overlapping blocks. Whether an IP or CIDR is already covered is then a
+    single binary search, O(log n), regardless of how the entries are written
+    (`1.1.1.1` is covered by `1.1.1.0/24`, surrounding spaces are ignored).
+
+    Example:
+        >>> index = WhitelistIndex(['1.1.1.0/24', ' 2.2.2.2'])
+        >>> index.covering('1.1.1.1')
+        '1.1.1.0/24'
+    """
+
+    def __init__(self, entries: List[str]):
+        self.invalid: List[str] = []
+        networks = []
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                networks.append(ip_network(entry, strict=False))
+            except ValueError:
+                self.invalid.append(entry)
+        self._build(networks)
+
+    def _build(self, networks) -> None:
+        self.networks = {
+            version: list(collapse_addresses(n for n in networks if n.version == version))
+            for version in (4, 6)
+        }
+        self._starts = {
+            version: [int(n.network_address) for n in nets]
+            for version, nets in self.networks.items()
+        }
+
+    def covering(self, ip: str) -> Optional[str]:
+        """Return the whitelisted block covering `ip`, or None if it is not covered."""
+        network = ip_network(ip.strip(), strict=False)
+        starts = self._starts[network.version]
+        pos = bisect_right(starts, int(network.network_address)) - 1
+        if pos >= 0:
+            block = self.networks[network.version][pos]
+            if int(block.broadcast_address) >= int(network.broadcast_address):
+                return format_network(block)
+        return None
+
+    def add(self, ip: str) -> None:
+        """
+        Add an IP or CIDR to the index, keeping it collapsed.
+
+        Blocks inside the new one are dropped and sibling blocks are merged into
+        their supernet, so only the neighbourhood of the insertion point is touched.
+        """
+        network = ip_network(ip.strip(), strict=False)
+        if self.covering(str(network)) is not None:
+            return
+        nets = self.networks[network.version]
+        starts = self._starts[network.version]
+
+        pos = bisect_right(starts, int(network.network_address))
+        if pos > 0 and nets[pos - 1].subnet_of(network):
+            pos -= 1
+        end = pos
+        while end < len(nets) and nets[end].subnet_of(network):
+            end += 1
+        del nets[pos:end]
+        del starts[pos:end]
+
+        while network.prefixlen > 0:
+            parent = network.supernet()
+            if pos > 0 and nets[pos - 1].prefixlen == network.prefixlen and nets[pos - 1].supernet() == parent:
+                pos -= 1
+            elif not (pos < len(nets) and nets[pos].prefixlen == network.prefixlen and nets[pos].supernet() == parent):
+                break
+            del nets[pos]
+            del starts[pos]
+            network = parent
+
+        nets.insert(pos, network)
+        starts.insert(pos, int(network.network_address))
+
+    def normalized(self) -> List[str]:
+        """Return the collapsed entries, IPv4 first, followed by unparseable entries unchanged."""
+        return [format_network(n) for n in self.networks[4] + self.networks[6]] + self.invalid
+
+def format_network(network) -> str:
+    """Format a network the way whitelists are usually written: single hosts without a prefix."""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+def update_whitelist(file_path: str, new_ips: List[str], ip_descriptions: Dict[str, str],
+                     log: Callable[[str], None] = print, normalize: bool = False) -> bool:
     """
     Update the whitelist-source-range in a Kubernetes ingress configuration file.
 
+    Existing entries are loaded into a WhitelistIndex, so an IP already covered by
+    a whitelisted range is not added again. With normalize=True the annotation is
+    rewritten in collapsed, sorted form. The file is only rewritten when its content
+    actually changes, and the write is atomic (see atomic_write).
+
     Args:
         file_path (str): Path to the ingress YAML file
         new_ips (List[str]): List of IP addresses to add to the whitelist
         ip_descriptions (Dict[str, str]): Descriptions for the IP addresses
+        log (Callable[[str], None]): Output function, print by default
+        normalize (bool): Rewrite the annotation as collapsed, sorted ranges
 
     Returns:
         bool: True if update was successful, False otherwise
@@ -106,111 +288,665 @@ def update_whitelist(file_path: str, new_ips: List[str], ip_descriptions: Dict[s
         modified = False
         # Process each line
         for i, line in enumerate(lines):
-            if 'nginx.ingress.kubernetes.io/whitelist-source-range' in line:
+            if WHITELIST_ANNOTATION in line:
                 # Extract current IPs
                 start = line.find('"') + 1
                 end = line.rfind('"')
                 if start > 0 and end > 0:
-                    current_ips = line[start:end].split(',')
+                    # Raw entries, empty ones included: only --normalize rewrites them
+                    current_ips = line[start:end].split(',') if line[start:end] else []
+                    index = WhitelistIndex(current_ips)
                     
-                    # Add new IPs if they don't exist
+                    # Add new IPs unless an existing entry already covers them
                     added = []
                     for new_ip in new_ips:
-                        if new_ip not in current_ips:
-                            current_ips.append(new_ip)
+                        try:
+                            covered_by = index.covering(new_ip)
+                        except ValueError:
+                            log(f"Skipping invalid IP: {new_ip}")
+                            continue
+                        if covered_by is None:
+                            if current_ips and not current_ips[-1].strip():
+                                # Fill a trailing comma instead of doubling it
+                                current_ips[-1] = new_ip
+                            else:
+                                current_ips.append(new_ip)
+                            index.add(new_ip)
                             added.append(new_ip)
-                            modified = True
+                        elif covered_by != new_ip.strip():
+                            log(f"IP {new_ip} already covered by {covered_by}")
                     
-                    if added:
-                        # Preserve line formatting
-                        prefix = line[:start]
-                        suffix = line[end:]
-                        
-                        # Update the line
-                        new_line = prefix + ','.join(current_ips) + suffix
+                    if normalize:
+                        current_ips = index.normalized()
+                    
+                    # Preserve line formatting
+                    prefix = line[:start]
+                    suffix = line[end:]
+                    new_line = prefix + ','.join(current_ips) + suffix
+                    
+                    if new_line != line:
                         lines[i] = new_line
-                        
+                        modified = True
+                        if normalize:
+                            log(f"Normalized whitelist: {','.join(current_ips)}")
+                    
+                    if added:
                         # Print added IPs with descriptions
                         for ip in added:
                             desc = ip_descriptions.get(ip, 'No description')
-                            print(f"Added IP: {ip} ({desc})")
+                            log(f"Added IP: {ip} ({desc})")
                     else:
-                        print("All IPs already present")
+                        log("All IPs already present")
 
         # Write updates back to file
         if modified:
-            with open(file_path, 'w') as file:
-                file.writelines(lines)
+            atomic_write(file_path, ''.join(lines))
 
     except Exception as e:
-        print(f"Error processing {file_path}: {str(e)}")
+        log(f"Error processing {file_path}: {str(e)}")
         return False
 
     return True
 
+def scan_annotations(file_path: str) -> List[str]:
+    """
+    Return the indexed annotations carried by any document of a YAML file.
+
+    Works line by line, so multi-document files are handled naturally and
+    commented-out annotations are ignored.
+
+    Args:
+        file_path (str): Path to the YAML file
+
+    Returns:
+        List[str]: Annotation keys found, in INDEXED_ANNOTATIONS order
+    """
+    found = set()
+    with open(file_path, 'r', errors='replace') as file:
+        for line in file:
+            stripped = line.lstrip().lstrip('"\'')
+            if stripped.startswith('#'):
+                continue
+            for annotation in INDEXED_ANNOTATIONS:
+                if stripped.startswith(annotation):
+                    found.add(annotation)
+    return [annotation for annotation in INDEXED_ANNOTATIONS if annotation in found]
+
+def default_index_path(env_path: str) -> str:
+    """Location of the discovery index of an environment path, keyed by its absolute path."""
+    abs_path = os.path.abspath(env_path)
+    key = hashlib.sha256(abs_path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(INDEX_CACHE_DIR, f"{os.path.basename(abs_path) or 'root'}-{key}.json")
+
+def discover_files(env_path: str, index_path: Optional[str] = None, rescan: bool = False,
+                   annotation: str = WHITELIST_ANNOTATION) -> List[str]:
+    """
+    Find all YAML files under an environment path that carry an annotation.
+
+    A persistent index remembers every directory (mtime and listing) and every
+    YAML file (mtime, size and annotations found). On later runs a directory whose
+    mtime did not change is not listed again, and a file whose mtime and size did
+    not change is not read again, so only new or modified files are scanned.
+
+    Args:
+        env_path (str): Root directory of the environment
+        index_path (Optional[str]): Index location, default_index_path(env_path) by default
+        rescan (bool): Ignore the existing index and scan everything
+        annotation (str): Annotation the returned files must carry
+
+    Returns:
+        List[str]: Sorted file paths relative to env_path
+    """
+    index_path = index_path or default_index_path(env_path)
+    old_index = {'version': INDEX_VERSION, 'dirs': {}, 'files': {}}
+    if not rescan and os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                loaded = json.load(f)
+            if loaded.get('version') == INDEX_VERSION:
+                old_index = loaded
+        except (OSError, ValueError):
+            pass
+
+    new_index = {'version': INDEX_VERSION, 'dirs': {}, 'files': {}}
+    stack = ['.']
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = os.path.normpath(os.path.join(env_path, rel_dir))
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            continue
+
+        cached = old_index['dirs'].get(rel_dir)
+        if cached and cached['mtime_ns'] == dir_mtime:
+            subdirs, files = cached['subdirs'], cached['files']
+        else:
+            subdirs, files = [], []
+            with os.scandir(abs_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.name.endswith(('.yaml', '.yml')):
+                        files.append(entry.name)
+        new_index['dirs'][rel_dir] = {'mtime_ns': dir_mtime, 'subdirs': subdirs, 'files': files}
+
+        for name in files:
+            rel_file = os.path.normpath(os.path.join(rel_dir, name))
+            try:
+                stat = os.stat(os.path.join(env_path, rel_file))
+            except OSError:
+                continue
+            entry = old_index['files'].get(rel_file)
+            if not entry or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                entry = {
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'annotations': scan_annotations(os.path.join(env_path, rel_file)),
+                }
+            new_index['files'][rel_file] = entry
+
+        stack.extend(os.path.normpath(os.path.join(rel_dir, d)) for d in subdirs)
+
+    if new_index != old_index:
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        atomic_write(index_path, json.dumps(new_index, indent=1, sort_keys=True))
+
+    return sorted(path for path, entry in new_index['files'].items() if annotation in entry['annotations'])
+
+def process_file(env: str, file_name: str, normalize: bool = False) -> Tuple[bool, List[str]]:
+    """
+    Update one file of an environment, collecting its output instead of printing it.
+
+    Used by the worker pool so that output of concurrently processed files
+    does not interleave.
+
+    Args:
+        env (str): Environment key in ENV_CONFIG
+        file_name (str): File name relative to the environment path
+        normalize (bool): Rewrite the annotation in collapsed form
+
+    Returns:
+        Tuple[bool, List[str]]: Success flag and the output lines for this file
+    """
+    env_config = ENV_CONFIG[env]
+    file_path = os.path.join(env_config['path'], file_name)
+    output: List[str] = []
+
+    if not os.path.exists(file_path):
+        output.append(f"× File not found: {file_path}")
+        return False, output
+
+    output.append(f"\nProcessing [{env.upper()}]: {file_name}")
+    success = update_whitelist(file_path, env_config['ips'], env_config['description'],
+                               log=output.append, normalize=normalize)
+    if success:
+        output.append(f"✓ Successfully updated {file_name}")
+    return success, output
+
+def load_desired_state(state_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a desired-state file describing whitelist changes per environment.
+
+    The file is JSON, keyed by environment:
+
+        {
+            "prod": {
+                "add": ["5.5.5.5"],
+                "remove": ["1.1.1.1"],
+                "replace": {"0.0.0.0": "6.6.6.6"},
+                "description": {"5.5.5.5": "New VPN"}
+            }
+        }
+
+    Args:
+        state_path (str): Path to the desired-state JSON file
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Changes per environment, with all keys present
+
+    Raises:
+        ValueError: If an environment, an IP address or the type of a value is invalid
+    """
+    with open(state_path, 'r') as f:
+        raw = json.load(f)
+
+    def strings(value: Any, where: str) -> List[str]:
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{where} must be a list of strings")
+        return list(value)
+
+    def string_map(value: Any, where: str) -> Dict[str, str]:
+        if not isinstance(value, dict) or not all(isinstance(item, str) for item in value.values()):
+            raise ValueError(f"{where} must be an object with string values")
+        return dict(value)
+
+    if not isinstance(raw, dict):
+        raise ValueError(f"{state_path} must hold an object keyed by environment")
+    state = {}
+    for env, changes in raw.items():
+        if env not in ENV_CONFIG:
+            raise ValueError(f"Unknown environment in {state_path}: {env}")
+        if not isinstance(changes, dict):
+            raise ValueError(f"Changes of {env} must be an object")
+        state[env] = {
+            'add': strings(changes.get('add', []), f"{env}.add"),
+            'remove': strings(changes.get('remove', []), f"{env}.remove"),
+            'replace': string_map(changes.get('replace', {}), f"{env}.replace"),
+            'description': string_map(changes.get('description', {}), f"{env}.description"),
+        }
+        replace = state[env]['replace']
+        for ip in state[env]['add'] + state[env]['remove'] + list(replace) + list(replace.values()):
+            ip_network(ip.strip(), strict=False)
+    return state
+
+def apply_changes(entries: List[str], changes: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Apply remove/replace/add changes to the entries of one whitelist annotation.
+
+    Entries are compared as networks, so formatting differences do not matter.
+    Replacements keep the position of the replaced entry; replacements and additions
+    already covered by an existing range are skipped (a replaced entry whose
+    replacement is covered is only removed).
+
+    Args:
+        entries (List[str]): Current annotation entries
+        changes (Dict[str, Any]): One environment of the desired state
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]: New entries, added entries, removed entries
+    """
+    def key(entry: str):
+        try:
+            return ip_network(entry.strip(), strict=False)
+        except ValueError:
+            return entry.strip()
+
+    remove = {key(ip) for ip in changes['remove']}
+    replace = {key(old): new for old, new in changes['replace'].items()}
+    result, added, removed = [], [], []
+
+    index = WhitelistIndex([entry for entry in entries if key(entry) not in remove and key(entry) not in replace])
+    for entry in entries:
+        entry_key = key(entry)
+        if entry_key in remove:
+            removed.append(entry.strip())
+        elif entry_key in replace:
+            removed.append(entry.strip())
+            if index.covering(replace[entry_key]) is None:
+                result.append(replace[entry_key])
+                index.add(replace[entry_key])
+                added.append(replace[entry_key])
+        else:
+            result.append(entry)
+
+    for ip in changes['add']:
+        if index.covering(ip) is None:
+            if result and not result[-1].strip():
+                result[-1] = ip
+            else:
+                result.append(ip)
+            index.add(ip)
+            added.append(ip)
+
+    return result, added, removed
+
+def plan_file(env: str, file_path: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the changes a desired state makes to one file, without writing anything.
+
+    Besides the new content, each changed annotation is reported with the document
+    it belongs to (index, apiVersion, kind, name, namespace), which is what a
+    kustomize/JSON patch needs to target it. The document fields are attached once
+    the whole file is scanned, so their order within the document does not matter.
+
+    Args:
+        env (str): Environment key
+        file_path (str): Path to the ingress YAML file
+        changes (Dict[str, Any]): One environment of the desired state
+
+    Returns:
+        Dict[str, Any]: Plan with 'env', 'file', 'changes', 'content' and 'error' keys
+    """
+    plan = {'env': env, 'file': file_path, 'changes': [], 'content': None, 'error': None}
+    try:
+        with open(file_path, 'r') as file:
+            lines = file.readlines()
+    except OSError as e:
+        plan['error'] = str(e)
+        return plan
+
+    document = {'index': 0, 'apiVersion': None, 'kind': None, 'name': None, 'namespace': None}
+    in_metadata = False
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if line.startswith('---'):
+            document = {'index': document['index'] + 1, 'apiVersion': None, 'kind': None,
+                        'name': None, 'namespace': None}
+            in_metadata = False
+            continue
+        if indent == 0 and ':' in stripped and not stripped.startswith('#'):
+            key, _, value = stripped.partition(':')
+            in_metadata = key == 'metadata'
+            if key in ('apiVersion', 'kind'):
+                document[key] = value.strip().strip('"\'')
+        elif in_metadata and indent > 0 and document.get('_child_indent', indent) == indent:
+            document['_child_indent'] = indent
+            key, _, value = stripped.partition(':')
+            if key in ('name', 'namespace'):
+                document[key] = value.strip().strip('"\'')
+
+        if WHITELIST_ANNOTATION not in line:
+            continue
+        start = line.find('"') + 1
+        end = line.rfind('"')
+        if start <= 0 or end <= 0:
+            continue
+        entries = line[start:end].split(',') if line[start:end] else []
+        new_entries, added, removed = apply_changes(entries, changes)
+        new_line = line[:start] + ','.join(new_entries) + line[end:]
+        if new_line != line:
+            lines[i] = new_line
+            plan['changes'].append({
+                'line': i + 1,
+                'document': document,
+                'old': line[start:end],
+                'new': ','.join(new_entries),
+                'added': added,
+                'removed': removed,
+            })
+
+    for change in plan['changes']:
+        change['document'] = {k: v for k, v in change['document'].items() if not k.startswith('_')}
+    if plan['changes']:
+        plan['content'] = ''.join(lines)
+    return plan
+
+def build_plan(state: Dict[str, Dict[str, Any]], target_files: Dict[str, List[str]],
+               workers: int = DEFAULT_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Plan all environments in one read-only, concurrent pass over the target files.
+
+    Args:
+        state (Dict[str, Dict[str, Any]]): Desired state per environment
+        target_files (Dict[str, List[str]]): Files per environment, relative to its path
+        workers (int): Number of files read concurrently
+
+    Returns:
+        List[Dict[str, Any]]: One plan per file, in environment and file order
+    """
+    tasks = [
+        (env, os.path.join(ENV_CONFIG[env]['path'], file_name))
+        for env in state for file_name in target_files.get(env, [])
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(lambda task: plan_file(task[0], task[1], state[task[0]]), tasks))
+
+def apply_plan(plans: List[Dict[str, Any]], workers: int = DEFAULT_WORKERS) -> Tuple[int, List[str]]:
+    """
+    Atomically write every file whose plan has changes.
+
+    A file that cannot be written does not stop the others; its error is returned.
+
+    Args:
+        plans (List[Dict[str, Any]]): Plans returned by build_plan
+        workers (int): Number of files written concurrently
+
+    Returns:
+        Tuple[int, List[str]]: Number of files written and the errors, one per failed file
+    """
+    def write(plan: Dict[str, Any]) -> Optional[str]:
+        try:
+            atomic_write(plan['file'], plan['content'])
+        except Exception as e:
+            return f"{plan['file']}: {e}"
+        return None
+
+    changed = [plan for plan in plans if plan['content'] is not None]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        errors = [error for error in executor.map(write, changed) if error]
+    return len(changed) - len(errors), errors
+
+def write_patches(plans: List[Dict[str, Any]], output_path: str) -> Tuple[int, List[str]]:
+    """
+    Write all planned changes as one kustomize `patches` document instead of editing files.
+
+    Each changed document becomes a JSON 6902 patch replacing the annotation,
+    targeted by group/version/kind/name/namespace. The output is JSON, which is
+    valid YAML, so it can be merged into a kustomization.yaml as is.
+
+    A change whose document has no kind or metadata.name gets no patch: without
+    them the target would match every resource of its kind. It is reported as
+    an error instead.
+
+    Args:
+        plans (List[Dict[str, Any]]): Plans returned by build_plan
+        output_path (str): File to write, '-' for stdout
+
+    Returns:
+        Tuple[int, List[str]]: Number of patches written and the changes left out
+    """
+    annotation_path = '/metadata/annotations/' + WHITELIST_ANNOTATION.replace('~', '~0').replace('/', '~1')
+    patches, errors = [], []
+    for plan in plans:
+        for change in plan['changes']:
+            document = change['document']
+            if not document['kind'] or not document['name']:
+                errors.append(f"{plan['file']} line {change['line']}: document {document['index']} "
+                              f"has no kind or metadata.name, no patch written")
+                continue
+            group, _, version = (document['apiVersion'] or '').rpartition('/')
+            target = {'group': group, 'version': version, 'kind': document['kind'], 'name': document['name']}
+            if document['namespace']:
+                target['namespace'] = document['namespace']
+            operations = [{'op': 'replace', 'path': annotation_path, 'value': change['new']}]
+            patches.append({'target': target, 'patch': json.dumps(operations)})
+
+    content = json.dumps({'patches': patches}, indent=2) + '\n'
+    if output_path == '-':
+        print(content, end='')
+    else:
+        atomic_write(output_path, content)
+    return len(patches), errors
+
+def print_plan(plans: List[Dict[str, Any]], state: Dict[str, Dict[str, Any]], stream: TextIO = sys.stdout) -> None:
+    """Print the planned changes per file."""
+    for plan in plans:
+        if plan['error']:
+            print(f"× {plan['file']}: {plan['error']}", file=stream)
+            continue
+        if not plan['changes']:
+            continue
+        print(f"\n~ [{plan['env'].upper()}] {plan['file']}", file=stream)
+        descriptions = {**ENV_CONFIG[plan['env']]['description'], **state[plan['env']]['description']}
+        for change in plan['changes']:
+            document = change['document']
+            target = f"{document['kind'] or '?'}/{document['name'] or '?'}"
+            print(f"  line {change['line']} ({target}):", file=stream)
+            for ip in change['removed']:
+                print(f"    - {ip} ({descriptions.get(ip, 'No description')})", file=stream)
+            for ip in change['added']:
+                print(f"    + {ip} ({descriptions.get(ip, 'No description')})", file=stream)
+
+def run_plan(args: argparse.Namespace, state: Dict[str, Dict[str, Any]],
+             target_files: Dict[str, List[str]]) -> int:
+    """
+    Handle --plan and --apply: one read-only planning pass, then optional output.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+        state (Dict[str, Dict[str, Any]]): Desired state for the selected environments
+        target_files (Dict[str, List[str]]): Files per environment
+
+    Returns:
+        int: Exit code, 1 if any file could not be planned, patched or written
+    """
+    # Keep stdout clean for the patch stream when it goes there
+    stream = sys.stderr if args.patch_output == '-' else sys.stdout
+    print("\n=== Whitelist Plan ===", file=stream)
+    plans = build_plan(state, target_files, args.workers)
+    print_plan(plans, state, stream)
+
+    changed = [plan for plan in plans if plan['content'] is not None]
+    print("\n=== Plan Summary ===", file=stream)
+    print(f"Files checked: {len(plans)}", file=stream)
+    print(f"Files to change: {len(changed)}", file=stream)
+    errors = sum(1 for plan in plans if plan['error'])
+    print(f"Errors: {errors}", file=stream)
+
+    failures: List[str] = []
+    if args.patch_output:
+        count, failures = write_patches(plans, args.patch_output)
+        if args.patch_output != '-':
+            print(f"Wrote {count} patches to {args.patch_output}")
+    elif args.apply:
+        written, failures = apply_plan(plans, args.workers)
+        print(f"Files written: {written}")
+    for failure in failures:
+        print(f"× {failure}", file=stream)
+    return 1 if errors or failures else 0
+
 def main():
     """
     Main function to handle command line arguments and orchestrate the update process.
     
     Parses command line arguments, validates input, and executes the whitelist update
-    for the specified environment and files.
+    for the selected environments and files. Files are processed concurrently.
     """
     parser = argparse.ArgumentParser(
         description='Update whitelist IPs in Kubernetes ingress configurations',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__
     )
-    parser.add_argument(
+    env_group = parser.add_mutually_exclusive_group()
+    env_group.add_argument(
         '--env',
-        required=True,
-        choices=['dev', 'stage', 'preprod', 'prod'],
-        help='Target environment for the update'
+        nargs='+',
+        choices=list(ENV_CONFIG.keys()),
+        help='Target environment(s) for the update'
+    )
+    env_group.add_argument(
+        '--all-envs',
+        action='store_true',
+        help='Update every environment defined in ENV_CONFIG'
     )
     parser.add_argument(
         '--files',
         help='Comma-separated list of files to process (optional, uses defaults if not specified)'
     )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        '--plan',
+        metavar='STATE_FILE',
+        help='Show the changes a desired-state file makes, without writing anything'
+    )
+    mode_group.add_argument(
+        '--apply',
+        metavar='STATE_FILE',
+        help='Apply a desired-state file (add/remove/replace), writing only changed files'
+    )
+    parser.add_argument(
+        '--patch-output',
+        metavar='FILE',
+        help="With --plan, write the changes as kustomize JSON patches to FILE ('-' for stdout)"
+    )
+    parser.add_argument(
+        '--discover',
+        action='store_true',
+        help='Process every file carrying the whitelist annotation under the environment path'
+    )
+    parser.add_argument(
+        '--rescan',
+        action='store_true',
+        help='With --discover, ignore the discovery index and scan the whole tree'
+    )
+    parser.add_argument(
+        '--normalize',
+        action='store_true',
+        help='Rewrite the whitelist as collapsed, sorted ranges (drops entries covered by others)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Number of files processed concurrently (default: {DEFAULT_WORKERS})'
+    )
     
     args = parser.parse_args()
+    if args.discover and args.files:
+        parser.error('--discover and --files cannot be combined')
+    if args.patch_output and not args.plan:
+        parser.error('--patch-output requires --plan')
+    if args.normalize and (args.plan or args.apply):
+        parser.error('--normalize cannot be combined with --plan or --apply')
     
-    # Get environment configuration
-    env_config = ENV_CONFIG[args.env]
-    env_path = env_config['path']
-    new_ips = env_config['ips']
-    ip_descriptions = env_config['description']
+    state_file = args.plan or args.apply
+    state = None
+    if state_file:
+        try:
+            state = load_desired_state(state_file)
+        except (OSError, ValueError) as e:
+            parser.error(f"Invalid desired-state file {state_file}: {e}")
     
-    # Determine target files
-    target_files = args.files.split(',') if args.files else DEFAULT_FILES
+    if args.all_envs:
+        envs = list(ENV_CONFIG.keys())
+    elif args.env:
+        envs = list(dict.fromkeys(args.env))
+    elif state is not None:
+        envs = list(state.keys())
+    else:
+        parser.error('one of the arguments --env --all-envs is required')
+    
+    # Determine target files per environment; a file listed twice would be written by two workers at once
+    files = list(dict.fromkeys(os.path.normpath(name) for name in args.files.split(','))) if args.files else DEFAULT_FILES
+    target_files: Dict[str, List[str]] = {}
+    for env in envs:
+        if args.discover:
+            env_path = ENV_CONFIG[env]['path']
+            target_files[env] = discover_files(env_path, rescan=args.rescan) if os.path.isdir(env_path) else []
+        else:
+            target_files[env] = files
+    
+    if state is not None:
+        sys.exit(run_plan(args, {env: state[env] for env in envs if env in state}, target_files))
     
     # Print execution summary
     print("\n=== Whitelist Update Configuration ===")
-    print(f"Environment: {args.env.upper()}")
-    print(f"Working directory: {env_path}")
-    print("\nTarget IPs:")
-    for ip in new_ips:
-        print(f"  • {ip} ({ip_descriptions[ip]})")
-    print("\nTarget files:")
-    for file in target_files:
-        print(f"  • {file}")
-    print("\n=== Starting Update Process ===")
+    for env in envs:
+        env_config = ENV_CONFIG[env]
+        print(f"Environment: {env.upper()}")
+        print(f"Working directory: {env_config['path']}")
+        print("Target IPs:")
+        for ip in env_config['ips']:
+            print(f"  • {ip} ({env_config['description'][ip]})")
+        print("Target files:")
+        for file in target_files[env]:
+            print(f"  • {file}")
+        print()
+    print("=== Starting Update Process ===")
     
-    # Process each file
-    success_count = 0
-    for file_name in target_files:
-        file_path = os.path.join(env_path, file_name)
-        if os.path.exists(file_path):
-            print(f"\nProcessing: {file_name}")
-            if update_whitelist(file_path, new_ips, ip_descriptions):
-                success_count += 1
-                print(f"✓ Successfully updated {file_name}")
-        else:
-            print(f"× File not found: {file_path}")
+    # Process all (environment, file) pairs concurrently; output is printed in order
+    tasks = [(env, file_name) for env in envs for file_name in target_files[env]]
+    success_count: Dict[str, int] = {env: 0 for env in envs}
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        results = executor.map(lambda task: process_file(*task, normalize=args.normalize), tasks)
+        for (env, _), (success, output) in zip(tasks, results):
+            for message in output:
+                print(message)
+            if success:
+                success_count[env] += 1
 
     # Print summary
     print("\n=== Update Summary ===")
-    print(f"Files processed: {len(target_files)}")
-    print(f"Successfully updated: {success_count}")
-    print(f"Failed/Skipped: {len(target_files) - success_count}")
+    for env in envs:
+        if len(envs) > 1:
+            print(f"[{env.upper()}]")
+        print(f"Files processed: {len(target_files[env])}")
+        print(f"Successfully updated: {success_count[env]}")
+        print(f"Failed/Skipped: {len(target_files[env]) - success_count[env]}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,62 @@
+"""
+Shared building blocks for the commercetools scripts.
+
+Modules:
+    config         Projects, credentials from the environment, .env loading and logging setup
+    token_cache    OAuth client-credentials tokens cached per (auth URL, client id, scopes)
+    session        Pooled HTTP session with retries, backoff, timeouts and request metrics
+    fetch          Offset (concurrent) and keyset (streaming) pagination of resource listings
+    classify       Columnar client table, classified into age buckets in a single pass
+    report         Text reports of unused clients, history reports and run summaries
+    checker        The unused clients check built from the stages above
+    snapshots      SQLite store of client inventories per run, with trend reports
+    metrics        Prometheus text format exporter (textfile or local HTTP endpoint)
+    daemon         Long-running scheduler with change probes and in-memory reports
+    cli            Command line entry points of the scripts
+
+Importing the package has no side effects and loads no submodule; the names
+below are imported on first access, e.g.:
+
+    >>> from commercetools_client import ClientTable, iter_resources
+"""
+
+import importlib
+from typing import List
+
+_EXPORTS = {
+    'PROJECTS': 'config',
+    'get_project_env': 'config',
+    'TokenCache': 'token_cache',
+    'get_default_cache': 'token_cache',
+    'configure_default_cache': 'token_cache',
+    'CommercetoolsSession': 'session',
+    'get_default_session': 'session',
+    'fetch_page': 'fetch',
+    'iter_resources': 'fetch',
+    'ClientTable': 'classify',
+    'Classification': 'classify',
+    'parse_thresholds': 'classify',
+    'format_report': 'report',
+    'generate_report': 'report',
+    'get_access_token': 'checker',
+    'get_all_api_clients': 'checker',
+    'identify_unused_clients': 'checker',
+    'process_project': 'checker',
+    'run_checks': 'checker',
+    'SnapshotStore': 'snapshots',
+    'MetricsRegistry': 'metrics',
+    'CheckDaemon': 'daemon',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
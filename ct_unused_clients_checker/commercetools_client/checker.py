@@ -0,0 +1,318 @@
+"""
+Unused API clients check: fetch, classify and report stages, and the runs built from them.
+
+This module is the library behind the command line entry points (see cli).
+It has no import-time side effects and imports the optional stages (snapshot
+store, metrics, daemon) only when they are used, so it can be embedded in
+other tools:
+
+    >>> from commercetools_client.checker import process_project
+    >>> result = process_project('PT_D2C_PRO_ESHOP_DEV', thresholds=(30, 90))
+    >>> result['unused']
+    {30: 12, 90: 7}
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from .classify import ClientTable
+from .config import (DAYS_THRESHOLD, DEFAULT_CHECK_INTERVAL, DEFAULT_CONCURRENCY, DEFAULT_LISTEN_PORT,
+                     DEFAULT_PAGINATION, PROJECTS, get_project_env)
+from .fetch import iter_resources
+from .report import format_report, generate_history_report, generate_report, generate_summary, report_filename
+from .session import get_default_session
+from .token_cache import get_default_cache
+
+T = TypeVar('T')
+
+def get_access_token(env: Dict[str, str]) -> str:
+    """
+    Obtain an access token from Commercetools API.
+
+    Tokens come from the shared token cache, so a new token is only requested
+    when none is cached for this client or the cached one is about to expire.
+
+    Args:
+        env (Dict[str, str]): Environment variables for the project.
+
+    Returns:
+        str: The access token.
+
+    Raises:
+        requests.exceptions.RequestException: If the token request fails.
+    """
+    return get_default_cache().get_token(
+        env['CTP_AUTH_URL'],
+        env['CTP_CLIENT_ID'],
+        env['CTP_CLIENT_SECRET'],
+        env['CTP_SCOPES']
+    )
+
+def with_token(env: Dict[str, str], call: Callable[[str], T], access_token: Optional[str] = None) -> T:
+    """
+    Call with an access token; on 401 (token revoked or expired early) retry once with a new one.
+
+    Args:
+        env (Dict[str, str]): Environment variables for the project.
+        call (Callable[[str], T]): Called with the token; must consume any lazy result itself,
+            so that a 401 raised while streaming is retried too.
+        access_token (Optional[str]): Token for the first attempt, from get_access_token by default.
+
+    Returns:
+        T: The result of the call.
+    """
+    try:
+        return call(access_token or get_access_token(env))
+    except Exception as e:
+        if getattr(getattr(e, 'response', None), 'status_code', None) != 401:
+            raise
+        logging.warning("Access token rejected with 401, requesting a new one")
+        get_default_cache().invalidate(env['CTP_AUTH_URL'], env['CTP_CLIENT_ID'], env['CTP_SCOPES'])
+        return call(get_access_token(env))
+
+def get_all_api_clients(access_token: str, env: Dict[str, str], concurrency: int = DEFAULT_CONCURRENCY,
+                        pagination: str = DEFAULT_PAGINATION) -> Iterable[Dict]:
+    """
+    Retrieve all API clients for a project from Commercetools.
+
+    With offset pagination the first page is requested with the maximum page size
+    and the total count, and the remaining pages are fetched concurrently. With
+    keyset pagination clients are streamed page by page in id order, keeping
+    memory constant for very large projects.
+
+    Args:
+        access_token (str): The access token for authentication.
+        env (Dict[str, str]): Environment variables for the project.
+        concurrency (int): Maximum number of pages fetched in parallel (offset pagination).
+        pagination (str): 'offset' or 'keyset'.
+
+    Returns:
+        Iterable[Dict]: A list (offset) or generator (keyset) of API client dictionaries.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    return iter_resources(env['CTP_API_URL'], env['CTP_PROJECT_KEY'], 'api-clients', access_token,
+                          pagination=pagination, concurrency=concurrency)
+
+def identify_unused_clients(clients: Iterable[Dict], days_threshold: int = DAYS_THRESHOLD) -> List[Dict]:
+    """
+    Identify API clients that haven't been used within the specified number of days.
+
+    Args:
+        clients (Iterable[Dict]): API clients to check, consumed in a single pass.
+        days_threshold (int): Number of days for the usage threshold.
+
+    Returns:
+        List[Dict]: List of unused clients.
+    """
+    unused_clients = ClientTable.from_clients(clients).classify((days_threshold,)).unused(days_threshold)
+    logging.info(f"Identified {len(unused_clients)} unused API clients")
+    return unused_clients
+
+def process_project(project: str, concurrency: int = DEFAULT_CONCURRENCY, pagination: str = DEFAULT_PAGINATION,
+                    store=None, thresholds: Sequence[int] = (DAYS_THRESHOLD,)) -> Dict:
+    """
+    Process a single project to identify unused API clients.
+
+    Errors are caught and returned in the result, so a failing project never
+    affects the others when projects run concurrently.
+
+    Args:
+        project (str): The project identifier.
+        concurrency (int): Maximum number of pages fetched in parallel.
+        pagination (str): 'offset' or 'keyset'.
+        store (Optional[SnapshotStore]): If given, the inventory is stored and a history report generated.
+        thresholds (Sequence[int]): Day thresholds; one report is generated per threshold.
+
+    Returns:
+        Dict: Project result with status, client count, unused count per threshold,
+        age buckets, report files, error and durations (total, token, fetch).
+    """
+    from requests.exceptions import RequestException
+
+    started = time.perf_counter()
+    result = {'project': project, 'project_key': None, 'status': 'error', 'clients': None, 'unused': None,
+              'buckets': None, 'reports': None, 'error': None, 'duration': 0.0,
+              'token_seconds': None, 'fetch_seconds': None}
+    try:
+        logging.info(f"Starting Commercetools API client check process for project: {project}")
+        
+        env = get_project_env(project)
+        if not env:
+            logging.warning(f"Skipping project {project}: Missing or incomplete environment variables")
+            result['status'] = 'skipped'
+            return result
+        
+        result['project_key'] = env['CTP_PROJECT_KEY']
+        token_started = time.perf_counter()
+        access_token = get_access_token(env)
+        fetch_started = time.perf_counter()
+        result['token_seconds'] = fetch_started - token_started
+        # Load once into a columnar table (keyset pagination streams into it),
+        # then classify against every threshold in a single pass
+        table = with_token(env, lambda token: ClientTable.from_clients(
+            get_all_api_clients(token, env, concurrency, pagination)), access_token)
+        result['fetch_seconds'] = time.perf_counter() - fetch_started
+        if store:
+            with store.writer(project) as snapshot:
+                snapshot.add_table(table)
+        classification = table.classify(thresholds)
+        result['clients'] = len(table)
+        result['unused'] = classification.unused_counts()
+        logging.info(f"Unused API clients per threshold for {project}: {result['unused']}")
+        result['buckets'] = classification.age_buckets()
+        logging.info(f"Last-used age buckets for {project}: {dict(result['buckets'])}")
+        if len(thresholds) == 1:
+            result['reports'] = [generate_report(classification.unused(thresholds[0]), project)]
+        else:
+            result['reports'] = [generate_report(classification.unused(days), project, days) for days in thresholds]
+        if store:
+            generate_history_report(store, project, thresholds)
+        result['status'] = 'ok'
+        
+        logging.info(f"Process completed successfully for project: {project}")
+        print(f"Process completed successfully for project: {project}")
+    except RequestException as e:
+        error_message = f"An error occurred for project {project}: {str(e)}"
+        logging.error(error_message)
+        print(error_message)
+        result['error'] = str(e)
+    except ValueError as e:
+        error_message = f"Configuration error for project {project}: {str(e)}"
+        logging.error(error_message)
+        print(error_message)
+        result['error'] = str(e)
+    except Exception as e:
+        error_message = f"Unexpected error for project {project}: {str(e)}"
+        logging.exception(error_message)
+        print(error_message)
+        result['error'] = str(e)
+    finally:
+        result['duration'] = time.perf_counter() - started
+    return result
+
+def run_daemon(thresholds: Sequence[int], interval: float = DEFAULT_CHECK_INTERVAL,
+               intervals: Optional[Dict[str, float]] = None, jitter: float = 0.1, full_refresh: float = 86400.0,
+               listen_port: int = DEFAULT_LISTEN_PORT,
+               concurrency: int = DEFAULT_CONCURRENCY, pagination: str = DEFAULT_PAGINATION,
+               snapshot_db: Optional[str] = None, metrics_file: Optional[str] = None) -> None:
+    """
+    Check all projects continuously, serving the latest reports and metrics over HTTP.
+
+    Args:
+        thresholds (Sequence[int]): Day thresholds; one report is rendered per threshold.
+        interval (float): Seconds between checks of a project.
+        intervals (Optional[Dict[str, float]]): Per-project intervals, keyed by project key (e.g. 'prod').
+        jitter (float): Relative random spread of the intervals.
+        full_refresh (float): Refetch all clients at least this often, even when the probe shows no change.
+        listen_port (int): Local port serving the status page, reports and metrics.
+        concurrency (int): Maximum number of pages fetched in parallel per project.
+        pagination (str): 'offset' or 'keyset'.
+        snapshot_db (Optional[str]): SQLite file storing every refetched inventory.
+        metrics_file (Optional[str]): Also write Prometheus metrics to this file after every check.
+    """
+    from .daemon import CheckDaemon
+    from .metrics import MetricsRegistry, write_textfile
+    from .snapshots import SnapshotStore
+
+    def render_reports(project: str, classification) -> Dict[str, str]:
+        single = len(thresholds) == 1
+        return {
+            os.path.basename(report_filename(project, None if single else days)):
+                format_report(classification.unused(days), project, None if single else days)
+            for days in thresholds
+        }
+
+    registry = MetricsRegistry(get_default_session().metrics)
+    on_result = (lambda result: write_textfile(metrics_file, registry.render())) if metrics_file else None
+    daemon = CheckDaemon(
+        list(PROJECTS.values()), get_project_env, render_reports, thresholds,
+        interval=interval, intervals={PROJECTS[key]: seconds for key, seconds in (intervals or {}).items()},
+        jitter=jitter, full_refresh=full_refresh, concurrency=concurrency, pagination=pagination,
+        store=SnapshotStore(snapshot_db) if snapshot_db else None, registry=registry, on_result=on_result
+    )
+    server = daemon.serve(listen_port)
+    print(f"Daemon started, serving reports on http://127.0.0.1:{server.server_address[1]}/ (Ctrl+C to stop)")
+
+    stop = threading.Event()
+    try:
+        daemon.run(stop)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        server.shutdown()
+        logging.info(f"Request metrics:\n{get_default_session().metrics.summary()}")
+
+def run_checks(project_key: Optional[str] = None, concurrency: int = DEFAULT_CONCURRENCY, pagination: str = DEFAULT_PAGINATION,
+               snapshot_db: Optional[str] = None, history_only: bool = False,
+               thresholds: Sequence[int] = (DAYS_THRESHOLD,), metrics_file: Optional[str] = None,
+               metrics_port: Optional[int] = None) -> None:
+    """
+    Process projects and identify unused API clients.
+
+    When no project is given, all projects are processed concurrently, each in its
+    own worker, followed by a combined summary.
+
+    Args:
+        project_key (Optional[str]): The key of the project to process. If None, all projects are processed.
+        concurrency (int): Maximum number of pages fetched in parallel per project.
+        pagination (str): 'offset' or 'keyset'.
+        snapshot_db (Optional[str]): SQLite file storing each run's inventory, enables history reports.
+        history_only (bool): Only generate history reports from the snapshot database, without API calls.
+        thresholds (Sequence[int]): Day thresholds; all are evaluated from one fetch per project.
+        metrics_file (Optional[str]): Write Prometheus metrics to this file (textfile collector format).
+        metrics_port (Optional[int]): Serve Prometheus metrics on this local port until interrupted.
+    """
+    if project_key and project_key not in PROJECTS:
+        print(f"Invalid project key. Available keys are: {', '.join(PROJECTS.keys())}")
+        return
+
+    store = None
+    if snapshot_db:
+        from .snapshots import SnapshotStore
+        store = SnapshotStore(snapshot_db)
+    if history_only:
+        if store is None:
+            print("--history-only requires a snapshot database (--snapshot-db or CTP_SNAPSHOT_DB)")
+            return
+        for project in ([PROJECTS[project_key]] if project_key else PROJECTS.values()):
+            generate_history_report(store, project, thresholds)
+        return
+
+    registry, server = None, None
+    if metrics_file or metrics_port:
+        from .metrics import MetricsRegistry, start_http_server
+        registry = MetricsRegistry(get_default_session().metrics)
+        if metrics_port:
+            server = start_http_server(metrics_port, registry.render)
+
+    if project_key:
+        results = [process_project(PROJECTS[project_key], concurrency, pagination, store, thresholds)]
+    else:
+        projects = list(PROJECTS.values())
+        with ThreadPoolExecutor(max_workers=len(projects)) as executor:
+            results = list(executor.map(lambda project: process_project(project, concurrency, pagination, store, thresholds), projects))
+        generate_summary(results)
+
+    metrics = get_default_session().metrics.summary()
+    if metrics:
+        logging.info(f"Request metrics:\n{metrics}")
+
+    if registry:
+        for result in results:
+            registry.record_project(result)
+        if metrics_file:
+            from .metrics import write_textfile
+            write_textfile(metrics_file, registry.render())
+            print(f"Metrics written: {metrics_file}")
+    if server:
+        print(f"Serving metrics on http://127.0.0.1:{server.server_address[1]}/metrics (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,161 @@
+"""
+Columnar API client table and single-pass classification into age buckets.
+
+Clients are loaded once into a compact table: ids and names as lists, and
+`lastUsedAt` / `createdAt` as arrays of epoch seconds. Dates are parsed once
+per distinct value (the API reports `lastUsedAt` as a date, so most clients
+share a handful of values).
+
+Classification sorts the clients by last use once. Thresholds are nested (a
+client unused for 90 days is also unused for 30), so the unused clients for any
+threshold are a prefix of that order, found with one binary search. Reports and
+bucket counts for every threshold come from the same table.
+
+numpy is used for the sort and searches when it is installed; otherwise the
+standard library (sorted + bisect) is used, with identical results.
+"""
+
+import time
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DAY = 86400
+# Sorts before every real timestamp, so never used clients are unused for every threshold
+NEVER = -(2 ** 63)
+DEFAULT_THRESHOLDS: Tuple[int, ...] = (7, 30, 90, 180)
+
+_numpy = None
+
+def _load_numpy():
+    """Import numpy on first classification (it is optional and slow to import); None if not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:  # optional, the stdlib path gives the same results
+            _numpy = False
+    return _numpy or None
+
+def parse_thresholds(value: str) -> Tuple[int, ...]:
+    """Parse a comma separated list of day thresholds, e.g. '7,30,90,180'."""
+    try:
+        thresholds = sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise ValueError(f"Invalid thresholds: {value!r}, expected comma separated days")
+    if not thresholds or thresholds[0] < 0:
+        raise ValueError(f"Invalid thresholds: {value!r}, expected comma separated days")
+    return tuple(thresholds)
+
+def _epoch(value: Optional[str], cache: Dict[str, int]) -> int:
+    """Convert an ISO date or datetime (UTC) to epoch seconds, memoized per distinct value."""
+    if not value:
+        return NEVER
+    parsed = cache.get(value)
+    if parsed is None:
+        moment = datetime.datetime.fromisoformat(value.rstrip('Z'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        parsed = cache[value] = int(moment.timestamp())
+    return parsed
+
+class ClientTable:
+    """
+    Columnar table of API clients.
+
+    Example:
+        >>> table = ClientTable.from_clients(clients)
+        >>> classification = table.classify((7, 30, 90, 180))
+        >>> classification.unused_counts()
+        {7: 120, 30: 95, 90: 60, 180: 41}
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.last_used_raw: List[Optional[str]] = []
+        self.last_used = array('q')
+        self.created = array('q')
+        self._dates: Dict[str, int] = {}
+
+    @classmethod
+    def from_clients(cls, clients: Iterable[Dict]) -> 'ClientTable':
+        """Build a table from API client dictionaries, consumed in a single pass."""
+        table = cls()
+        for client in clients:
+            table.append(client)
+        return table
+
+    def append(self, client: Dict) -> None:
+        """Add one API client."""
+        last_used = client.get('lastUsedAt')
+        self.ids.append(client['id'])
+        self.names.append(client.get('name'))
+        self.last_used_raw.append(last_used)
+        self.last_used.append(_epoch(last_used, self._dates))
+        self.created.append(_epoch(client.get('createdAt'), self._dates))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, index: int) -> Dict:
+        """Return a client as a report row (id, name, lastUsedAt)."""
+        return {
+            'id': self.ids[index],
+            'name': self.names[index],
+            'lastUsedAt': self.last_used_raw[index] or 'Never used',
+        }
+
+    def classify(self, thresholds: Sequence[int] = DEFAULT_THRESHOLDS,
+                 now: Optional[float] = None) -> 'Classification':
+        """Classify all clients against every threshold (in days) in one pass."""
+        return Classification(self, thresholds, time.time() if now is None else now)
+
+class Classification:
+    """Unused clients per threshold, computed from one sort of the last-used column."""
+
+    def __init__(self, table: ClientTable, thresholds: Sequence[int], now: float):
+        self.table = table
+        self.thresholds = tuple(sorted(set(thresholds)))
+        # The last cutoff counts the never used clients, which sort first
+        cutoffs = [int(now) - days * DAY for days in self.thresholds] + [NEVER + 1]
+
+        numpy = _load_numpy()
+        if numpy is not None and len(table):
+            last_used = numpy.frombuffer(table.last_used, dtype=numpy.int64)
+            self._order = numpy.argsort(last_used, kind='stable')
+            ends = numpy.searchsorted(last_used[self._order], cutoffs, side='left')
+        else:
+            last_used = table.last_used
+            self._order = sorted(range(len(table)), key=last_used.__getitem__)
+            ordered = [last_used[i] for i in self._order]
+            ends = [bisect_left(ordered, cutoff) for cutoff in cutoffs]
+        # Number of clients last used before each threshold's cutoff (or never used)
+        self._ends = {days: int(end) for days, end in zip(self.thresholds, ends)}
+        self._never = int(ends[-1])
+
+    def unused_counts(self) -> Dict[int, int]:
+        """Number of unused clients per threshold."""
+        return dict(self._ends)
+
+    def unused(self, days: int) -> List[Dict]:
+        """Report rows of the clients unused for `days`, in table (id) order."""
+        indices = sorted(int(i) for i in self._order[:self._ends[days]])
+        return [self.table.row(i) for i in indices]
+
+    def age_buckets(self) -> List[Tuple[str, int]]:
+        """
+        Count clients per last-used age bucket.
+
+        Thresholds (7, 30) give '<7d', '7-30d', '>=30d' and 'never'.
+        """
+        ends = [self._ends[days] for days in self.thresholds]
+        bounds = self.thresholds
+        labels = [f"<{bounds[0]}d"] + [f"{low}-{high}d" for low, high in zip(bounds, bounds[1:])]
+        labels.append(f">={bounds[-1]}d")
+        # ends are cumulative counts of clients older than each cutoff, newest bucket first
+        counts = [len(self.table) - ends[0]] + [ends[i] - ends[i + 1] for i in range(len(ends) - 1)]
+        counts.append(ends[-1] - self._never)
+        return list(zip(labels, counts)) + [('never', self._never)]
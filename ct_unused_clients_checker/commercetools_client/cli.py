@@ -0,0 +1,180 @@
+"""
+Command line entry points of the commercetools scripts.
+
+Every script is a thin wrapper around one of these functions:
+- unused_clients_main: ct_unused_clients_checker/commercetools_unused_clients_script.py
+- unused_clients_single_main: commercetools_unused_clients_script.py (single project, CTP_* variables)
+- list_clients_main: commercetools_api_check.py
+
+Arguments are parsed before anything else is imported, so --help does not load
+requests, dotenv or the check stages. The .env file, logging and output
+directories are set up only after parsing, and settings are read from the
+environment after .env has been loaded.
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+from .config import (DAYS_THRESHOLD, DEFAULT_CHECK_INTERVAL, DEFAULT_CONCURRENCY, DEFAULT_LISTEN_PORT,
+                     DEFAULT_PAGINATION, PAGINATION_MODES, PROJECTS, get_project_env, load_env_file,
+                     missing_env, setting, setup)
+
+CHECKER_LOG_FILE = 'logs/commercetools_api_client_check.log'
+SINGLE_LOG_FILE = 'commercetools_api_client_check.log'
+SINGLE_REPORT_FILENAME = 'unused_api_clients_report.txt'
+
+def build_unused_clients_parser() -> argparse.ArgumentParser:
+    """Argument parser of the multi-project unused clients checker."""
+    parser = argparse.ArgumentParser(description="Check for unused API clients in Commercetools projects")
+    parser.add_argument('project', nargs='?', choices=list(PROJECTS.keys()),
+                        help="The project to check (optional, if not provided, all projects will be checked)")
+    parser.add_argument('--concurrency', type=int,
+                        help=f"Maximum number of pages fetched in parallel (default: {DEFAULT_CONCURRENCY}, env CTP_MAX_CONCURRENCY)")
+    parser.add_argument('--pagination', choices=PAGINATION_MODES,
+                        help=f"Pagination strategy: offset (concurrent pages) or keyset (streamed, for very large projects) (default: {DEFAULT_PAGINATION}, env CTP_PAGINATION)")
+    parser.add_argument('--thresholds',
+                        help=f"Comma separated day thresholds, one report each, e.g. 7,30,90,180 (default: {DAYS_THRESHOLD}, env CTP_THRESHOLDS)")
+    parser.add_argument('--snapshot-db', metavar='PATH',
+                        help="Store each run's client inventory in this SQLite file and write history reports (env CTP_SNAPSHOT_DB)")
+    parser.add_argument('--history-only', action='store_true',
+                        help="Only generate history reports from the snapshot database, without calling the API")
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help="Write Prometheus metrics to this file, atomically (env CTP_METRICS_FILE)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="Serve Prometheus metrics on this local port after the run, until interrupted (env CTP_METRICS_PORT)")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep running: check every project on its interval and serve the latest reports over HTTP")
+    parser.add_argument('--interval', type=float,
+                        help=f"Daemon: seconds between checks of a project (default: {DEFAULT_CHECK_INTERVAL:g}, env CTP_CHECK_INTERVAL)")
+    parser.add_argument('--project-interval', action='append', default=[], metavar='KEY=SECONDS',
+                        help="Daemon: interval of one project, e.g. prod=300 (repeatable)")
+    parser.add_argument('--jitter', type=float, default=0.1,
+                        help="Daemon: relative random spread of the intervals (default: 0.1)")
+    parser.add_argument('--full-refresh', type=float, default=86400.0,
+                        help="Daemon: refetch all clients at least this often in seconds, even if unchanged (default: 86400)")
+    parser.add_argument('--listen', type=int,
+                        help=f"Daemon: local port serving reports, status and metrics (default: {DEFAULT_LISTEN_PORT}, env CTP_LISTEN_PORT)")
+    parser.add_argument('--token-cache', metavar='PATH',
+                        help="Persist OAuth tokens to this file (mode 0600) and reuse them across runs (env CTP_TOKEN_CACHE_FILE)")
+    return parser
+
+def unused_clients_main(argv: Optional[List[str]] = None) -> None:
+    """Check all (or one) of the PROJECTS for unused API clients, once or as a daemon."""
+    parser = build_unused_clients_parser()
+    args = parser.parse_args(argv)
+
+    intervals: Dict[str, float] = {}
+    for override in args.project_interval:
+        key, sep, seconds = override.partition('=')
+        if not sep or key not in PROJECTS:
+            parser.error(f"--project-interval expects KEY=SECONDS with KEY one of {', '.join(PROJECTS)}, got: {override}")
+        intervals[key] = float(seconds)
+
+    load_env_file()
+    from .classify import parse_thresholds
+    try:
+        thresholds = parse_thresholds(args.thresholds or setting('CTP_THRESHOLDS', str(DAYS_THRESHOLD)))
+    except ValueError as e:
+        parser.error(str(e))
+    pagination = args.pagination or setting('CTP_PAGINATION', DEFAULT_PAGINATION)
+    if pagination not in PAGINATION_MODES:
+        parser.error(f"CTP_PAGINATION must be one of {', '.join(PAGINATION_MODES)}, got: {pagination}")
+    concurrency = args.concurrency or setting('CTP_MAX_CONCURRENCY', DEFAULT_CONCURRENCY, int)
+    snapshot_db = args.snapshot_db or setting('CTP_SNAPSHOT_DB', None)
+    metrics_file = args.metrics_file or setting('CTP_METRICS_FILE', None)
+
+    setup(CHECKER_LOG_FILE, ['reports'])
+
+    from . import checker
+    if args.token_cache:
+        from .token_cache import configure_default_cache
+        configure_default_cache(args.token_cache)
+    if args.daemon:
+        checker.run_daemon(
+            thresholds, args.interval or setting('CTP_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL, float), intervals,
+            args.jitter, args.full_refresh, args.listen or setting('CTP_LISTEN_PORT', DEFAULT_LISTEN_PORT, int),
+            concurrency, pagination, snapshot_db, metrics_file
+        )
+    else:
+        checker.run_checks(
+            args.project, concurrency, pagination, snapshot_db, args.history_only, thresholds,
+            metrics_file, args.metrics_port or setting('CTP_METRICS_PORT', None, int)
+        )
+
+def _single_project_env(parser: argparse.ArgumentParser, project_key: Optional[str]) -> Dict[str, str]:
+    """Credentials from CTP_* (or {PROJECT}_CTP_* with a project key); exits with a usage error if incomplete."""
+    project = PROJECTS[project_key] if project_key else None
+    env = get_project_env(project)
+    if env is None:
+        parser.error(f"Missing environment variables: {', '.join(missing_env(project))}")
+    return env
+
+def unused_clients_single_main(argv: Optional[List[str]] = None) -> None:
+    """Report the unused API clients of a single project to one text file."""
+    parser = argparse.ArgumentParser(
+        description="Report unused API clients of the project configured in the CTP_* environment variables")
+    parser.add_argument('--project', choices=list(PROJECTS.keys()),
+                        help="Use the {PROJECT_PREFIX}_CTP_* variables of one of the PROJECTS instead of CTP_*")
+    parser.add_argument('--days', type=int, default=DAYS_THRESHOLD,
+                        help=f"Days without use after which a client is reported (default: {DAYS_THRESHOLD})")
+    parser.add_argument('--output', default=SINGLE_REPORT_FILENAME,
+                        help=f"Report file (default: {SINGLE_REPORT_FILENAME})")
+    args = parser.parse_args(argv)
+
+    load_env_file()
+    env = _single_project_env(parser, args.project)
+    setup(SINGLE_LOG_FILE)
+
+    import logging
+    from requests.exceptions import RequestException
+    from .checker import get_access_token, get_all_api_clients, identify_unused_clients
+    from .report import generate_report
+
+    try:
+        logging.info("Starting Commercetools API client check process")
+        access_token = get_access_token(env)
+        clients = get_all_api_clients(access_token, env, pagination='keyset')
+        unused_clients = identify_unused_clients(clients, args.days)
+        generate_report(unused_clients, None, filename=args.output)
+        logging.info("Process completed successfully")
+        print("Process completed successfully")
+    except RequestException as e:
+        error_message = f"An error occurred: {str(e)}"
+        logging.error(error_message)
+        print(error_message)
+
+def list_clients_main(argv: Optional[List[str]] = None) -> None:
+    """Print the API clients of a single project, e.g. to verify credentials."""
+    parser = argparse.ArgumentParser(
+        description="List the API clients of the project configured in the CTP_* environment variables")
+    parser.add_argument('--project', choices=list(PROJECTS.keys()),
+                        help="Use the {PROJECT_PREFIX}_CTP_* variables of one of the PROJECTS instead of CTP_*")
+    args = parser.parse_args(argv)
+
+    load_env_file()
+    env = _single_project_env(parser, args.project)
+
+    from requests.exceptions import RequestException
+    from .checker import get_access_token, get_all_api_clients
+    from .token_cache import token_url
+
+    try:
+        print("Getting access token...")
+        print(f"Requesting token from: {token_url(env['CTP_AUTH_URL'])}")
+        print(f"Using client ID: {env['CTP_CLIENT_ID']}")
+        print(f"Scopes: {env['CTP_SCOPES']}")
+        access_token = get_access_token(env)
+        print("Access token obtained successfully.")
+
+        print("Fetching API clients...")
+        print(f"Requesting API clients from: {env['CTP_API_URL']}/{env['CTP_PROJECT_KEY']}/api-clients")
+        clients = list(get_all_api_clients(access_token, env, pagination='keyset'))
+        print(f"Successfully retrieved {len(clients)} API clients.")
+
+        for client in clients:
+            print(f"Client ID: {client['id']}, Name: {client['name']}")
+    except RequestException as e:
+        response = getattr(e, 'response', None)
+        if response is not None:
+            print(f"Error response: {response.status_code} {response.text}")
+        print(f"An error occurred: {e}")
@@ -0,0 +1,102 @@
+"""
+Projects, credentials and runtime settings.
+
+Nothing here has side effects at import time: the .env file (in the running
+script's directory or its closest parent, else in the working directory, see
+find_env_file) is loaded, and logging and output directories are set up, only
+when an entry point calls load_env_file() and setup(). Settings are read from
+the environment when they are needed, so values from .env are always taken
+into account.
+"""
+
+import os
+import sys
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+ENV_KEYS = ('CTP_PROJECT_KEY', 'CTP_CLIENT_SECRET', 'CTP_CLIENT_ID', 'CTP_AUTH_URL', 'CTP_API_URL', 'CTP_SCOPES')
+
+# Available projects with short keys
+PROJECTS = {
+    'dev': 'PT_D2C_PRO_ESHOP_DEV',
+    'stage': 'PT_D2C_PRO_ESHOP_STAGE',
+    'preprod': 'PT_D2C_PRO_ESHOP_PRE_PROD',
+    'prod': 'PT_D2C_PRO_ESHOP_PROD',
+    'diy': 'PT_D2C_DIY_ESHOP'
+}
+
+DAYS_THRESHOLD = 30
+DEFAULT_CONCURRENCY = 4
+DEFAULT_PAGINATION = 'offset'
+PAGINATION_MODES = ('offset', 'keyset')
+DEFAULT_CHECK_INTERVAL = 900.0
+DEFAULT_LISTEN_PORT = 8000
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def get_project_env(project: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    Retrieve the credentials of a project from the environment.
+
+    Args:
+        project (Optional[str]): The project identifier, used as prefix ({project}_CTP_*).
+            Without a project the unprefixed CTP_* variables are used.
+
+    Returns:
+        Optional[Dict[str, str]]: A dictionary of environment variables if all are set, None otherwise.
+    """
+    env = {key: os.getenv(f'{project}_{key}' if project else key) for key in ENV_KEYS}
+    return env if all(env.values()) else None
+
+def missing_env(project: Optional[str] = None) -> List[str]:
+    """Names of the credential variables of a project that are not set."""
+    names = [f'{project}_{key}' if project else key for key in ENV_KEYS]
+    return [name for name in names if not os.getenv(name)]
+
+def setting(name: str, default: T, convert: Callable[[str], T] = str) -> T:
+    """Read a setting from the environment, e.g. setting('CTP_MAX_CONCURRENCY', 4, int)."""
+    value = os.getenv(name)
+    return convert(value) if value else default
+
+def find_env_file(start: Optional[str] = None) -> Optional[str]:
+    """
+    Find the .env file of a script: in its directory or the closest parent, else in the working directory.
+
+    Args:
+        start (Optional[str]): Directory to search from, the running script's directory by default.
+
+    Returns:
+        Optional[str]: The path of the .env file, or None.
+    """
+    directory = os.path.abspath(start or os.path.dirname(os.path.abspath(sys.argv[0] or '.')))
+    while True:
+        candidate = os.path.join(directory, '.env')
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return '.env' if os.path.isfile('.env') else None
+
+def load_env_file(path: Optional[str] = None) -> bool:
+    """Load a .env file (see find_env_file); returns False if there is none or python-dotenv is not installed."""
+    path = path or find_env_file()
+    if not path:
+        return False
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        logging.warning(f"python-dotenv is not installed, ignoring {path}")
+        return False
+    return load_dotenv(path)
+
+def setup(log_file: str, directories: Iterable[str] = ()) -> None:
+    """Create output directories and send log records to a file (entry points only)."""
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+    log_directory = os.path.dirname(log_file)
+    if log_directory:
+        os.makedirs(log_directory, exist_ok=True)
+    logging.basicConfig(filename=log_file, level=logging.INFO, format=LOG_FORMAT)
@@ -0,0 +1,271 @@
+"""
+Long-running check daemon.
+
+Instead of a cron job paying interpreter start, configuration loading, a token
+request and a full listing on every run, the daemon keeps one process alive:
+- the pooled session and the token cache stay warm (tokens are refreshed ahead of expiry)
+- every project is checked on its own interval, with jitter so projects sharing
+  an API host do not fire at the same moment
+- each cycle starts with a cheap probe (one request: limit=1, sorted by lastUsedAt
+  desc, with the total). When the client count and the latest lastUsedAt are
+  unchanged, the clients kept in memory are reclassified instead of refetched;
+  a full refetch still happens at least every `full_refresh` seconds
+- the latest reports, a status index and the metrics are served from memory over HTTP
+
+Endpoints (bound to 127.0.0.1):
+    /                             status of every project and links to its reports
+    /reports/<project>/<report>   latest report text
+    /metrics                      Prometheus metrics (see metrics)
+    /healthz                      liveness
+"""
+
+import time
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+from .checker import with_token
+from .classify import Classification, ClientTable
+from .fetch import fetch_page, iter_resources
+from .token_cache import get_default_cache
+
+DEFAULT_INTERVAL = 900.0
+DEFAULT_JITTER = 0.1
+DEFAULT_FULL_REFRESH = 86400.0
+# Upper bound of the random delay before each project's first check
+MAX_INITIAL_DELAY = 5.0
+
+def probe_inventory(api_url: str, project_key: str, access_token: str, session=None) -> Tuple[int, Optional[str]]:
+    """
+    Return (client count, latest lastUsedAt) of a project with a single small request.
+
+    Args:
+        api_url (str): The API URL of the region.
+        project_key (str): The project key.
+        access_token (str): The access token for authentication.
+        session: Session used for the request, the shared session by default.
+
+    Returns:
+        Tuple[int, Optional[str]]: The total and the most recent lastUsedAt (None if no client was used).
+    """
+    page = fetch_page(api_url, project_key, 'api-clients', access_token,
+                      {'limit': 1, 'sort': 'lastUsedAt desc', 'withTotal': 'true'}, session)
+    results = page.get('results') or []
+    return page.get('total', len(results)), (results[0].get('lastUsedAt') if results else None)
+
+class ProjectState:
+    """What the daemon keeps in memory per project between cycles."""
+
+    def __init__(self, project: str):
+        self.project = project
+        self.table: Optional[ClientTable] = None
+        self.signature: Optional[Tuple[int, Optional[str]]] = None
+        self.fetched_at = 0.0
+        self.counts: Optional[Tuple] = None
+        self.reports: Dict[str, str] = {}
+        self.result: Dict = {'project': project, 'status': 'pending'}
+
+class CheckDaemon:
+    """
+    Schedules project checks and keeps their latest results in memory.
+
+    Args:
+        projects (Sequence[str]): Project identifiers (the values of PROJECTS).
+        get_env (Callable): Returns the CTP_* settings of a project, or None when incomplete.
+        render_reports (Callable): Renders {report name: text} from (project, Classification).
+        thresholds (Sequence[int]): Day thresholds to classify against.
+        interval (float): Seconds between checks of a project.
+        intervals (Optional[Dict[str, float]]): Per-project overrides of `interval`.
+        jitter (float): Relative random spread of every interval, e.g. 0.1 for +-10%.
+        full_refresh (float): Maximum age in seconds of the in-memory clients before a refetch.
+        concurrency (int): Pages fetched in parallel (offset pagination).
+        pagination (str): 'offset' or 'keyset'.
+        store: Optional SnapshotStore; every refetched inventory is stored.
+        registry: Optional MetricsRegistry; every check result is recorded.
+        on_result (Optional[Callable]): Called with every check result, e.g. to write a metrics file.
+
+    Example:
+        >>> daemon = CheckDaemon(PROJECTS.values(), get_project_env, render_reports, (30, 90))
+        >>> daemon.serve(8000)
+        >>> daemon.run(threading.Event())
+    """
+
+    def __init__(self, projects: Sequence[str], get_env: Callable[[str], Optional[Dict[str, str]]],
+                 render_reports: Callable[[str, Classification], Dict[str, str]], thresholds: Sequence[int],
+                 interval: float = DEFAULT_INTERVAL, intervals: Optional[Dict[str, float]] = None,
+                 jitter: float = DEFAULT_JITTER, full_refresh: float = DEFAULT_FULL_REFRESH,
+                 concurrency: int = 4, pagination: str = 'offset', store=None, registry=None,
+                 on_result: Optional[Callable[[Dict], None]] = None):
+        self.projects = list(projects)
+        self.get_env = get_env
+        self.render_reports = render_reports
+        self.thresholds = tuple(thresholds)
+        self.interval = interval
+        self.intervals = intervals or {}
+        self.jitter = jitter
+        self.full_refresh = full_refresh
+        self.concurrency = concurrency
+        self.pagination = pagination
+        self.store = store
+        self.registry = registry
+        self.on_result = on_result
+        self._states = {project: ProjectState(project) for project in self.projects}
+        self._lock = threading.Lock()
+
+    def next_delay(self, project: str) -> float:
+        """Seconds until the next check of a project: its interval, spread by the jitter."""
+        interval = self.intervals.get(project, self.interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def check(self, project: str) -> Dict:
+        """
+        Run one check cycle of a project: probe, refetch only if needed, classify, render.
+
+        Errors are caught and returned in the result; the previous reports stay available.
+
+        Returns:
+            Dict: The result, with the same keys as process_project plus 'refetched'.
+        """
+        state = self._states[project]
+        started = time.perf_counter()
+        result = {'project': project, 'project_key': None, 'status': 'error', 'clients': None, 'unused': None,
+                  'buckets': None, 'reports': None, 'error': None, 'duration': 0.0,
+                  'token_seconds': None, 'fetch_seconds': None, 'refetched': False}
+        try:
+            env = self.get_env(project)
+            if not env:
+                result['status'] = 'skipped'
+                return result
+            result['project_key'] = env['CTP_PROJECT_KEY']
+
+            token_started = time.perf_counter()
+            get_default_cache().get_token(env['CTP_AUTH_URL'], env['CTP_CLIENT_ID'],
+                                          env['CTP_CLIENT_SECRET'], env['CTP_SCOPES'])
+            result['token_seconds'] = time.perf_counter() - token_started
+            signature = with_token(env, lambda token: probe_inventory(
+                env['CTP_API_URL'], env['CTP_PROJECT_KEY'], token))
+
+            stale = time.time() - state.fetched_at >= self.full_refresh
+            if state.table is None or signature != state.signature or stale:
+                fetch_started = time.perf_counter()
+                state.table = with_token(env, lambda token: ClientTable.from_clients(iter_resources(
+                    env['CTP_API_URL'], env['CTP_PROJECT_KEY'], 'api-clients', token,
+                    pagination=self.pagination, concurrency=self.concurrency)))
+                result['fetch_seconds'] = time.perf_counter() - fetch_started
+                state.signature, state.fetched_at = signature, time.time()
+                state.counts = None
+                result['refetched'] = True
+                if self.store:
+                    with self.store.writer(project) as snapshot:
+                        snapshot.add_table(state.table)
+                logging.info(f"{project}: inventory changed or stale, refetched {len(state.table)} clients")
+            else:
+                logging.info(f"{project}: inventory unchanged {signature}, reclassifying {len(state.table)} clients")
+
+            classification = state.table.classify(self.thresholds)
+            counts = (tuple(sorted(classification.unused_counts().items())), tuple(classification.age_buckets()))
+            if counts != state.counts:
+                state.reports = self.render_reports(project, classification)
+                state.counts = counts
+            result['clients'] = len(state.table)
+            result['unused'] = dict(counts[0])
+            result['buckets'] = list(counts[1])
+            result['reports'] = sorted(state.reports)
+            result['status'] = 'ok'
+        except Exception as e:
+            logging.exception(f"Check failed for project {project}: {e}")
+            result['error'] = str(e)
+        finally:
+            result['duration'] = time.perf_counter() - started
+            result['checked_at'] = time.time()
+            with self._lock:
+                state.result = result
+            if self.registry is not None:
+                self.registry.record_project(result)
+            if self.on_result is not None:
+                self.on_result(result)
+        return result
+
+    def run(self, stop: threading.Event) -> None:
+        """Check every project on its own schedule until `stop` is set."""
+        threads = [
+            threading.Thread(target=self._project_loop, args=(project, stop), name=f'check-{project}', daemon=True)
+            for project in self.projects
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _project_loop(self, project: str, stop: threading.Event) -> None:
+        delay = random.uniform(0, min(MAX_INITIAL_DELAY, self.intervals.get(project, self.interval) * self.jitter))
+        while not stop.wait(delay):
+            result = self.check(project)
+            if result['status'] == 'skipped':
+                logging.warning(f"Not scheduling project {project}: missing or incomplete environment variables")
+                return
+            delay = self.next_delay(project)
+
+    def status(self) -> Dict[str, Dict]:
+        """Latest result per project."""
+        with self._lock:
+            return {project: dict(state.result) for project, state in self._states.items()}
+
+    def report(self, project: str, name: str) -> Optional[str]:
+        """Latest text of a report, or None."""
+        state = self._states.get(project)
+        return state.reports.get(name) if state else None
+
+    def render_index(self) -> str:
+        """Plain text status page."""
+        lines = ["Unused API Clients Daemon", "="*40, ""]
+        lines.append(f"{'Project':<30} {'Status':<8} {'Clients':>8} {'Checked':>20}  Reports")
+        for project, result in self.status().items():
+            checked = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(result['checked_at'])) \
+                if result.get('checked_at') else '-'
+            clients = result.get('clients') if result.get('clients') is not None else '-'
+            reports = ' '.join(f"/reports/{project}/{name}" for name in self._states[project].reports)
+            lines.append(f"{project:<30} {result['status']:<8} {clients:>8} {checked:>20}  {reports}")
+            if result.get('error'):
+                lines.append(f"    error: {result['error']}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serve the status page, reports, metrics and health check from a background thread."""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_text(self, status: int, text: str, content_type: str = 'text/plain; charset=utf-8') -> None:
+                payload = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                path = unquote(self.path.split('?', 1)[0]).rstrip('/') or '/'
+                parts = path.strip('/').split('/')
+                if path == '/':
+                    self.send_text(200, daemon.render_index())
+                elif path == '/healthz':
+                    self.send_text(200, 'ok\n')
+                elif path == '/metrics' and daemon.registry is not None:
+                    from .metrics import CONTENT_TYPE
+                    self.send_text(200, daemon.registry.render(), CONTENT_TYPE)
+                elif len(parts) == 3 and parts[0] == 'reports' and daemon.report(parts[1], parts[2]) is not None:
+                    self.send_text(200, daemon.report(parts[1], parts[2]))
+                else:
+                    self.send_text(404, 'not found\n')
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logging.info(f"Serving reports on http://{host}:{server.server_address[1]}/")
+        return server
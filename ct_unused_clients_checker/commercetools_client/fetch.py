@@ -0,0 +1,131 @@
+"""
+Paginated listing of commercetools resources (api-clients, customers, orders, ...).
+
+Two strategies are available:
+- offset: the first page (maximum size) returns the total, then the remaining
+  pages are fetched concurrently and assembled in order. Fast for small and
+  medium listings, but limited by the platform's maximum offset (listings beyond
+  it are fetched with keyset pagination instead) and may skip or repeat items
+  that are created or deleted during the scan.
+- keyset: pages are sorted by id and each page asks for `id > last id`. Results
+  are streamed through a generator, so memory stays constant regardless of the
+  number of items, there is no offset limit and concurrent inserts cannot shift pages.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .config import PAGINATION_MODES  # noqa: F401 (re-exported)
+
+PAGE_SIZE = 500  # Maximum page size allowed by the API
+MAX_OFFSET = 10000  # Maximum offset allowed by the API
+
+def fetch_page(api_url: str, project_key: str, resource: str, access_token: str, params: Dict,
+               session=None) -> Dict:
+    """
+    Fetch one page of a resource listing.
+
+    Args:
+        api_url (str): The API URL of the region.
+        project_key (str): The project key.
+        resource (str): The resource path, e.g. 'api-clients'.
+        access_token (str): The access token for authentication.
+        params (Dict): Query parameters (limit, offset, sort, where, withTotal).
+        session: Session used for the request, the shared session by default.
+
+    Returns:
+        Dict: The paged query response.
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails.
+    """
+    if session is None:
+        from .session import get_default_session
+        session = get_default_session()
+    full_url = f"{api_url}/{project_key}/{resource}"
+    logging.info(f"Fetching {resource} from: {full_url} ({', '.join(f'{k}={v}' for k, v in params.items())})")
+    response = session.get(full_url, headers={'Authorization': f'Bearer {access_token}'}, params=params,
+                           project=project_key)
+    response.raise_for_status()
+    return response.json()
+
+def fetch_all_offset(api_url: str, project_key: str, resource: str, access_token: str,
+                     concurrency: int = 4, page_size: int = PAGE_SIZE, session=None) -> List[Dict]:
+    """
+    Retrieve a complete listing with offset pagination, fetching pages concurrently.
+
+    The first page is requested with the total count. The remaining pages are then
+    fetched at most `concurrency` at a time and assembled in offset order. A listing
+    too long to reach with the maximum offset is fetched with keyset pagination
+    instead, so the result is never silently truncated.
+
+    Returns:
+        List[Dict]: All items, sorted by id.
+    """
+    def page(offset: int, with_total: bool = False) -> Dict:
+        params = {'offset': offset, 'limit': page_size, 'sort': 'id asc', 'withTotal': str(with_total).lower()}
+        return fetch_page(api_url, project_key, resource, access_token, params, session)
+
+    first_page = page(0, with_total=True)
+    items = list(first_page['results'])
+    total = first_page.get('total', len(items))
+    if total > MAX_OFFSET + page_size:
+        logging.warning(f"{resource}: {total} items exceed the maximum offset, switching to keyset pagination")
+        return list(iter_keyset(api_url, project_key, resource, access_token, page_size=page_size, session=session))
+
+    offsets = list(range(page_size, min(total, MAX_OFFSET + 1), page_size))
+    if offsets and len(first_page['results']) == page_size:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for result in executor.map(page, offsets):
+                items.extend(result['results'])
+
+    logging.info(f"Total {resource} retrieved: {len(items)}")
+    return items
+
+def iter_keyset(api_url: str, project_key: str, resource: str, access_token: str,
+                where: Optional[str] = None, page_size: int = PAGE_SIZE, session=None) -> Iterator[Dict]:
+    """
+    Stream a complete listing with keyset pagination (sort by id, `id > last`).
+
+    Only one page is held in memory at a time.
+
+    Args:
+        where (Optional[str]): Additional query predicate, combined with the id condition.
+
+    Yields:
+        Dict: Items in id order.
+    """
+    last_id = None
+    count = 0
+    while True:
+        conditions = [f'({where})'] if where else []
+        if last_id is not None:
+            conditions.append(f'id > "{last_id}"')
+        params = {'limit': page_size, 'sort': 'id asc', 'withTotal': 'false'}
+        if conditions:
+            params['where'] = ' and '.join(conditions)
+
+        results = fetch_page(api_url, project_key, resource, access_token, params, session)['results']
+        count += len(results)
+        yield from results
+        if len(results) < page_size:
+            break
+        last_id = results[-1]['id']
+
+    logging.info(f"Total {resource} retrieved: {count}")
+
+def iter_resources(api_url: str, project_key: str, resource: str, access_token: str,
+                   pagination: str = 'offset', concurrency: int = 4, where: Optional[str] = None,
+                   session=None) -> Iterable[Dict]:
+    """
+    List a resource with the chosen pagination strategy.
+
+    Returns a list for offset pagination and a generator for keyset pagination;
+    callers that only iterate once can treat both the same way.
+    """
+    if pagination == 'keyset':
+        return iter_keyset(api_url, project_key, resource, access_token, where=where, session=session)
+    if where:
+        raise ValueError("A where predicate is only supported with keyset pagination")
+    return fetch_all_offset(api_url, project_key, resource, access_token, concurrency=concurrency, session=session)
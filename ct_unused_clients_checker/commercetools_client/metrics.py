@@ -0,0 +1,180 @@
+"""
+Prometheus metrics for the unused clients checker.
+
+Project results are recorded once per check (never per client or per request),
+and HTTP counters come from the session's RequestMetrics, which are updated on
+every request anyway. Rendering happens only when the metrics are written or
+scraped, so collection adds nothing to the checker's hot path.
+
+Metrics are exposed in the Prometheus text format, either:
+- written to a file for node_exporter's textfile collector (atomic rename, so a
+  scrape never sees a partial file), or
+- served over HTTP on a local port at /metrics.
+
+Exported per project (label project):
+    ctp_check_success, ctp_check_last_run_timestamp_seconds, ctp_check_duration_seconds,
+    ctp_fetch_duration_seconds, ctp_token_duration_seconds, ctp_api_clients,
+    ctp_api_clients_by_age{bucket}, ctp_api_clients_unused{threshold_days},
+    ctp_project_requests_total, ctp_project_request_errors_total,
+    ctp_project_request_retries_total, ctp_project_request_duration_seconds_total
+Exported per API host and endpoint (labels host, endpoint):
+    ctp_http_requests_total, ctp_http_request_errors_total, ctp_http_request_retries_total,
+    ctp_http_request_duration_seconds_total, ctp_http_request_duration_seconds_max
+"""
+
+import os
+import time
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+PROJECT_METRICS: List[Tuple[str, str, str]] = [
+    ('ctp_check_success', 'gauge', 'Whether the last check of the project succeeded (1) or failed (0).'),
+    ('ctp_check_last_run_timestamp_seconds', 'gauge', 'Unix time the last check of the project finished.'),
+    ('ctp_check_duration_seconds', 'gauge', 'Duration of the last check of the project.'),
+    ('ctp_fetch_duration_seconds', 'gauge', 'Time spent listing the API clients in the last check.'),
+    ('ctp_token_duration_seconds', 'gauge', 'Time spent obtaining the access token in the last check (0 when cached).'),
+    ('ctp_api_clients', 'gauge', 'Number of API clients in the project.'),
+]
+REQUEST_COUNTERS: List[Tuple[str, str, str]] = [
+    ('requests', 'requests_total', 'HTTP requests sent, including retries.'),
+    ('errors', 'request_errors_total', 'HTTP requests that failed or returned an error status.'),
+    ('retries', 'request_retries_total', 'HTTP requests that were retries of a failed attempt.'),
+    ('seconds_total', 'request_duration_seconds_total', 'Total time spent in HTTP requests.'),
+]
+
+def escape_label(value) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value) -> str:
+    """Render a sample value; integers stay integers, floats keep full precision."""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def format_labels(labels: Dict[str, object]) -> str:
+    """Render a label set, e.g. {project="dev",bucket="<7d"}."""
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+class MetricsRegistry:
+    """
+    Latest check results per project, rendered together with the session's HTTP metrics.
+
+    Example:
+        >>> registry = MetricsRegistry(get_default_session().metrics)
+        >>> registry.record_project(process_project('PT_D2C_PRO_ESHOP_DEV'))
+        >>> write_textfile('/var/lib/node_exporter/textfile/ctp.prom', registry.render())
+    """
+
+    def __init__(self, request_metrics=None):
+        self.request_metrics = request_metrics
+        self._lock = threading.Lock()
+        self._projects: Dict[str, Dict] = {}
+
+    def record_project(self, result: Dict) -> None:
+        """Store the result of process_project; skipped projects are not exported."""
+        if result.get('status') == 'skipped':
+            return
+        with self._lock:
+            self._projects[result['project']] = dict(result, finished_at=time.time())
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        with self._lock:
+            projects = sorted(self._projects.items())
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples: List[Tuple[Dict, float]]) -> None:
+            if not samples:
+                return
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{format_labels(labels)} {format_value(value)}' for labels, value in samples)
+
+        values = {
+            'ctp_check_success': lambda result: 1 if result['status'] == 'ok' else 0,
+            'ctp_check_last_run_timestamp_seconds': lambda result: result['finished_at'],
+            'ctp_check_duration_seconds': lambda result: result['duration'],
+            'ctp_fetch_duration_seconds': lambda result: result.get('fetch_seconds'),
+            'ctp_token_duration_seconds': lambda result: result.get('token_seconds'),
+            'ctp_api_clients': lambda result: result.get('clients'),
+        }
+        for name, kind, help_text in PROJECT_METRICS:
+            samples = [({'project': project}, values[name](result)) for project, result in projects]
+            family(name, kind, help_text, [(labels, value) for labels, value in samples if value is not None])
+
+        family('ctp_api_clients_by_age', 'gauge', 'API clients per last-used age bucket.', [
+            ({'project': project, 'bucket': bucket}, count)
+            for project, result in projects for bucket, count in result.get('buckets') or []
+        ])
+        family('ctp_api_clients_unused', 'gauge', 'API clients not used within the threshold.', [
+            ({'project': project, 'threshold_days': days}, count)
+            for project, result in projects for days, count in sorted((result.get('unused') or {}).items())
+        ])
+
+        if self.request_metrics is not None:
+            per_project = self.request_metrics.project_snapshot()
+            project_keys = [(project, result.get('project_key')) for project, result in projects]
+            for key, suffix, help_text in REQUEST_COUNTERS:
+                family(f'ctp_project_{suffix}', 'counter', f'{help_text[:-1]}, per project.', [
+                    ({'project': project}, per_project[project_key][key])
+                    for project, project_key in project_keys if project_key in per_project
+                ])
+
+            per_endpoint = sorted(self.request_metrics.snapshot().items())
+            for key, suffix, help_text in REQUEST_COUNTERS:
+                family(f'ctp_http_{suffix}', 'counter', help_text, [
+                    ({'host': host, 'endpoint': endpoint}, stats[key]) for (host, endpoint), stats in per_endpoint
+                ])
+            family('ctp_http_request_duration_seconds_max', 'gauge', 'Slowest HTTP request.', [
+                ({'host': host, 'endpoint': endpoint}, stats['seconds_max']) for (host, endpoint), stats in per_endpoint
+            ])
+
+        return '\n'.join(lines) + '\n' if lines else ''
+
+def write_textfile(path: str, text: str) -> None:
+    """Write a metrics file atomically (temporary file in the same directory, then rename)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logging.info(f"Metrics written to {path}")
+
+def start_http_server(port: int, render: Callable[[], str], host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve render() at /metrics from a background thread; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            payload = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
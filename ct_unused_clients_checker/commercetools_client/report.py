@@ -0,0 +1,166 @@
+"""
+Report stage: text reports of unused API clients, history reports and the run summary.
+
+Formatting (format_report) is separate from writing files (generate_*), so the
+daemon can serve the same reports from memory.
+"""
+
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from .config import DAYS_THRESHOLD
+
+if TYPE_CHECKING:
+    from .snapshots import SnapshotStore
+
+REPORT_FILENAME = 'reports/unused_api_clients_report_{}.txt'
+THRESHOLD_REPORT_FILENAME = 'reports/unused_api_clients_report_{}_{}d.txt'
+SUMMARY_FILENAME = 'reports/unused_api_clients_summary.txt'
+HISTORY_REPORT_FILENAME = 'reports/api_clients_history_{}.txt'
+
+def report_filename(project: str, days_threshold: Optional[int] = None) -> str:
+    """
+    Build the report file name of a project.
+
+    Args:
+        project (str): The project identifier.
+        days_threshold (Optional[int]): The threshold, added to the file name when given.
+
+    Returns:
+        str: The report file name.
+    """
+    project_name = project.lower().replace('_', '-')
+    if days_threshold is None:
+        return REPORT_FILENAME.format(project_name)
+    return THRESHOLD_REPORT_FILENAME.format(project_name, days_threshold)
+
+def format_report(unused_clients: List[Dict], project: Optional[str], days_threshold: Optional[int] = None) -> str:
+    """
+    Format the text of an unused API clients report.
+
+    Args:
+        unused_clients (List[Dict]): List of unused clients.
+        project (Optional[str]): The project identifier, None for a single unnamed project.
+        days_threshold (Optional[int]): The threshold, added to the title when given.
+
+    Returns:
+        str: The report text.
+    """
+    if project is None:
+        report_lines = ["Unused API Clients Report", "="*40, ""]
+    elif days_threshold is None:
+        report_lines = [f"Unused API Clients Report for {project}", "="*40, ""]
+    else:
+        report_lines = [f"Unused API Clients Report for {project} (not used for {days_threshold} days)", "="*40, ""]
+    report_lines.extend([
+        f"Client ID: {client['id']}\n"
+        f"Name: {client['name']}\n"
+        f"Last Used: {client['lastUsedAt']}\n"
+        "-------------------------"
+        for client in unused_clients
+    ])
+    return '\n'.join(report_lines)
+
+def generate_report(unused_clients: List[Dict], project: Optional[str], days_threshold: Optional[int] = None,
+                    filename: Optional[str] = None) -> str:
+    """
+    Generate a report of unused API clients.
+
+    Args:
+        unused_clients (List[Dict]): List of unused clients.
+        project (str): The project identifier.
+        days_threshold (Optional[int]): The threshold, added to the file name and title when given.
+        filename (Optional[str]): Write to this file instead of the project's report file.
+
+    Returns:
+        str: The report file name.
+    """
+    filename = report_filename(project, days_threshold) if filename is None else filename
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(format_report(unused_clients, project, days_threshold))
+    
+    logging.info(f"Report generated: {filename}")
+    print(f"Report generated: {filename}")
+    return filename
+
+def generate_history_report(store: 'SnapshotStore', project: str, thresholds: Sequence[int] = (DAYS_THRESHOLD,)) -> str:
+    """
+    Generate a trend report from the snapshot store, comparing the two latest runs.
+
+    The age histogram uses the thresholds as bucket bounds, like the age buckets
+    of the live check, and changes are reported against the first threshold.
+
+    Args:
+        store (SnapshotStore): The snapshot store.
+        project (str): The project identifier.
+        thresholds (Sequence[int]): Day thresholds of the check (see parse_thresholds).
+
+    Returns:
+        str: The report file name.
+    """
+    days_threshold = thresholds[0]
+    report_filename = HISTORY_REPORT_FILENAME.format(project.lower().replace('_', '-'))
+    report_lines = [f"API Clients History Report for {project}", "="*40, ""]
+
+    report_lines.append("Last-used age of current clients:")
+    report_lines.extend(f"  {label:>8}: {count}" for label, count in store.age_histogram(project, thresholds))
+
+    changes = store.changes(project, days_threshold)
+    if changes is None:
+        report_lines.extend(["", "Only one snapshot stored, no changes to report yet."])
+    else:
+        titles = {
+            'newly_unused': f"Newly unused (not used for {days_threshold} days since the previous run)",
+            'reactivated': "Reactivated (used again since the previous run)",
+            'created': "Created since the previous run",
+            'deleted': "Deleted since the previous run",
+        }
+        for key, title in titles.items():
+            report_lines.extend(["", f"{title}: {len(changes[key])}"])
+            report_lines.extend(
+                f"  {client['id']}  {client['name']}  (last used: {client['lastUsedAt']})"
+                for client in changes[key]
+            )
+
+    with open(report_filename, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(report_lines) + '\n')
+
+    logging.info(f"History report generated: {report_filename}")
+    print(f"History report generated: {report_filename}")
+    return report_filename
+
+def generate_summary(results: List[Dict]) -> str:
+    """
+    Generate a combined summary of all processed projects.
+
+    Args:
+        results (List[Dict]): Results returned by process_project.
+
+    Returns:
+        str: The summary file name.
+    """
+    thresholds = sorted({days for result in results for days in (result['unused'] or {})})
+    unused_headers = ' '.join(f"{f'>{days}d':>8}" for days in thresholds) if len(thresholds) > 1 else f"{'Unused':>8}"
+    summary_lines = ["Unused API Clients Summary", "="*40, ""]
+    summary_lines.append(f"{'Project':<30} {'Status':<8} {'Clients':>8} {unused_headers} {'Time':>8}")
+    for result in results:
+        unused = result['unused'] or {}
+        unused_columns = ' '.join(f"{unused.get(days, '-'):>8}" for days in thresholds or [None])
+        summary_lines.append(
+            f"{result['project']:<30} {result['status']:<8} "
+            f"{result['clients'] if result['clients'] is not None else '-':>8} "
+            f"{unused_columns} "
+            f"{result['duration']:>7.2f}s"
+        )
+    errors = [result for result in results if result['error']]
+    if errors:
+        summary_lines.extend(["", "Errors:"])
+        summary_lines.extend(f"  {result['project']}: {result['error']}" for result in errors)
+
+    with open(SUMMARY_FILENAME, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(summary_lines) + '\n')
+
+    logging.info(f"Summary generated: {SUMMARY_FILENAME}")
+    print('\n'.join(summary_lines))
+    print(f"Summary generated: {SUMMARY_FILENAME}")
+    return SUMMARY_FILENAME
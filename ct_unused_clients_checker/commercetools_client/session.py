@@ -0,0 +1,202 @@
+"""
+Pooled HTTP session for commercetools API calls.
+
+One requests.Session with keep-alive connection pooling is shared by all threads
+of a process, so repeated calls reuse TLS connections. On top of it:
+- a per-host concurrency limit (semaphore per host)
+- retries with exponential backoff and full jitter on connection errors,
+  timeouts, 429 and 5xx gateway errors, honoring Retry-After
+- default connect/read timeouts
+- per-endpoint and per-project request metrics (count, errors, retries, latency)
+"""
+
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import setting
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 30.0)  # (connect, read) seconds
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0
+DEFAULT_POOL_SIZE = 32
+DEFAULT_PER_HOST_LIMIT = 16
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def endpoint_name(url: str) -> str:
+    """Short endpoint label for metrics: the last path segment (e.g. 'token', 'api-clients')."""
+    path = urlsplit(url).path.rstrip('/')
+    return path.rsplit('/', 1)[-1] or '/'
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _new_stats() -> Dict[str, float]:
+    return {'requests': 0, 'errors': 0, 'retries': 0, 'seconds_total': 0.0, 'seconds_max': 0.0}
+
+def _update_stats(stats: Dict[str, float], seconds: float, status: Optional[int], retried: bool) -> None:
+    stats['requests'] += 1
+    stats['seconds_total'] += seconds
+    stats['seconds_max'] = max(stats['seconds_max'], seconds)
+    if status is None or status >= 400:
+        stats['errors'] += 1
+    if retried:
+        stats['retries'] += 1
+
+class RequestMetrics:
+    """Thread-safe request counters and latency totals per (host, endpoint) and per project."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._projects: Dict[str, Dict[str, float]] = {}
+
+    def record(self, host: str, endpoint: str, seconds: float, status: Optional[int], retried: bool,
+               project: Optional[str] = None) -> None:
+        """Record one HTTP attempt."""
+        with self._lock:
+            _update_stats(self._stats.setdefault((host, endpoint), _new_stats()), seconds, status, retried)
+            if project is not None:
+                _update_stats(self._projects.setdefault(project, _new_stats()), seconds, status, retried)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """Return a copy of the current counters per (host, endpoint)."""
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def project_snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Return a copy of the current counters per project key."""
+        with self._lock:
+            return {project: dict(stats) for project, stats in self._projects.items()}
+
+    def summary(self) -> str:
+        """Human readable one-line-per-endpoint summary."""
+        lines = []
+        for (host, endpoint), stats in sorted(self.snapshot().items()):
+            average = stats['seconds_total'] / stats['requests'] if stats['requests'] else 0.0
+            lines.append(
+                f"{host} {endpoint}: {stats['requests']} requests, {stats['errors']} errors, "
+                f"{stats['retries']} retries, avg {average * 1000:.0f} ms, max {stats['seconds_max'] * 1000:.0f} ms"
+            )
+        return '\n'.join(lines)
+
+class CommercetoolsSession:
+    """
+    Shared, pooled HTTP session with retries, backoff and per-host limits.
+
+    Example:
+        >>> session = get_default_session()
+        >>> response = session.get(url, headers=headers, params={'limit': 500})
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, per_host_limit: Optional[int] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, timeout: Tuple[float, float] = DEFAULT_TIMEOUT):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        # Read when the session is created, so a .env loaded by the entry point applies
+        self.per_host_limit = per_host_limit or setting('CTP_MAX_CONNECTIONS_PER_HOST', DEFAULT_PER_HOST_LIMIT, int)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.metrics = RequestMetrics()
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            return self._host_limits.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Delay before the next attempt: Retry-After if given, otherwise full-jitter exponential."""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, MAX_RETRY_AFTER)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method: str, url: str, project: Optional[str] = None, **kwargs):
+        """
+        Send a request, retrying transient failures.
+
+        Returns the final response (which may still be an error status once retries
+        are exhausted; callers use raise_for_status as before). Connection errors
+        and timeouts are re-raised after the last attempt. `project` attributes the
+        request to a project key in the metrics.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        endpoint = endpoint_name(url)
+        transient = (self._requests.exceptions.ConnectionError, self._requests.exceptions.Timeout)
+
+        for attempt in range(self.max_retries + 1):
+            response, error = None, None
+            started = time.perf_counter()
+            with self._host_limit(host):
+                try:
+                    response = self._session.request(method, url, **kwargs)
+                except transient as e:
+                    error = e
+            status = response.status_code if response is not None else None
+            self.metrics.record(host, endpoint, time.perf_counter() - started, status, attempt > 0, project)
+
+            if error is None and status not in RETRY_STATUSES:
+                return response
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff(attempt, response)
+            logging.warning(
+                f"{method} {endpoint} failed ({status or type(error).__name__}), "
+                f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs):
+        """Send a GET request."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """Send a POST request."""
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+
+def get_default_session() -> CommercetoolsSession:
+    """Return the process-wide session, created on first use."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = CommercetoolsSession()
+        return _default_session
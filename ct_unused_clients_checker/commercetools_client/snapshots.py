@@ -0,0 +1,241 @@
+"""
+Historical snapshot store for API client inventories.
+
+Every run's client inventory is stored in an embedded SQLite database, one row
+per (run, client) with timestamps as epoch seconds. Indexes on project, client
+id and timestamps let trend reports be computed from the store in milliseconds,
+without refetching anything from the API:
+- newly unused: used within the threshold in the previous run, unused now
+- reactivated: unused in the previous run, used within the threshold now
+- created / deleted: present in only one of the two runs
+- age histogram: clients per last-used age bucket
+
+Each thread opens its own connection; the database uses WAL mode so concurrent
+project workers can write their runs at the same time.
+"""
+
+import time
+import sqlite3
+import datetime
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    client_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_project_taken_at ON runs (project, taken_at);
+
+CREATE TABLE IF NOT EXISTS clients (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    project TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    name TEXT,
+    created_at INTEGER,
+    last_used_at INTEGER,
+    PRIMARY KEY (run_id, client_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_clients_project_client ON clients (project, client_id);
+CREATE INDEX IF NOT EXISTS idx_clients_run_last_used ON clients (run_id, last_used_at);
+"""
+
+DEFAULT_AGE_BUCKETS: Tuple[int, ...] = (7, 30, 90, 180)
+BATCH_SIZE = 1000
+DAY = 86400
+
+def to_epoch(value: Optional[str]) -> Optional[int]:
+    """Convert an ISO date or datetime string (as returned by the API) to epoch seconds, UTC."""
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value.rstrip('Z'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+def from_epoch(value: Optional[int]) -> str:
+    """Format epoch seconds as an ISO date, or 'Never used'."""
+    if value is None:
+        return 'Never used'
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+class SnapshotWriter:
+    """Streams the clients of one run into the store in batches."""
+
+    def __init__(self, connection: sqlite3.Connection, run_id: int, project: str):
+        self._connection = connection
+        self._batch: List[Tuple] = []
+        self.run_id = run_id
+        self.project = project
+        self.count = 0
+
+    def add(self, client: Dict) -> None:
+        """Add one API client of this run."""
+        self._batch.append((
+            self.run_id, self.project, client['id'], client.get('name'),
+            to_epoch(client.get('createdAt')), to_epoch(client.get('lastUsedAt')),
+        ))
+        self.count += 1
+        if len(self._batch) >= BATCH_SIZE:
+            self.flush()
+
+    def add_table(self, table) -> None:
+        """Add all clients of a ClientTable (see classify), reusing its parsed timestamps."""
+        from .classify import NEVER
+        for index in range(len(table)):
+            created, last_used = table.created[index], table.last_used[index]
+            self._batch.append((
+                self.run_id, self.project, table.ids[index], table.names[index],
+                None if created == NEVER else created, None if last_used == NEVER else last_used,
+            ))
+            if len(self._batch) >= BATCH_SIZE:
+                self.flush()
+        self.count += len(table)
+
+    def flush(self) -> None:
+        """Write the pending batch."""
+        if self._batch:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO clients (run_id, project, client_id, name, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._batch
+            )
+            self._batch = []
+
+class SnapshotStore:
+    """
+    SQLite-backed store of client inventories per project and run.
+
+    Example:
+        >>> store = SnapshotStore('reports/client_snapshots.db')
+        >>> with store.writer('PT_D2C_PRO_ESHOP_DEV') as writer:
+        ...     for client in clients:
+        ...         writer.add(client)
+        >>> store.changes('PT_D2C_PRO_ESHOP_DEV', days_threshold=30)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def writer(self, project: str, taken_at: Optional[int] = None) -> '_WriterContext':
+        """Start a new run for a project; use as a context manager and add() each client."""
+        return _WriterContext(self, project, taken_at or int(time.time()))
+
+    def runs(self, project: str, limit: int = 2) -> List[Tuple[int, int]]:
+        """Return the latest (run id, taken_at) pairs of a project, newest first."""
+        return self._connect().execute(
+            "SELECT id, taken_at FROM runs WHERE project = ? AND client_count IS NOT NULL "
+            "ORDER BY taken_at DESC, id DESC LIMIT ?",
+            (project, limit)
+        ).fetchall()
+
+    def changes(self, project: str, days_threshold: int) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Compare the two latest runs of a project.
+
+        Returns None when fewer than two runs are stored. Otherwise a dict with
+        'newly_unused', 'reactivated', 'created' and 'deleted' client lists.
+        """
+        runs = self.runs(project, 2)
+        if len(runs) < 2:
+            return None
+        (current, current_at), (previous, previous_at) = runs
+        current_cutoff = current_at - days_threshold * DAY
+        previous_cutoff = previous_at - days_threshold * DAY
+        connection = self._connect()
+
+        def query(sql: str, params: Sequence) -> List[Dict]:
+            return [
+                {'id': row[0], 'name': row[1], 'lastUsedAt': from_epoch(row[2])}
+                for row in connection.execute(sql, params)
+            ]
+
+        both = ("SELECT c.client_id, c.name, c.last_used_at FROM clients c "
+                "JOIN clients p ON p.run_id = ? AND p.client_id = c.client_id "
+                "WHERE c.run_id = ? AND ")
+        return {
+            'newly_unused': query(
+                both + "(c.last_used_at IS NULL OR c.last_used_at < ?) "
+                "AND p.last_used_at >= ? ORDER BY c.client_id",
+                (previous, current, current_cutoff, previous_cutoff)
+            ),
+            'reactivated': query(
+                both + "c.last_used_at >= ? "
+                "AND (p.last_used_at IS NULL OR p.last_used_at < ?) ORDER BY c.client_id",
+                (previous, current, current_cutoff, previous_cutoff)
+            ),
+            'created': query(
+                "SELECT client_id, name, last_used_at FROM clients c WHERE run_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM clients p WHERE p.run_id = ? AND p.client_id = c.client_id) ORDER BY client_id",
+                (current, previous)
+            ),
+            'deleted': query(
+                "SELECT client_id, name, last_used_at FROM clients p WHERE run_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM clients c WHERE c.run_id = ? AND c.client_id = p.client_id) ORDER BY client_id",
+                (previous, current)
+            ),
+        }
+
+    def age_histogram(self, project: str, buckets: Sequence[int] = DEFAULT_AGE_BUCKETS) -> List[Tuple[str, int]]:
+        """
+        Count clients of the latest run per last-used age bucket.
+
+        Buckets are upper bounds in days, e.g. (7, 30) gives '<7d', '7-30d', '>=30d' and 'never'.
+        A client last used exactly N days before the run is still below N days, as in
+        Classification, where unused means last used strictly before the cutoff.
+        """
+        runs = self.runs(project, 1)
+        if not runs:
+            return []
+        run_id, taken_at = runs[0]
+        bounds = sorted(buckets)
+        labels = [f"<{bounds[0]}d"] + [f"{low}-{high}d" for low, high in zip(bounds, bounds[1:])]
+        cases = ' '.join("WHEN last_used_at >= ? THEN ?" for _ in bounds)
+        params: List = [value for bound, label in zip(bounds, labels) for value in (taken_at - bound * DAY, label)]
+        labels.extend([f">={bounds[-1]}d", 'never'])
+        sql = (
+            f"SELECT CASE WHEN last_used_at IS NULL THEN 'never' {cases} ELSE '{labels[-2]}' END AS bucket, "
+            "COUNT(*) FROM clients WHERE run_id = ? GROUP BY bucket"
+        )
+        counts = dict(self._connect().execute(sql, params + [run_id]).fetchall())
+        return [(label, counts.get(label, 0)) for label in labels]
+
+class _WriterContext:
+    """Context manager creating a run, streaming its clients and committing it at the end."""
+
+    def __init__(self, store: SnapshotStore, project: str, taken_at: int):
+        self._store = store
+        self._project = project
+        self._taken_at = taken_at
+        self._writer: Optional[SnapshotWriter] = None
+
+    def __enter__(self) -> SnapshotWriter:
+        connection = self._store._connect()
+        cursor = connection.execute(
+            "INSERT INTO runs (project, taken_at) VALUES (?, ?)", (self._project, self._taken_at)
+        )
+        self._writer = SnapshotWriter(connection, cursor.lastrowid, self._project)
+        return self._writer
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        connection = self._store._connect()
+        if exc_type is not None:
+            connection.rollback()
+            return
+        self._writer.flush()
+        connection.execute("UPDATE runs SET client_count = ? WHERE id = ?", (self._writer.count, self._writer.run_id))
+        connection.commit()
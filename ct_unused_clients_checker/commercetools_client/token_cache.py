@@ -0,0 +1,185 @@
+"""
+OAuth token cache for commercetools client-credentials tokens.
+
+Tokens are cached per (auth URL, client id, scopes), reused until shortly before
+they expire and refreshed ahead of expiry. One cache is shared by all threads of
+a process; concurrent requests for the same key wait for a single token fetch.
+
+Optionally the cache is persisted to a local JSON file (permissions 0600) so cron
+runs can reuse tokens across processes. Set CTP_TOKEN_CACHE_FILE to enable this for
+the default cache. Only tokens and their expiry are stored, never client secrets.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+# Refresh this long before expiry, at most 10% of the token lifetime
+REFRESH_AHEAD_SECONDS = 300
+TOKEN_CACHE_FILE_ENV = 'CTP_TOKEN_CACHE_FILE'
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def token_url(auth_url: str) -> str:
+    """Return the token endpoint for an auth URL, appending /oauth/token if missing."""
+    auth_url = auth_url.rstrip('/')
+    if auth_url.endswith('/oauth/token'):
+        return auth_url
+    return auth_url + '/oauth/token'
+
+def fetch_token(auth_url: str, client_id: str, client_secret: str, scopes: str,
+                post: Optional[Callable] = None) -> Dict:
+    """
+    Request a new client-credentials token.
+
+    Args:
+        auth_url (str): The auth URL, with or without /oauth/token.
+        client_id (str): The API client id.
+        client_secret (str): The API client secret.
+        scopes (str): Space separated scopes.
+        post (Optional[Callable]): Function used for the POST request, the shared session by default.
+
+    Returns:
+        Dict: The token response, including access_token and expires_in.
+
+    Raises:
+        requests.exceptions.RequestException: If the token request fails.
+    """
+    if post is None:
+        from .session import get_default_session
+        post = get_default_session().post
+    response = post(
+        token_url(auth_url),
+        auth=(client_id, client_secret),
+        data={'grant_type': 'client_credentials', 'scope': scopes}
+    )
+    response.raise_for_status()
+    return response.json()
+
+class TokenCache:
+    """
+    Thread-safe token cache with expiry, refresh-ahead and optional file persistence.
+
+    Example:
+        >>> cache = TokenCache()
+        >>> token = cache.get_token(auth_url, client_id, client_secret, scopes)
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_ahead: int = REFRESH_AHEAD_SECONDS):
+        self.path = path
+        self.refresh_ahead = refresh_ahead
+        self._tokens: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        if path:
+            self._tokens.update(self._load())
+
+    @staticmethod
+    def key(auth_url: str, client_id: str, scopes: str) -> str:
+        """Build the cache key for a token."""
+        return '|'.join((token_url(auth_url), client_id, ' '.join(sorted((scopes or '').split()))))
+
+    def get_token(self, auth_url: str, client_id: str, client_secret: str, scopes: str,
+                  fetch: Optional[Callable[[], Dict]] = None) -> str:
+        """
+        Return a valid access token, fetching a new one only when needed.
+
+        Args:
+            auth_url (str): The auth URL.
+            client_id (str): The API client id.
+            client_secret (str): The API client secret.
+            scopes (str): Space separated scopes.
+            fetch (Optional[Callable[[], Dict]]): Returns a token response; fetch_token by default.
+
+        Returns:
+            str: The access token.
+        """
+        key = self.key(auth_url, client_id, scopes)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._tokens.get(key)
+            if entry and entry['refresh_at'] > time.time():
+                return entry['access_token']
+
+            logging.info("Requesting access token")
+            if fetch is None:
+                response = fetch_token(auth_url, client_id, client_secret, scopes)
+            else:
+                response = fetch()
+            now = time.time()
+            expires_in = float(response.get('expires_in', 0))
+            entry = {
+                'access_token': response['access_token'],
+                'expires_at': now + expires_in,
+                'refresh_at': now + expires_in - min(self.refresh_ahead, expires_in * 0.1),
+            }
+            with self._lock:
+                self._tokens[key] = entry
+            if self.path:
+                self._save(key, entry)
+            logging.info("Access token obtained successfully")
+            return entry['access_token']
+
+    def invalidate(self, auth_url: str, client_id: str, scopes: str) -> None:
+        """Drop a cached token, e.g. after the API rejected it with 401."""
+        with self._lock:
+            self._tokens.pop(self.key(auth_url, client_id, scopes), None)
+
+    def _load(self) -> Dict[str, Dict]:
+        """Read unexpired tokens from the cache file; a missing or broken file means an empty cache."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {
+            key: entry for key, entry in data.items()
+            if isinstance(entry, dict) and entry.get('expires_at', 0) > now and 'access_token' in entry
+        }
+
+    def _save(self, key: str, entry: Dict) -> None:
+        """Merge one entry into the cache file, written atomically with 0600 permissions."""
+        with self._lock:
+            tokens = self._load()
+            tokens[key] = entry
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-cache.', suffix='.tmp')
+                try:
+                    os.fchmod(fd, 0o600)
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(tokens, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+            except OSError as e:
+                logging.warning(f"Unable to persist token cache to {self.path}: {e}")
+
+def get_default_cache() -> TokenCache:
+    """Return the process-wide cache, persisted when CTP_TOKEN_CACHE_FILE is set."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TokenCache(os.getenv(TOKEN_CACHE_FILE_ENV))
+        return _default_cache
+
+def configure_default_cache(path: Optional[str]) -> TokenCache:
+    """Replace the process-wide cache, e.g. with one persisted to a path given on the command line."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = TokenCache(path)
+        return _default_cache
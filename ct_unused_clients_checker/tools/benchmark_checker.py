@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of the unused clients checker against the fake API.
+
+For every client count and pagination strategy a fresh fake server
+(tools/fake_ctp_server.py) is started in a separate process, and the checker's
+process_project() runs against it in-process: token request, listing, classification
+and report. Two runs are made per case: one for wall time, one under tracemalloc
+for the peak Python memory of the checker (the server runs in its own process, so
+it is not counted).
+
+Reported per case: wall time, HTTP requests seen by the server (and 429 responses),
+clients retrieved, unused clients and peak memory. A case that does not retrieve
+every client is a failure, and any failure makes the exit code 1.
+
+Usage:
+    ./tools/benchmark_checker.py [--sizes 10,1000,100000] [--pagination offset,keyset]
+                                 [--latency 0.005] [--rate-limit-every N] [--json results.json]
+
+Example:
+    # Default matrix: 10, 1k and 100k clients, both pagination strategies
+    ./tools/benchmark_checker.py
+
+    # Reproduce throttling: every 20th listing request gets 429 with Retry-After: 1
+    ./tools/benchmark_checker.py --sizes 10000 --pagination keyset --rate-limit-every 20
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+import tracemalloc
+import urllib.request
+from typing import Dict, List
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKER_DIR = os.path.dirname(TOOLS_DIR)
+PROJECT = 'PT_D2C_PRO_ESHOP_DEV'
+
+def load_checker():
+    """Import the check stages and set up logging like the checker script does."""
+    sys.path.insert(0, CHECKER_DIR)
+    from commercetools_client import checker, config
+    config.setup('logs/commercetools_api_client_check.log', ['reports'])
+    return checker
+
+def reset_token_cache() -> None:
+    """Start with an empty token cache, so every run includes one token request."""
+    from commercetools_client.token_cache import configure_default_cache
+    configure_default_cache(None)
+
+def start_server(clients: int, latency: float, rate_limit_every: int, retry_after: float):
+    """Start the fake server on a free port; returns (process, base URL)."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(TOOLS_DIR, 'fake_ctp_server.py'), '--port', '0',
+         '--clients', str(clients), '--latency', str(latency),
+         '--rate-limit-every', str(rate_limit_every), '--retry-after', str(retry_after)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if 'listening on ' not in line:
+        process.kill()
+        raise RuntimeError(f"Fake server failed to start: {line!r}")
+    return process, line.rsplit('listening on ', 1)[1].strip()
+
+def server_stats(url: str) -> Dict[str, int]:
+    """Fetch the fake server's request counters."""
+    with urllib.request.urlopen(f'{url}/_stats') as response:
+        return json.load(response)
+
+def run_case(checker, clients: int, pagination: str, args) -> Dict:
+    """Benchmark one (client count, pagination) case against a fresh server."""
+    process, url = start_server(clients, args.latency, args.rate_limit_every, args.retry_after)
+    try:
+        for name, value in {
+            'CTP_PROJECT_KEY': 'fake-project', 'CTP_CLIENT_ID': 'fake-client', 'CTP_CLIENT_SECRET': 'fake-secret',
+            'CTP_AUTH_URL': url, 'CTP_API_URL': url, 'CTP_SCOPES': 'view_api_clients:fake-project',
+        }.items():
+            os.environ[f'{PROJECT}_{name}'] = value
+
+        reset_token_cache()
+        started = time.perf_counter()
+        result = checker.process_project(PROJECT, args.concurrency, pagination)
+        wall = time.perf_counter() - started
+        stats = server_stats(url)
+
+        reset_token_cache()
+        tracemalloc.start()
+        checker.process_project(PROJECT, args.concurrency, pagination)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        process.terminate()
+        process.wait()
+
+    status, error = result['status'], result['error']
+    if status == 'ok' and result['clients'] != clients:
+        status, error = 'partial', f"retrieved {result['clients']} of {clients} clients"
+    return {
+        'clients': clients,
+        'pagination': pagination,
+        'status': status,
+        'error': error,
+        'wall_seconds': round(wall, 4),
+        'requests': sum(count for key, count in stats.items() if key != 'total' and not key.startswith('stats ')),
+        'throttled': sum(count for key, count in stats.items() if key.endswith(' 429')),
+        'retrieved': result['clients'],
+        'unused': result['unused'],
+        'peak_memory_mib': round(peak / 1024 / 1024, 2),
+    }
+
+def print_results(results: List[Dict]) -> None:
+    """Print the results as a table."""
+    print(f"\n{'Clients':>8} {'Mode':<7} {'Status':<7} {'Wall':>9} {'Requests':>9} {'429':>5} "
+          f"{'Retrieved':>10} {'Peak MiB':>9}")
+    for result in results:
+        print(f"{result['clients']:>8} {result['pagination']:<7} {result['status']:<7} "
+              f"{result['wall_seconds']:>8.3f}s {result['requests']:>9} {result['throttled']:>5} "
+              f"{result['retrieved'] if result['retrieved'] is not None else '-':>10} "
+              f"{result['peak_memory_mib']:>9.2f}")
+        if result['error']:
+            print(f"         error: {result['error']}")
+
+def main():
+    """Parse arguments, run the benchmark matrix and print or save the results."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the unused clients checker against a fake commercetools API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--sizes', default='10,1000,100000', help='Comma separated client counts (default: 10,1000,100000)')
+    parser.add_argument('--pagination', default='offset,keyset', help='Comma separated strategies (default: offset,keyset)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Pages fetched in parallel (default: 4)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds of latency per request (default: 0.005)')
+    parser.add_argument('--rate-limit-every', type=int, default=0, metavar='N',
+                        help='Answer every Nth listing request with 429 (default: 0, disabled)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429 (default: 1)')
+    parser.add_argument('--json', help='Also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    modes = [mode.strip() for mode in args.pagination.split(',')]
+    # Resolved before the working directory changes below
+    json_file = os.path.abspath(args.json) if args.json else None
+
+    # The checker writes logs and reports relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='ctp-benchmark-')
+    os.chdir(workdir)
+    checker = load_checker()
+
+    results = []
+    for size in sizes:
+        for mode in modes:
+            print(f"Running {size} clients, {mode} pagination...", flush=True)
+            results.append(run_case(checker, size, mode, args))
+
+    print_results(results)
+    print(f"\nReports and logs: {workdir}")
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"JSON results written to {json_file}")
+
+    failed = [result for result in results if result['status'] != 'ok']
+    if failed:
+        print(f"\n{len(failed)} case(s) failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
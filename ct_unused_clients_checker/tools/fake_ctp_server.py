@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+"""
+Fake commercetools API for local tests and benchmarks.
+
+Serves the two endpoints used by the checker, for any project key:
+- POST /oauth/token             client-credentials tokens with a configurable lifetime
+- GET  /{project}/api-clients   paged listing with limit, offset, sort, where (id > "...")
+                                and withTotal, like the real API
+
+Behaviour is configurable to reproduce production conditions:
+- number of API clients (generated deterministically, ~10% never used)
+- latency added to every request
+- maximum page size and maximum offset (400 errors beyond them)
+- 429 responses with Retry-After on every Nth listing request
+- token expiry: requests with expired or unknown tokens get 401
+
+GET /_stats returns request counters per endpoint and status as JSON.
+
+Usage:
+    ./tools/fake_ctp_server.py [--port 8080] [--clients 1000] [--latency 0.02]
+                               [--max-limit 500] [--rate-limit-every 50] [--retry-after 1]
+                               [--token-ttl 172800]
+
+Example:
+    ./tools/fake_ctp_server.py --clients 100000 --latency 0.01 &
+    export PT_D2C_PRO_ESHOP_DEV_CTP_AUTH_URL=http://127.0.0.1:8080
+    export PT_D2C_PRO_ESHOP_DEV_CTP_API_URL=http://127.0.0.1:8080
+"""
+
+import re
+import json
+import time
+import random
+import secrets
+import argparse
+import datetime
+import threading
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_MAX_LIMIT = 500
+DEFAULT_MAX_OFFSET = 10000
+DEFAULT_TOKEN_TTL = 172800  # Lifetime of real commercetools tokens (48 hours)
+
+WHERE_ID_PATTERN = re.compile(r'^\(?\s*id\s*>\s*"([^"]*)"\s*\)?$')
+SORT_PATTERN = re.compile(r'^(\w+)\s+(asc|desc)$')
+
+def generate_clients(count: int, seed: int = 0) -> List[Dict]:
+    """Generate `count` API clients sorted by id, with last use spread over the past year."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    clients = []
+    for number in range(count):
+        created = today - datetime.timedelta(days=rng.randint(30, 1000))
+        client = {
+            'id': f'{number:08x}-{rng.getrandbits(32):08x}',
+            'name': f'client-{number}',
+            'scope': 'view_products:fake-project',
+            'createdAt': f'{created.isoformat()}T00:00:00.000Z',
+        }
+        if rng.random() >= 0.1:
+            client['lastUsedAt'] = (today - datetime.timedelta(days=rng.randint(0, 365))).isoformat()
+        clients.append(client)
+    clients.sort(key=lambda client: client['id'])
+    return clients
+
+class FakeCommercetools:
+    """
+    In-process fake commercetools server running in a background thread.
+
+    Example:
+        >>> with FakeCommercetools(clients=1000, latency=0.01) as server:
+        ...     os.environ['PT_D2C_PRO_ESHOP_DEV_CTP_API_URL'] = server.url
+        ...     ...
+        ...     server.stats()
+    """
+
+    def __init__(self, clients: int = 1000, latency: float = 0.0, max_limit: int = DEFAULT_MAX_LIMIT,
+                 max_offset: int = DEFAULT_MAX_OFFSET, rate_limit_every: int = 0, retry_after: float = 1.0,
+                 token_ttl: int = DEFAULT_TOKEN_TTL, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.clients = generate_clients(clients, seed)
+        self.ids = [client['id'] for client in self.clients]
+        self.latency = latency
+        self.max_limit = max_limit
+        self.max_offset = max_offset
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self._tokens: Dict[str, float] = {}
+        self._sorted: Dict[Tuple[str, str], List[Dict]] = {}
+        self._stats: Dict[str, int] = {}
+        self._listing_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL, used as both the auth URL and the API URL."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeCommercetools':
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeCommercetools':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Request counters, keyed by '<endpoint> <status>' plus 'total'."""
+        with self._lock:
+            return dict(self._stats)
+
+    def expire_tokens(self) -> None:
+        """Expire all issued tokens, e.g. to test 401 handling."""
+        with self._lock:
+            self._tokens.clear()
+
+    def _count(self, endpoint: str, status: int) -> None:
+        with self._lock:
+            key = f'{endpoint} {status}'
+            self._stats[key] = self._stats.get(key, 0) + 1
+            self._stats['total'] = self._stats.get('total', 0) + 1
+
+    def issue_token(self) -> Dict:
+        """Create a new access token."""
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._tokens[token] = time.time() + self.token_ttl
+        return {'access_token': token, 'token_type': 'Bearer', 'expires_in': self.token_ttl,
+                'scope': 'view_api_clients:fake-project'}
+
+    def token_valid(self, authorization: Optional[str]) -> bool:
+        """Check a Bearer authorization header against the issued, unexpired tokens."""
+        if not authorization or not authorization.startswith('Bearer '):
+            return False
+        with self._lock:
+            expires_at = self._tokens.get(authorization[len('Bearer '):])
+        return expires_at is not None and expires_at > time.time()
+
+    def rate_limited(self) -> bool:
+        """True for every Nth listing request when 429 injection is enabled."""
+        if not self.rate_limit_every:
+            return False
+        with self._lock:
+            self._listing_requests += 1
+            return self._listing_requests % self.rate_limit_every == 0
+
+    def list_clients(self, params: Dict[str, str]) -> Tuple[int, Dict]:
+        """Answer a paged api-clients query; returns (status, body)."""
+        try:
+            limit = int(params.get('limit', 20))
+            offset = int(params.get('offset', 0))
+        except ValueError:
+            return 400, error_body(400, 'InvalidInput', 'limit and offset must be integers')
+        if not 0 <= limit <= self.max_limit:
+            return 400, error_body(400, 'InvalidInput', f'limit must be between 0 and {self.max_limit}')
+        if not 0 <= offset <= self.max_offset:
+            return 400, error_body(400, 'InvalidInput', f'offset must be between 0 and {self.max_offset}')
+
+        sort = params.get('sort', 'id asc')
+        match = SORT_PATTERN.match(sort)
+        if not match:
+            return 400, error_body(400, 'InvalidInput', f'Unsupported sort: {sort}')
+        clients = self._sorted_clients(match.group(1), match.group(2))
+
+        where = params.get('where')
+        if where:
+            match = WHERE_ID_PATTERN.match(where)
+            if not match or sort != 'id asc':
+                return 400, error_body(400, 'InvalidInput', f'Unsupported where predicate: {where}')
+            clients = clients[bisect_right(self.ids, match.group(1)):]
+
+        page = clients[offset:offset + limit]
+        body = {'limit': limit, 'offset': offset, 'count': len(page), 'results': page}
+        if params.get('withTotal', 'true') != 'false':
+            body['total'] = len(clients)
+        return 200, body
+
+    def _sorted_clients(self, field: str, direction: str) -> List[Dict]:
+        """Clients sorted by a field (missing values first ascending, last descending), cached."""
+        if field == 'id' and direction == 'asc':
+            return self.clients
+        with self._lock:
+            cached = self._sorted.get((field, direction))
+        if cached is None:
+            cached = sorted(self.clients, key=lambda client: (field in client, client.get(field, ''), client['id']),
+                            reverse=direction == 'desc')
+            with self._lock:
+                self._sorted[(field, direction)] = cached
+        return cached
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, endpoint: str, status: int, body: Dict, headers: Optional[Dict] = None) -> None:
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+                fake._count(endpoint, status)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if urlsplit(self.path).path.rstrip('/') != '/oauth/token':
+                    self.send_json('other', 404, error_body(404, 'ResourceNotFound', self.path))
+                elif not self.headers.get('Authorization', '').startswith('Basic '):
+                    self.send_json('token', 401, error_body(401, 'invalid_client', 'Missing client credentials'))
+                else:
+                    self.send_json('token', 200, fake.issue_token())
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == '/_stats':
+                    self.send_json('stats', 200, fake.stats())
+                    return
+                if fake.latency:
+                    time.sleep(fake.latency)
+                parts = url.path.strip('/').split('/')
+                if len(parts) != 2 or parts[1] != 'api-clients':
+                    self.send_json('other', 404, error_body(404, 'ResourceNotFound', url.path))
+                elif not fake.token_valid(self.headers.get('Authorization')):
+                    self.send_json('api-clients', 401, error_body(401, 'invalid_token', 'invalid_token'))
+                elif fake.rate_limited():
+                    self.send_json('api-clients', 429, error_body(429, 'TooManyRequests', 'Too many requests'),
+                                   {'Retry-After': f'{fake.retry_after:g}'})
+                else:
+                    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    status, body = fake.list_clients(params)
+                    self.send_json('api-clients', status, body)
+
+        return Handler
+
+def error_body(status: int, code: str, message: str) -> Dict:
+    """Build an error response in the commercetools format."""
+    return {'statusCode': status, 'message': message, 'errors': [{'code': code, 'message': message}]}
+
+def main():
+    """Parse arguments and serve until interrupted."""
+    parser = argparse.ArgumentParser(
+        description='Fake commercetools API for local tests and benchmarks',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on, 0 for any free port (default: 8080)')
+    parser.add_argument('--clients', type=int, default=1000, help='Number of API clients (default: 1000)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request (default: 0)')
+    parser.add_argument('--max-limit', type=int, default=DEFAULT_MAX_LIMIT,
+                        help=f'Maximum page size (default: {DEFAULT_MAX_LIMIT})')
+    parser.add_argument('--max-offset', type=int, default=DEFAULT_MAX_OFFSET,
+                        help=f'Maximum offset (default: {DEFAULT_MAX_OFFSET})')
+    parser.add_argument('--rate-limit-every', type=int, default=0, metavar='N',
+                        help='Answer every Nth listing request with 429 (default: 0, disabled)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429 (default: 1)')
+    parser.add_argument('--token-ttl', type=int, default=DEFAULT_TOKEN_TTL,
+                        help=f'Token lifetime in seconds (default: {DEFAULT_TOKEN_TTL})')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated clients (default: 0)')
+    args = parser.parse_args()
+
+    server = FakeCommercetools(
+        clients=args.clients, latency=args.latency, max_limit=args.max_limit, max_offset=args.max_offset,
+        rate_limit_every=args.rate_limit_every, retry_after=args.retry_after, token_ttl=args.token_ttl,
+        host=args.host, port=args.port, seed=args.seed
+    )
+    print(f"Fake commercetools API with {len(server.clients)} clients listening on {server.url}", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Compiled IP Allowlist Lookups
+
+Reads the binary allowlist written by ip_extractor.py (--allowlist) and answers
+membership queries without parsing anything: the file is mapped into memory and
+searched in place, so loading takes microseconds whatever its size.
+
+File format (little-endian):
+    header   magic b'IPAL', format version (u8), 3 reserved bytes,
+             IPv4 interval count (u64), IPv6 interval count (u64)
+    IPv4     interval starts, then interval ends (u32 each)
+    IPv6     starts high 64 bits, starts low 64 bits, ends high 64 bits,
+             ends low 64 bits (u64 each, four arrays)
+
+The intervals are sorted, merged and non-overlapping (see build_interval_index in
+ip_extractor.py), so a lookup is one binary search over the starts and one
+comparison with the end of the interval found. contains_many() searches a whole
+numpy array of IPv4 addresses at once with numpy.searchsorted.
+
+Usage:
+    ./ip_allowlist.py ALLOWLIST [IP ...] [--stdin] [--info]
+
+Examples:
+    # Check addresses, the exit code is 1 if any of them is not allowed
+    ./ip_allowlist.py unique_ip_addresses.ipal 10.1.2.3 2001:db8::1
+
+    # Annotate a stream of client IPs, one per line
+    cut -d' ' -f1 access.log | ./ip_allowlist.py unique_ip_addresses.ipal --stdin
+
+    # From Python
+    >>> with Allowlist('unique_ip_addresses.ipal') as allowlist:
+    ...     allowlist.contains('10.1.2.3')
+"""
+
+import os
+import sys
+import mmap
+import socket
+import struct
+import argparse
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from ipaddress import IPv4Address, IPv6Address
+from typing import Dict, Iterable, List, Tuple, Union
+
+MAGIC = b'IPAL'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sB3xQQ')
+DEFAULT_EXTENSION = '.ipal'
+
+LOW_64 = (1 << 64) - 1
+MAX_IPV4 = (1 << 32) - 1
+
+Address = Union[str, int, IPv4Address, IPv6Address]
+IntervalIndex = Dict[int, List[Tuple[int, int]]]
+
+def _little_endian(values: array) -> bytes:
+    """The raw bytes of an array in little-endian order."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def write_allowlist(index: IntervalIndex, output_file: str) -> None:
+    """
+    Write an interval index as a compiled allowlist, atomically.
+
+    Readers may have the previous version mapped, so the new file is written next
+    to it and moved into place instead of being rewritten in place.
+
+    Args:
+        index (IntervalIndex): Sorted, merged (start, end) intervals per address family,
+            as returned by ip_extractor.build_interval_index().
+        output_file (str): Path of the allowlist file.
+    """
+    ipv4 = index.get(4, [])
+    ipv6 = index.get(6, [])
+    sections = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(ipv4), len(ipv6)),
+        _little_endian(array('I', (start for start, _ in ipv4))),
+        _little_endian(array('I', (end for _, end in ipv4))),
+        _little_endian(array('Q', (start >> 64 for start, _ in ipv6))),
+        _little_endian(array('Q', (start & LOW_64 for start, _ in ipv6))),
+        _little_endian(array('Q', (end >> 64 for _, end in ipv6))),
+        _little_endian(array('Q', (end & LOW_64 for _, end in ipv6))),
+    ]
+
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(output_file) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for section in sections:
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def parse_address(ip: str) -> Tuple[int, int]:
+    """
+    Parse an IP address string into (version, integer value).
+
+    inet_pton is several times faster than ipaddress.ip_address, which matters
+    when streaming log lines.
+
+    Raises:
+        ValueError: If the string is not a valid IPv4 or IPv6 address.
+    """
+    try:
+        if ':' in ip:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except (OSError, TypeError):
+        raise ValueError(f"{ip!r} does not appear to be an IPv4 or IPv6 address") from None
+
+class Allowlist:
+    """
+    Membership lookups in a compiled allowlist file.
+
+    Integers are IPv4 addresses; IPv6 addresses are passed as strings or
+    IPv6Address objects.
+
+    Args:
+        path (str): Path of a file written by write_allowlist().
+
+    Raises:
+        ValueError: If the file is not a valid allowlist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not an allowlist file (too short)")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.ipv4_count, self.ipv6_count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not an allowlist file (bad magic {magic!r})")
+        if version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        expected = HEADER.size + 8 * self.ipv4_count + 32 * self.ipv6_count
+        if size != expected:
+            self._mmap.close()
+            raise ValueError(f"{path} is truncated or corrupt ({size} bytes, expected {expected})")
+
+        self._view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._ipv4_offset = offset
+        self._starts4, offset = self._section(offset, 'I', self.ipv4_count)
+        self._ends4, offset = self._section(offset, 'I', self.ipv4_count)
+        self._starts6_high, offset = self._section(offset, 'Q', self.ipv6_count)
+        self._starts6_low, offset = self._section(offset, 'Q', self.ipv6_count)
+        self._ends6_high, offset = self._section(offset, 'Q', self.ipv6_count)
+        self._ends6_low, offset = self._section(offset, 'Q', self.ipv6_count)
+
+    def _section(self, offset: int, typecode: str, count: int):
+        """A view of `count` integers at `offset`, read in place on little-endian hosts."""
+        end = offset + array(typecode).itemsize * count
+        if sys.byteorder == 'big':
+            values = array(typecode, self._view[offset:end].tobytes())
+            values.byteswap()
+            return values, end
+        return self._view[offset:end].cast(typecode), end
+
+    def close(self) -> None:
+        """Release the memory map."""
+        if self._mmap.closed:
+            return
+        for name in ('_starts4', '_ends4', '_starts6_high', '_starts6_low', '_ends6_high', '_ends6_low'):
+            values = getattr(self, name)
+            if isinstance(values, memoryview):
+                values.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> 'Allowlist':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.ipv4_count + self.ipv6_count
+
+    def contains_ipv4(self, value: int) -> bool:
+        """Check an IPv4 address given as integer."""
+        i = bisect_right(self._starts4, value) - 1
+        return i >= 0 and value <= self._ends4[i]
+
+    def contains_ipv6(self, value: int) -> bool:
+        """Check an IPv6 address given as integer."""
+        high, low = value >> 64, value & LOW_64
+        # Intervals starting with the same high 64 bits are searched by their low 64 bits
+        first = bisect_left(self._starts6_high, high)
+        last = bisect_right(self._starts6_high, high, first)
+        i = bisect_right(self._starts6_low, low, first, last) - 1
+        if i < first:
+            i = first - 1
+        if i < 0:
+            return False
+        end_high = self._ends6_high[i]
+        return high < end_high or (high == end_high and low <= self._ends6_low[i])
+
+    def contains(self, ip: Address) -> bool:
+        """
+        Check whether an address is covered by the allowlist.
+
+        Args:
+            ip (Address): An address string, an IPv4 address as integer,
+                or an IPv4Address/IPv6Address.
+
+        Raises:
+            ValueError: If a string is not a valid IP address.
+        """
+        if isinstance(ip, int):
+            return 0 <= ip <= MAX_IPV4 and self.contains_ipv4(ip)
+        if isinstance(ip, str):
+            version, value = parse_address(ip)
+        else:
+            version, value = ip.version, int(ip)
+        return self.contains_ipv4(value) if version == 4 else self.contains_ipv6(value)
+
+    def contains_many(self, ips: Iterable[Address]):
+        """
+        Check many addresses at once.
+
+        A numpy integer array is treated as IPv4 addresses and searched vectorized,
+        returning a boolean array; any other iterable returns a list of bools.
+
+        Args:
+            ips: A numpy array of IPv4 addresses, or an iterable of addresses
+                accepted by contains().
+
+        Returns:
+            A numpy boolean array or a list of bools, in input order.
+        """
+        # A numpy array can only come from a caller that imported numpy already
+        numpy = sys.modules.get('numpy')
+        if numpy is not None and isinstance(ips, numpy.ndarray) and ips.dtype.kind in 'iu':
+            return self._contains_many_numpy(numpy, ips)
+        # Inlined IPv4 search for integers, the common case when enriching logs
+        starts, ends, contains = self._starts4, self._ends4, self.contains
+        found = []
+        append = found.append
+        for ip in ips:
+            if type(ip) is int and 0 <= ip <= MAX_IPV4:
+                i = bisect_right(starts, ip) - 1
+                append(i >= 0 and ip <= ends[i])
+            else:
+                append(contains(ip))
+        return found
+
+    def _contains_many_numpy(self, numpy, values):
+        starts = numpy.frombuffer(self._mmap, dtype='<u4', count=self.ipv4_count, offset=self._ipv4_offset)
+        ends = numpy.frombuffer(self._mmap, dtype='<u4', count=self.ipv4_count,
+                                offset=self._ipv4_offset + 4 * self.ipv4_count)
+        addresses = values.astype(numpy.uint32, copy=False)
+        if not self.ipv4_count:
+            return numpy.zeros(addresses.shape, dtype=bool)
+        i = numpy.searchsorted(starts, addresses, side='right') - 1
+        found = (i >= 0) & (addresses <= ends[numpy.maximum(i, 0)])
+        if values.dtype.kind == 'i' or values.dtype.itemsize > 4:
+            # Values outside the IPv4 range wrapped around in the cast above
+            found &= (values >= 0) & (values <= MAX_IPV4)
+        return found
+
+    def intervals(self, version: int) -> List[Tuple[int, int]]:
+        """The (start, end) intervals of one address family, e.g. for inspection or tests."""
+        if version == 4:
+            return list(zip(self._starts4, self._ends4))
+        return [((start_high << 64) | start_low, (end_high << 64) | end_low)
+                for start_high, start_low, end_high, end_low
+                in zip(self._starts6_high, self._starts6_low, self._ends6_high, self._ends6_low)]
+
+def main():
+    """Check addresses given as arguments or on stdin against an allowlist."""
+    parser = argparse.ArgumentParser(
+        description='Check IP addresses against a compiled allowlist',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('allowlist', help='Allowlist file written by ip_extractor.py --allowlist')
+    parser.add_argument('ips', nargs='*', help='Addresses to check')
+    parser.add_argument('--stdin', action='store_true', help='Read addresses from stdin, one per line')
+    parser.add_argument('--info', action='store_true', help='Print the interval counts of the allowlist')
+    args = parser.parse_args()
+
+    try:
+        allowlist = Allowlist(args.allowlist)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with allowlist:
+        if args.info:
+            print(f"{args.allowlist}: {allowlist.ipv4_count} IPv4 and {allowlist.ipv6_count} IPv6 intervals")
+
+        denied = False
+        lines = (line.strip() for line in sys.stdin) if args.stdin else iter(args.ips)
+        write = sys.stdout.write
+        for ip in lines:
+            if not ip:
+                continue
+            try:
+                allowed = allowlist.contains(ip)
+            except ValueError:
+                write(f"{ip}\tinvalid\n")
+                denied = True
+                continue
+            write(f"{ip}\t{'allowed' if allowed else 'denied'}\n")
+            denied = denied or not allowed
+    sys.exit(1 if denied and not args.stdin else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Benchmark and Property Checks for the IP Engines
+
+Exercises ip_extractor.py, ip_allowlist.py, whitelist_drift.py and
+whitelist_update.py on synthetic data: randomized CIDR sets (nested,
+overlapping, adjacent, IPv4 and IPv6) and generated manifest trees.
+
+Every run first cross-checks the optimized code against simple brute-force
+references on small random inputs, then records throughput for extraction,
+deduplication, sorting, allowlist compilation and lookups, and whitelist
+rewriting at each requested size. Results are appended to a JSON file so runs
+can be compared over time.
+
+Usage:
+    ./ip_benchmark.py [--sizes 1000,10000,100000] [--rounds 200] [--seed 42]
+                      [--output ip_benchmark_results.json] [--skip-checks]
+
+Examples:
+    # Default run, 10^3 to 10^5 ranges
+    ./ip_benchmark.py
+
+    # Include 10^6 ranges (takes a while)
+    ./ip_benchmark.py --sizes 1000,10000,100000,1000000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+from datetime import datetime, timezone
+from ipaddress import ip_network, IPv4Address, IPv6Address, IPv4Network, IPv6Network
+from typing import Dict, List, Set
+
+import ip_allowlist
+import ip_extractor
+import whitelist_drift
+
+try:
+    # Optional: also benchmark the vectorized allowlist lookups
+    import numpy  # noqa: F401
+except ImportError:
+    pass
+
+WHITELIST_UPDATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'Kubernetes Ingress Whitelist IP Updater',
+    'whitelist_update.py'
+)
+
+DEFAULT_SIZES = '1000,10000,100000'
+DEFAULT_OUTPUT = 'ip_benchmark_results.json'
+
+# Brute-force references are quadratic, keep their inputs small
+CHECK_MAX_RANGES = 60
+
+# Random IPv4 addresses looked up in the compiled allowlist per size
+LOOKUPS = 1000000
+
+def load_whitelist_update():
+    """Import whitelist_update.py from its directory (the name contains spaces)."""
+    spec = importlib.util.spec_from_file_location('whitelist_update', WHITELIST_UPDATE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def random_cidrs(rng: random.Random, count: int, ipv6_share: float = 0.25, space_bits: int = 0) -> List[str]:
+    """
+    Generate `count` random CIDR strings with plenty of structure to get wrong.
+
+    A third of the ranges are derived from earlier ones (a nested subnet, the
+    adjacent sibling block or the covering supernet), the rest are random.
+    space_bits > 0 squeezes all addresses into a small space to force collisions.
+    """
+    cidrs: List[str] = []
+    networks = []
+    for _ in range(count):
+        if networks and rng.random() < 0.35:
+            base = rng.choice(networks)
+            # Keep squeezed sets enumerable: supernets stay close to the squeezed space
+            min_prefix = max(0, base.max_prefixlen - space_bits - 4) if space_bits else 0
+            choice = rng.random()
+            if choice < 0.4 and base.prefixlen < base.max_prefixlen:
+                new_prefix = rng.randint(base.prefixlen + 1, min(base.max_prefixlen, base.prefixlen + 8))
+                network = rng.choice(list(base.subnets(new_prefix=new_prefix))[:16])
+            elif choice < 0.7 and base.prefixlen > 0:
+                parent = base.supernet()
+                network = next(n for n in parent.subnets() if n != base)
+            elif base.prefixlen > min_prefix:
+                network = base.supernet(prefixlen_diff=rng.randint(1, min(8, base.prefixlen - min_prefix)))
+            else:
+                network = base
+        else:
+            version = 6 if rng.random() < ipv6_share else 4
+            max_prefix = 128 if version == 6 else 32
+            bits = space_bits or max_prefix
+            address = rng.getrandbits(bits)
+            # Realistic prefixes (/16+ for IPv4, /64+ for IPv6) unless squeezed
+            prefix = rng.randint(max_prefix - bits if space_bits else max_prefix // 2, max_prefix)
+            cls = IPv6Network if version == 6 else IPv4Network
+            network = cls((address, prefix), strict=False)
+        networks.append(network)
+        cidrs.append(str(network))
+    return cidrs
+
+def reference_dedup(ip_addresses: Set[str]) -> Set[str]:
+    """Brute force: keep every network not contained in another distinct network."""
+    networks = {ip_network(ip, strict=False) for ip in ip_addresses}
+    return {
+        str(net) for net in networks
+        if not any(other != net and other.version == net.version and net.subnet_of(other) for other in networks)
+    }
+
+def reference_addresses(ip_addresses, version: int) -> Set[int]:
+    """Brute force: the set of all addresses covered (small address spaces only)."""
+    covered = set()
+    for ip in ip_addresses:
+        net = ip_network(ip, strict=False)
+        if net.version == version:
+            covered.update(range(int(net.network_address), int(net.broadcast_address) + 1))
+    return covered
+
+def reference_covered(probe: str, ip_addresses) -> bool:
+    """Brute force: carve every entry out of the probe network and check nothing is left."""
+    remaining = [ip_network(probe, strict=False)]
+    for ip in ip_addresses:
+        net = ip_network(ip, strict=False)
+        carved = []
+        for part in remaining:
+            if part.version != net.version or not part.overlaps(net):
+                carved.append(part)
+            elif net.subnet_of(part) and net != part:
+                carved.extend(part.address_exclude(net))
+        remaining = carved
+    return not remaining
+
+def intervals_to_addresses(intervals) -> Set[int]:
+    """Expand (start, end) intervals into the set of addresses they cover."""
+    covered = set()
+    for start, end in intervals:
+        covered.update(range(start, end + 1))
+    return covered
+
+def write_manifest_tree(root: str, rng: random.Random, cidrs: List[str], files: int) -> Set[str]:
+    """
+    Write a synthetic manifest tree spreading `cidrs` over `files` multi-document files.
+
+    Every file also carries decoys the extractor must ignore: image tags, version
+    strings, IP-like values in ConfigMaps and unrelated env vars. Every other
+    whitelist is written as a folded block scalar instead of a quoted string.
+
+    Returns:
+        Set[str]: The ranges the extractor is expected to find, normalized
+    """
+    expected: Set[str] = set()
+    per_file = max(1, len(cidrs) // files)
+    for i in range(files):
+        chunk = cidrs[i * per_file:(i + 1) * per_file] if i < files - 1 else cidrs[i * per_file:]
+        directory = os.path.join(root, f'app-{i % 20:02d}')
+        os.makedirs(directory, exist_ok=True)
+        thirds = [chunk[j::3] for j in range(3)]
+        expected.update(str(ip_network(c, strict=False)) for c in chunk)
+        lines = [
+            'apiVersion: v1', 'kind: ConfigMap', 'metadata:', f'  name: config-{i}', 'data:',
+            '  upstream: 9.9.9.9', '  legacy: "8.8.8.0/24"',
+            '---',
+            'apiVersion: networking.k8s.io/v1', 'kind: Ingress', 'metadata:', f'  name: ingress-{i}',
+            '  annotations:',
+        ]
+        if i % 2:
+            lines.append('    nginx.ingress.kubernetes.io/whitelist-source-range: >-')
+            lines.extend(f'      {c},' for c in thirds[0])
+        else:
+            lines.append(f'    nginx.ingress.kubernetes.io/whitelist-source-range: "{",".join(thirds[0])}"')
+        lines += [
+            '---',
+            'apiVersion: v1', 'kind: Service', 'metadata:', f'  name: svc-{i}', 'spec:',
+            '  loadBalancerSourceRanges:',
+        ]
+        lines.extend(f'  - {c}' for c in thirds[1])
+        lines.extend([
+            '---',
+            'apiVersion: apps/v1', 'kind: Deployment', 'metadata:', f'  name: app-{i}', 'spec:',
+            '  template:', '    spec:', '      containers:',
+            '        - name: app', f'          image: registry/app:1.{i}.0.{i % 7}',
+            '          env:',
+            '            - name: APP_VERSION', '              value: "2.3.4.5"',
+        ])
+        if i % 2:
+            # Valid YAML too: the value of an env entry before its name
+            lines += [
+                '            - value: 10.20.30.40', '              name: SHIPPING_HOST',
+                f'            - value: "{",".join(thirds[2])}"', '              name: ALLOWED_CIDRS',
+            ]
+        else:
+            lines += [
+                '            - name: SHIPPING_HOST', '              value: 10.20.30.40',
+                '            - name: ALLOWED_CIDRS', f'              value: "{",".join(thirds[2])}"',
+            ]
+        with open(os.path.join(directory, f'ingress-jsdl-{i:05d}.yaml'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    return expected
+
+def run_checks(rounds: int, seed: int, whitelist_update) -> Dict[str, int]:
+    """Cross-check the optimized engines against brute-force references on random inputs."""
+    rng = random.Random(seed)
+    passed: Dict[str, int] = {}
+
+    def ok(name: str) -> None:
+        passed[name] = passed.get(name, 0) + 1
+
+    for _ in range(rounds):
+        cidrs = set(random_cidrs(rng, rng.randint(0, CHECK_MAX_RANGES), ipv6_share=0.3))
+        unique, removed = ip_extractor.remove_duplicate_and_subset_ips(cidrs)
+        expected = reference_dedup(cidrs)
+        assert set(unique) == expected, f"dedup mismatch for {sorted(cidrs)}"
+        assert len(unique) + len(removed) == len({str(ip_network(c, strict=False)) for c in cidrs})
+        ok('remove_duplicate_and_subset_ips')
+
+        # Small address spaces so coverage can be enumerated
+        small = random_cidrs(rng, rng.randint(0, 30), ipv6_share=0.3, space_bits=10)
+        index = ip_extractor.build_interval_index(small)
+        for version in (4, 6):
+            assert intervals_to_addresses(index[version]) == reference_addresses(small, version)
+            assert all(a[1] + 1 < b[0] for a, b in zip(index[version], index[version][1:])), "not merged"
+        ok('build_interval_index')
+
+        allowlist_path = os.path.join(tempfile.gettempdir(), f'ip_benchmark_{os.getpid()}.ipal')
+        ip_extractor.save_to_allowlist(small, allowlist_path)
+        try:
+            with ip_allowlist.Allowlist(allowlist_path) as allowlist:
+                for version in (4, 6):
+                    assert allowlist.intervals(version) == index[version], "allowlist intervals differ from the index"
+                    covered = reference_addresses(small, version)
+                    max_address = (1 << (32 if version == 4 else 128)) - 1
+                    # Both sides of every interval edge, the ends of the address space and random addresses
+                    probes = {0, max_address} | {rng.getrandbits(15) for _ in range(50)}
+                    for start, end in index[version]:
+                        probes.update((start - 1, start, end, end + 1))
+                    for value in sorted(probes - {-1, max_address + 1}):
+                        address = IPv4Address(value) if version == 4 else IPv6Address(value)
+                        assert allowlist.contains(address) == (value in covered), f"lookup mismatch for {address}"
+                        assert allowlist.contains(str(address)) == (value in covered)
+                    if version == 4:
+                        values = sorted(probes) + [-1, 1 << 32]
+                        assert allowlist.contains_many(values) == [0 <= v <= max_address and v in covered for v in values]
+        finally:
+            os.remove(allowlist_path)
+        ok('Allowlist.contains')
+
+        other = random_cidrs(rng, rng.randint(0, 30), ipv6_share=0.3, space_bits=10)
+        other_index = ip_extractor.build_interval_index(other)
+        diff = whitelist_drift.difference(index, other_index)
+        for version in (4, 6):
+            expected_diff = reference_addresses(small, version) - reference_addresses(other, version)
+            assert intervals_to_addresses(diff[version]) == expected_diff
+        cidr_cover = whitelist_drift.to_cidrs(diff)
+        assert reference_addresses(cidr_cover, 4) == intervals_to_addresses(diff[4])
+        ok('subtract_intervals')
+
+        entries = [(' ' if rng.random() < 0.2 else '') + c for c in small]
+        wl_index = whitelist_update.WhitelistIndex(entries)
+        for probe in random_cidrs(rng, 20, ipv6_share=0.3, space_bits=10):
+            expected_covered = reference_covered(probe, small)
+            assert (wl_index.covering(probe) is not None) == expected_covered, f"covering mismatch for {probe}"
+        incremental = whitelist_update.WhitelistIndex([])
+        for entry in entries:
+            incremental.add(entry)
+        assert incremental.normalized() == wl_index.normalized(), "incremental add differs from bulk build"
+        ok('WhitelistIndex.covering')
+
+    root = tempfile.mkdtemp(prefix='ip_benchmark_')
+    try:
+        for round_no in range(max(1, rounds // 20)):
+            cidrs = random_cidrs(rng, rng.randint(1, 200), ipv6_share=0.3)
+            expected = write_manifest_tree(os.path.join(root, str(round_no)), rng, cidrs, rng.randint(1, 10))
+            found = set()
+            for file in ip_extractor.find_yaml_files([os.path.join(root, str(round_no))]):
+                found.update(ip_extractor.extract_ip_addresses(file))
+            assert found == expected, f"extraction mismatch: missing {expected - found}, extra {found - expected}"
+            ok('extract_ip_addresses')
+    finally:
+        shutil.rmtree(root)
+
+    return passed
+
+def timed(results: List[Dict], stage: str, size: int, func, *args, unit: str = 'ranges'):
+    """Run func(*args) once and record its throughput in `unit` (ranges by default) per second."""
+    started = time.perf_counter()
+    value = func(*args)
+    seconds = time.perf_counter() - started
+    results.append({
+        'stage': stage,
+        'size': size,
+        'seconds': round(seconds, 6),
+        'ranges_per_second': round(size / seconds) if seconds > 0 else None,
+        'unit': unit,
+    })
+    print(f"  {stage:<12} {size:>9} {unit:<7} {seconds:9.4f}s  {size / seconds if seconds else 0:>12,.0f}/s")
+    return value
+
+def run_benchmarks(sizes: List[int], seed: int, whitelist_update) -> List[Dict]:
+    """Measure extraction, dedup, sort and rewrite throughput at each size."""
+    results: List[Dict] = []
+    root = tempfile.mkdtemp(prefix='ip_benchmark_')
+    try:
+        for size in sizes:
+            rng = random.Random(seed + size)
+            cidrs = random_cidrs(rng, size)
+            print(f"\n{size} ranges:")
+
+            tree = os.path.join(root, f'tree-{size}')
+            write_manifest_tree(tree, rng, cidrs, max(1, min(2000, size // 100)))
+
+            def extract():
+                found = set()
+                for file in ip_extractor.find_yaml_files([tree]):
+                    found.update(ip_extractor.extract_ip_addresses(file))
+                return found
+
+            found = timed(results, 'extract', size, extract)
+            unique, _ = timed(results, 'dedup', size, ip_extractor.remove_duplicate_and_subset_ips, found)
+            timed(results, 'sort+csv', len(unique), ip_extractor.save_to_csv, unique, os.path.join(root, 'out.csv'))
+            timed(results, 'index', size, ip_extractor.build_interval_index, found)
+
+            allowlist_path = os.path.join(root, 'out.ipal')
+            timed(results, 'allowlist', size, ip_extractor.save_to_allowlist, found, allowlist_path)
+            allowlist = timed(results, 'load', size, ip_allowlist.Allowlist, allowlist_path)
+            probes = [rng.getrandbits(32) for _ in range(LOOKUPS)]
+            timed(results, 'lookup', LOOKUPS, allowlist.contains_many, probes, unit='lookups')
+            timed(results, 'lookup str', LOOKUPS // 10, allowlist.contains_many,
+                  [str(IPv4Address(value)) for value in probes[:LOOKUPS // 10]], unit='lookups')
+            numpy = sys.modules.get('numpy')
+            if numpy is not None:
+                timed(results, 'lookup np', LOOKUPS, allowlist.contains_many,
+                      numpy.array(probes, dtype=numpy.uint32), unit='lookups')
+            allowlist.close()
+
+            ingress = os.path.join(root, f'ingress-{size}.yaml')
+            with open(ingress, 'w') as f:
+                f.write('metadata:\n  annotations:\n'
+                        f'    nginx.ingress.kubernetes.io/whitelist-source-range: "{",".join(cidrs)}"\n')
+            new_ips = random_cidrs(rng, 50)
+            timed(results, 'rewrite', size, whitelist_update.update_whitelist, ingress, new_ips, {}, lambda _: None)
+            timed(results, 'normalize', size, whitelist_update.update_whitelist, ingress, [], {}, lambda _: None, True)
+    finally:
+        shutil.rmtree(root)
+    return results
+
+def main():
+    """Run the property checks and benchmarks and append the results to the JSON history."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark and cross-check the IP extraction and whitelist engines',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated range counts (default: {DEFAULT_SIZES})')
+    parser.add_argument('--rounds', type=int, default=200, help='Random rounds for the property checks (default: 200)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'JSON results history file (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--skip-checks', action='store_true', help='Only run the benchmarks')
+    args = parser.parse_args()
+
+    whitelist_update = load_whitelist_update()
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+    }
+
+    if not args.skip_checks:
+        print(f"Running property checks ({args.rounds} rounds)...")
+        try:
+            run['checks'] = run_checks(args.rounds, args.seed, whitelist_update)
+        except AssertionError as e:
+            print(f"× Property check failed: {e}")
+            sys.exit(1)
+        for name, count in run['checks'].items():
+            print(f"  ✓ {name}: {count} cases")
+
+    print("\nRunning benchmarks...")
+    run['results'] = run_benchmarks([int(size) for size in args.sizes.split(',')], args.seed, whitelist_update)
+
+    history = []
+    if os.path.exists(args.output):
+        with open(args.output, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    history.append(run)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    print(f"\nResults appended to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,43 @@
 #!/usr/bin/env python3
+"""
+Kubernetes Manifest IP Extractor
+
+Collects the IP ranges allowed by the ingress, service and deployment manifests
+of the configured directories, removes duplicates and ranges covered by others,
+and saves the result as CSV. Optionally the ranges are also compiled into a
+binary allowlist (see ip_allowlist.py) that other tools can map and query
+without parsing.
+
+With --history the manifests are not read from the directories but from every
+commit of a git repository that touched them, straight from its object store
+(see ip_history.py), and the result is a timeline of when each range appeared
+and disappeared per directory.
+
+Usage:
+    ./ip_extractor.py [DIRECTORY ...] [-o OUTPUT] [--allowlist PATH]
+    ./ip_extractor.py --history REPO [DIRECTORY ...] [--rev REV] [--since DATE] [-o OUTPUT]
+
+Examples:
+    # Scan the default DIRECTORIES into unique_ip_addresses.csv
+    ./ip_extractor.py
+
+    # Also write the compiled allowlist for log enrichment
+    ./ip_extractor.py --allowlist unique_ip_addresses.ipal
+
+    # When was each range of each environment added, and by whom
+    ./ip_extractor.py --history ~/repos/k8s-manifests -o ip_address_history.csv
+"""
 
 import os
 import re
 import csv
-from ipaddress import ip_network
-from typing import List, Set, Tuple
+import argparse
+from ipaddress import ip_network, IPv4Network, IPv6Network
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from ip_allowlist import write_allowlist
+
+Network = Union[IPv4Network, IPv6Network]
 
 # Configuration variables
 DIRECTORIES = [
@@ -18,51 +51,251 @@ FILE_PREFIXES = ('deployment-jsdl-', 'ingress-jsdl-')
 FILE_SUFFIX = '.yaml'
 
 OUTPUT_FILE = 'unique_ip_addresses.csv'
+HISTORY_OUTPUT_FILE = 'ip_address_history.csv'
+
+# YAML keys whose values carry IP ranges. Keys ending with these suffixes match,
+# so both the nginx whitelist and the newer allowlist annotation are picked up.
+ANNOTATION_KEYS = ('whitelist-source-range', 'allowlist-source-range')
+LIST_KEYS = ('loadBalancerSourceRanges',)
+# Only the allowed block of a NetworkPolicy ipBlock; its 'except' entries are carve-outs
+IPBLOCK_KEYS = ('cidr',)
+
+# Env vars are only inspected when a segment of their name hints at an IP list
+ENV_NAME_PATTERN = re.compile(
+    r'(?:^|_)(?:IPS?|CIDRS?|WHITELIST|ALLOWLIST|SOURCE_RANGES?|SUBNETS?)(?:_|$)', re.IGNORECASE)
+
+# Documents of any other kind cannot carry the keys above and are skipped whole.
+# Lists (kind: List, IngressList, ...) are scanned whole, whatever the kind of their items.
+RELEVANT_KINDS = {
+    'Ingress', 'Service', 'NetworkPolicy',
+    'Deployment', 'StatefulSet', 'DaemonSet', 'Job', 'CronJob', 'Pod',
+}
+LIST_KIND_SUFFIX = 'List'
 
-IP_PATTERN = r'\b(?:\d{1,3}\.){3}\d{1,3}(?:/\d{1,2})?\b'
+KEY_PATTERN = re.compile(r'^(\s*)(-\s+)?([\w./-]+)\s*:(?:\s+(.*))?$')
+TOKEN_SPLIT = re.compile(r'[\s,\[\]"\']+')
+# Block scalar indicators: |, >, with optional chomping and indentation indicators
+BLOCK_SCALAR = re.compile(r'^[|>][-+0-9]*(?:\s+#.*)?$')
 
-def find_yaml_files(directories: List[str]) -> List[str]:
-    """Find all YAML files in given directories matching the specified patterns."""
+def is_manifest_file(file: str, prefixes: Optional[Tuple[str, ...]] = FILE_PREFIXES) -> bool:
+    """Whether a file name matches the manifest patterns (any .yaml/.yml name with prefixes=None)."""
+    if prefixes is None:
+        return file.endswith(('.yaml', '.yml'))
+    return file.startswith(prefixes) and file.endswith(FILE_SUFFIX)
+
+def find_yaml_files(directories: List[str], prefixes: Optional[Tuple[str, ...]] = FILE_PREFIXES) -> List[str]:
+    """Find all YAML files in given directories matching the specified patterns.
+
+    Pass prefixes=None to accept any .yaml/.yml file name.
+    """
     yaml_files = []
     for directory in directories:
         for root, _, files in os.walk(directory):
             for file in files:
-                if file.startswith(FILE_PREFIXES) and file.endswith(FILE_SUFFIX):
+                if is_manifest_file(file, prefixes):
                     yaml_files.append(os.path.join(root, file))
     return sorted(yaml_files)
 
+def parse_ip_tokens(value: str) -> Set[str]:
+    """Return the valid IPv4/IPv6 addresses and networks found in a YAML value."""
+    value = value.split(' #', 1)[0]
+    found = set()
+    for token in TOKEN_SPLIT.split(value):
+        if not token or (':' not in token and '.' not in token):
+            continue
+        try:
+            found.add(str(ip_network(token, strict=False)))
+        except ValueError:
+            continue
+    return found
+
+def closing_quote(text: str, quote: str) -> int:
+    """Index of the quote ending a quoted YAML scalar in `text`, -1 if the scalar goes on."""
+    pos = 0
+    while True:
+        pos = text.find(quote, pos)
+        if pos < 0:
+            return -1
+        if quote == '"':
+            backslashes = len(text[:pos]) - len(text[:pos].rstrip('\\'))
+            if backslashes % 2:
+                pos += 1
+                continue
+        elif text.startswith("''", pos):
+            pos += 2
+            continue
+        return pos
+
+def unterminated_quote(value: str) -> Optional[str]:
+    """The quote character of a quoted value that continues on the next lines, else None."""
+    if value[:1] in ('"', "'") and closing_quote(value[1:], value[0]) < 0:
+        return value[0]
+    return None
+
+def extract_from_lines(lines: Iterable[str]) -> Set[str]:
+    """
+    Extract IP ranges from YAML lines, looking only at the keys we care about.
+
+    The scan is a single streaming pass with a small state machine:
+    whitelist/allowlist annotations, Service loadBalancerSourceRanges,
+    NetworkPolicy ipBlock cidr and env vars whose name mentions IPs.
+    Values may be plain, quoted over several lines, block scalars (|, >, >-, ...)
+    or block lists. An env var's value may come before its name: it is held until
+    the name of the entry is known and dropped at the next list item. Documents whose kind cannot carry any of these are skipped up
+    to the next '---'; lists (kind: List) are scanned whole.
+    """
+    found: Set[str] = set()
+    skip_document = False
+    list_indent = None      # indent of the key owning the current block list
+    env_indent = None       # key indent of the current list item, a possible env entry
+    env_wanted = None       # whether its name hints at IPs, None until the name is seen
+    env_pending: Set[str] = set()  # ranges of a value seen before the name of its entry
+    ipblock_indent = None
+    scalar_indent = None    # indent of the key owning the current block scalar
+    open_quote = None       # quote of a quoted scalar going on over the next lines
+    scalar_sink = None      # where the ranges of the current multi-line scalar go, None to ignore
+
+    for line in lines:
+        if line.startswith('---'):
+            skip_document = False
+            list_indent = env_indent = env_wanted = ipblock_indent = scalar_indent = open_quote = None
+            continue
+        if skip_document:
+            continue
+
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+
+        # Lines of a multi-line scalar are content, never keys
+        if open_quote is not None:
+            end = closing_quote(stripped, open_quote)
+            if scalar_sink is not None:
+                scalar_sink.update(parse_ip_tokens(stripped if end < 0 else stripped[:end]))
+            if end >= 0:
+                open_quote = None
+            continue
+        if scalar_indent is not None:
+            if not stripped or indent > scalar_indent:
+                if scalar_sink is not None:
+                    scalar_sink.update(parse_ip_tokens(stripped))
+                continue
+            scalar_indent = None
+
+        if not stripped or stripped.startswith('#'):
+            continue
+
+        # Items of a block list opened by a previous key
+        if list_indent is not None:
+            if stripped.startswith('-') and indent >= list_indent and not KEY_PATTERN.match(line):
+                found.update(parse_ip_tokens(stripped[1:]))
+                continue
+            list_indent = None
+
+        match = KEY_PATTERN.match(line)
+        if not match:
+            continue
+        key_indent = indent + len(match.group(2) or '')
+        key, value = match.group(3), (match.group(4) or '').strip()
+
+        if key == 'kind' and indent == 0:
+            kind = value.strip('"\'')
+            if kind not in RELEVANT_KINDS and not kind.endswith(LIST_KIND_SUFFIX):
+                skip_document = True
+            continue
+
+        if ipblock_indent is not None and key_indent <= ipblock_indent:
+            ipblock_indent = None
+        if env_indent is not None and key_indent < env_indent:
+            env_indent = env_wanted = None
+        if match.group(2):
+            env_indent, env_wanted, env_pending = key_indent, None, set()
+
+        sink = None             # where the ranges of this value go
+        if key.endswith(ANNOTATION_KEYS) or key in LIST_KEYS:
+            sink = found
+        elif key == 'ipBlock':
+            ipblock_indent = key_indent
+        elif ipblock_indent is not None and key in IPBLOCK_KEYS:
+            sink = found
+        elif key == 'name' and key_indent == env_indent:
+            env_wanted = bool(ENV_NAME_PATTERN.search(value.strip('"\'')))
+            if env_wanted:
+                found.update(env_pending)
+            env_pending = set()
+        elif key == 'value' and key_indent == env_indent and env_wanted is not False:
+            sink = found if env_wanted else env_pending
+
+        if BLOCK_SCALAR.match(value):
+            scalar_indent, scalar_sink = key_indent, sink
+            continue
+        if unterminated_quote(value):
+            open_quote, scalar_sink = value[0], sink
+        if sink is not None:
+            if value:
+                sink.update(parse_ip_tokens(value))
+            elif key != 'value':
+                list_indent = indent
+
+    return found
+
 def extract_ip_addresses(file_path: str) -> Set[str]:
     """Extract IP addresses from a given file."""
     with open(file_path, 'r') as file:
-        content = file.read()
-    return set(re.findall(IP_PATTERN, content))
+        return extract_from_lines(file)
+
+def network_sort_key(network: Network) -> Tuple[int, int, int]:
+    """Sort key grouping networks by address family, then by position and size."""
+    return network.version, int(network.network_address), network.prefixlen
 
 def remove_duplicate_and_subset_ips(ip_addresses: Set[str]) -> Tuple[List[str], List[str]]:
-    """Remove duplicate IP addresses, subsets, and overlapping networks."""
-    networks = [ip_network(ip, strict=False) for ip in ip_addresses]
-    networks.sort(key=lambda x: (x.num_addresses, x.network_address), reverse=True)
-    
+    """Remove duplicate IP addresses, subsets, and overlapping networks.
+
+    CIDR blocks either nest or are disjoint, so after sorting per address family
+    by (start, prefix length) one sweep is enough: a network is redundant when it
+    starts before the end of the last kept network of the same family.
+    """
+    networks = sorted({ip_network(ip, strict=False) for ip in ip_addresses}, key=network_sort_key)
+
     unique_networks = []
     removed_networks = []
-    
+    last_end: Dict[int, int] = {}
+
     for network in networks:
-        is_unique = True
-        for existing in unique_networks:
-            if network.subnet_of(existing) or existing.subnet_of(network) or network.overlaps(existing):
-                is_unique = False
-                break
-        
-        if is_unique:
-            unique_networks.append(network)
-        else:
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        if start <= last_end.get(network.version, -1):
             removed_networks.append(network)
-    
+        else:
+            unique_networks.append(network)
+            last_end[network.version] = end
+
     return [str(net) for net in unique_networks], [str(net) for net in removed_networks]
 
+def build_interval_index(ip_addresses: Iterable[str]) -> Dict[int, List[Tuple[int, int]]]:
+    """Merge IP ranges into sorted, non-overlapping (start, end) intervals per address family.
+
+    Adjacent ranges are joined as well, so the result is the smallest interval set
+    covering exactly the same addresses.
+    """
+    networks = sorted({ip_network(ip, strict=False) for ip in ip_addresses}, key=network_sort_key)
+    index: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+
+    for network in networks:
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        intervals = index[network.version]
+        if intervals and start <= intervals[-1][1] + 1:
+            if end > intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], end)
+        else:
+            intervals.append((start, end))
+
+    return index
+
 def save_to_csv(ip_addresses: List[str], output_file: str):
     """Save IP addresses to a CSV file."""
-    # Sort IP addresses
-    sorted_ips = sorted(ip_addresses, key=lambda x: ip_network(x, strict=False))
+    # Sort IP addresses, IPv4 before IPv6
+    sorted_ips = sorted(ip_addresses, key=lambda x: network_sort_key(ip_network(x, strict=False)))
     
     with open(output_file, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
@@ -70,10 +303,59 @@ def save_to_csv(ip_addresses: List[str], output_file: str):
         for ip in sorted_ips:
             writer.writerow([ip])
 
+def save_to_allowlist(ip_addresses: Iterable[str], output_file: str):
+    """Save IP addresses as a compiled allowlist: merged intervals per address family."""
+    write_allowlist(build_interval_index(ip_addresses), output_file)
+
+def history_main(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Build and save the timeline of the ranges per directory across the history of a repository."""
+    from subprocess import CalledProcessError
+    from ip_history import build_timeline, save_timeline
+
+    output = args.output or HISTORY_OUTPUT_FILE
+    print(f"Reading the history of {', '.join(args.directories)} in {args.history} ({args.rev})...")
+    try:
+        timeline, stats = build_timeline(args.history, args.directories, args.rev, args.since)
+    except CalledProcessError as e:
+        parser.error(f"git failed: {e.stderr.strip()}")
+    print(f"Read {stats['commits']} commits: {stats['blobs']} distinct manifests, {stats['trees']} distinct trees.")
+
+    for directory in args.directories:
+        rows = [row for row in timeline if row['environment'] == directory]
+        current = {row['range'] for row in rows if row['removed_commit'] is None}
+        removed = {row['range'] for row in rows if row['removed_commit'] is not None} - current
+        print(f"\n{directory}: {len(current)} ranges present, {len(removed)} removed, {len(rows)} periods")
+
+    print(f"\nSaving the timeline to {output}...")
+    save_timeline(timeline, output)
+    print("Done!")
+
 def main():
     """Main function to orchestrate the IP address extraction and deduplication process."""
+    parser = argparse.ArgumentParser(
+        description='Extract the allowed IP ranges from Kubernetes manifests',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('directories', nargs='*', default=DIRECTORIES,
+                        help='Directories to scan, relative to REPO with --history (default: the configured DIRECTORIES)')
+    parser.add_argument('-o', '--output',
+                        help=f'CSV output file (default: {OUTPUT_FILE}, {HISTORY_OUTPUT_FILE} with --history)')
+    parser.add_argument('--allowlist', metavar='PATH', help='Also write the compiled binary allowlist to this file')
+    parser.add_argument('--history', metavar='REPO', help='Build the timeline of the ranges across the history of this git repository')
+    parser.add_argument('--rev', default='HEAD', help='History: revision whose first-parent history is followed (default: HEAD)')
+    parser.add_argument('--since', metavar='DATE', help='History: only follow commits after this date')
+    args = parser.parse_args()
+
+    if args.history:
+        if args.allowlist:
+            parser.error("--allowlist cannot be combined with --history")
+        history_main(parser, args)
+        return
+    args.output = args.output or OUTPUT_FILE
+
     print("Step 1: Finding YAML files...")
-    yaml_files = find_yaml_files(DIRECTORIES)
+    yaml_files = find_yaml_files(args.directories)
     print(f"Found {len(yaml_files)} YAML files.")
 
     print("\nStep 2: Extracting IP addresses...")
@@ -92,8 +374,11 @@ def main():
     for ip in removed_ips:
         print(f"  - {ip}")
 
-    print(f"\nStep 4: Saving to {OUTPUT_FILE}...")
-    save_to_csv(unique_ip_addresses, OUTPUT_FILE)
+    print(f"\nStep 4: Saving to {args.output}...")
+    save_to_csv(unique_ip_addresses, args.output)
+    if args.allowlist:
+        print(f"Compiling allowlist to {args.allowlist}...")
+        save_to_allowlist(unique_ip_addresses, args.allowlist)
     print("Done!")
 
 if __name__ == "__main__":
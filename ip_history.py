@@ -0,0 +1,232 @@
+"""
+IP Range History from Git
+
+Builds the timeline of the IP ranges allowed by the manifests of every
+environment directory (DIRECTORIES of ip_extractor.py) across the history of a
+git repository, without checking anything out: commits, trees and manifest
+blobs are read straight from the object store through a single
+`git cat-file --batch` process.
+
+Work is memoized by object id. Every distinct manifest blob is extracted once
+(with extract_from_lines of ip_extractor.py), and the ranges of a whole tree are
+cached by tree id, so a directory that did not change between two commits
+costs one lookup, whatever its size.
+
+The timeline has one row per environment, range and period of presence: the
+commit (with author and date) that added the range and, if it is gone, the
+commit that removed it. Commits are followed along the first parent of the
+revision, i.e. in the order they landed on that branch.
+
+Usage (through ip_extractor.py):
+    ./ip_extractor.py --history REPO [DIRECTORY ...] [--rev REV] [--since DATE] [-o OUTPUT]
+
+Examples:
+    # Timeline of the default DIRECTORIES on the checked out branch
+    ./ip_extractor.py --history ~/repos/k8s-manifests
+
+    # Only the changes of the last year on main, for one environment
+    ./ip_extractor.py --history ~/repos/k8s-manifests pt-bdo-tp-prod/b2c-eshop-prod --rev main --since 2024-01-01
+"""
+
+import io
+import csv
+import subprocess
+from datetime import datetime, timedelta, timezone
+from ipaddress import ip_network
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from ip_extractor import FILE_PREFIXES, extract_from_lines, is_manifest_file, network_sort_key
+
+TREE_MODE = b'40000'
+BLOB_MODES = (b'100644', b'100755')
+
+TIMELINE_FIELDS = ['environment', 'range', 'added_commit', 'added_date', 'added_by',
+                   'removed_commit', 'removed_date', 'removed_by']
+
+def parse_signature(signature: str) -> Tuple[str, str]:
+    """Split an author line value ('Name <email> 1700000000 +0200') into the author and an ISO date."""
+    author, timestamp, offset = signature.rsplit(' ', 2)
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    tz = timezone(timedelta(minutes=-minutes if offset.startswith('-') else minutes))
+    return author, datetime.fromtimestamp(int(timestamp), tz).isoformat()
+
+class ObjectStore:
+    """Reads the objects of a git repository through one long-running `git cat-file --batch`."""
+
+    def __init__(self, repo: str):
+        self.repo = repo
+        self.process = subprocess.Popen(['git', '-C', repo, 'cat-file', '--batch'],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, object_id: str) -> Tuple[str, bytes]:
+        """Return the type and the content of an object; KeyError if it does not exist."""
+        self.process.stdin.write(object_id.encode('ascii') + b'\n')
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(object_id)
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)
+        return header[1].decode('ascii'), data
+
+    def tree(self, object_id: str) -> List[Tuple[bytes, str, str]]:
+        """Entries (mode, name, object id) of a tree object."""
+        _, data = self.read(object_id)
+        id_size = len(object_id) // 2
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b' ', pos)
+            nul = data.index(b'\0', space)
+            entries.append((data[pos:space], data[space + 1:nul].decode('utf-8', errors='surrogateescape'),
+                            data[nul + 1:nul + 1 + id_size].hex()))
+            pos = nul + 1 + id_size
+        return entries
+
+    def commit(self, object_id: str) -> Dict:
+        """The id, tree, parents, author, author date and subject of a commit."""
+        kind, data = self.read(object_id)
+        if kind != 'commit':
+            raise ValueError(f"{object_id} is a {kind}, not a commit")
+        header, _, message = data.partition(b'\n\n')
+        commit = {'id': object_id, 'parents': [], 'author': None, 'date': None}
+        for line in header.split(b'\n'):
+            key, _, value = line.partition(b' ')
+            if key == b'tree':
+                commit['tree'] = value.decode('ascii')
+            elif key == b'parent':
+                commit['parents'].append(value.decode('ascii'))
+            elif key == b'author':
+                commit['author'], commit['date'] = parse_signature(value.decode('utf-8', errors='replace'))
+        commit['subject'] = message.split(b'\n', 1)[0].decode('utf-8', errors='replace')
+        return commit
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait()
+
+    def __enter__(self) -> 'ObjectStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class HistoryScanner:
+    """IP ranges of the manifests in the trees of a repository, memoized by blob and tree id."""
+
+    def __init__(self, store: ObjectStore, prefixes: Optional[Tuple[str, ...]] = FILE_PREFIXES):
+        self.store = store
+        self.prefixes = prefixes
+        self.blob_ranges: Dict[str, FrozenSet[str]] = {}
+        self.tree_ranges: Dict[str, FrozenSet[str]] = {}
+        self.subtrees: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def blob(self, object_id: str) -> FrozenSet[str]:
+        """Ranges of one manifest blob, read like ip_extractor.py reads files (universal newlines)."""
+        ranges = self.blob_ranges.get(object_id)
+        if ranges is None:
+            _, data = self.store.read(object_id)
+            lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='replace')
+            ranges = self.blob_ranges[object_id] = frozenset(extract_from_lines(lines))
+        return ranges
+
+    def tree(self, object_id: str) -> FrozenSet[str]:
+        """Ranges of all manifests in a tree and its subtrees."""
+        ranges = self.tree_ranges.get(object_id)
+        if ranges is None:
+            found = set()
+            for mode, name, entry_id in self.store.tree(object_id):
+                if mode == TREE_MODE:
+                    found |= self.tree(entry_id)
+                elif mode in BLOB_MODES and is_manifest_file(name, self.prefixes):
+                    found |= self.blob(entry_id)
+            ranges = self.tree_ranges[object_id] = frozenset(found)
+        return ranges
+
+    def directory(self, root_tree: str, path: str) -> FrozenSet[str]:
+        """Ranges of the manifests under `path` in a root tree, empty if the directory does not exist."""
+        tree_id = root_tree
+        for part in path.strip('/').split('/'):
+            key = (tree_id, part)
+            if key not in self.subtrees:
+                self.subtrees[key] = next((entry_id for mode, name, entry_id in self.store.tree(tree_id)
+                                           if mode == TREE_MODE and name == part), None)
+            tree_id = self.subtrees[key]
+            if tree_id is None:
+                return frozenset()
+        return self.tree(tree_id)
+
+def list_commits(repo: str, rev: str, paths: List[str], since: Optional[str] = None) -> List[str]:
+    """Commits of `rev` along the first parent that touch `paths`, oldest first."""
+    command = ['git', '-C', repo, 'rev-list', '--first-parent', '--reverse']
+    if since:
+        command.append(f'--since={since}')
+    command += [rev, '--', *paths]
+    return subprocess.run(command, check=True, capture_output=True, text=True).stdout.split()
+
+def build_timeline(repo: str, directories: List[str], rev: str = 'HEAD', since: Optional[str] = None,
+                   prefixes: Optional[Tuple[str, ...]] = FILE_PREFIXES) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Build the timeline of the IP ranges of each directory across the history of a repository.
+
+    Ranges already present before the first listed commit (with `since`) have
+    no added commit; ranges still present have no removed commit.
+
+    Args:
+        repo (str): Path of the git repository (work tree or bare).
+        directories (List[str]): Environment directories, relative to the repository root.
+        rev (str): Revision whose first-parent history is followed.
+        since (Optional[str]): Only follow commits after this date (any date git understands).
+        prefixes (Optional[Tuple[str, ...]]): File name prefixes of the manifests, None for any YAML file.
+
+    Returns:
+        Tuple[List[Dict], Dict[str, int]]: The timeline rows (see TIMELINE_FIELDS), sorted by
+        environment, range and commit order, and counters of the commits, blobs and trees read.
+
+    Raises:
+        subprocess.CalledProcessError: If git cannot list the history, e.g. an unknown revision.
+    """
+    commits = list_commits(repo, rev, directories, since)
+    timeline: List[Dict] = []
+    present: Dict[str, Dict[str, Dict]] = {directory: {} for directory in directories}
+    previous: Dict[str, FrozenSet[str]] = {directory: frozenset() for directory in directories}
+
+    def apply(directory: str, ranges: FrozenSet[str], commit: Optional[Dict]) -> None:
+        if ranges is previous[directory]:
+            return
+        previous[directory] = ranges
+        rows = present[directory]
+        added_commit, added_date, added_by = (commit['id'], commit['date'], commit['author']) if commit else (None, None, None)
+        for cidr in ranges - rows.keys():
+            rows[cidr] = dict.fromkeys(TIMELINE_FIELDS)
+            rows[cidr].update(environment=directory, range=cidr, added_commit=added_commit,
+                              added_date=added_date, added_by=added_by)
+            timeline.append(rows[cidr])
+        for cidr in rows.keys() - ranges:
+            rows.pop(cidr).update(removed_commit=commit['id'], removed_date=commit['date'], removed_by=commit['author'])
+
+    with ObjectStore(repo) as store:
+        scanner = HistoryScanner(store, prefixes)
+        if commits:
+            parents = store.commit(commits[0])['parents']
+            if parents:
+                base = store.commit(parents[0])
+                for directory in directories:
+                    apply(directory, scanner.directory(base['tree'], directory), None)
+        for commit_id in commits:
+            commit = store.commit(commit_id)
+            for directory in directories:
+                apply(directory, scanner.directory(commit['tree'], directory), commit)
+        stats = {'commits': len(commits), 'blobs': len(scanner.blob_ranges), 'trees': len(scanner.tree_ranges)}
+
+    order = {directory: position for position, directory in enumerate(directories)}
+    # Stable sort: the periods of one range stay in commit order
+    timeline.sort(key=lambda row: (order[row['environment']], network_sort_key(ip_network(row['range'], strict=False))))
+    return timeline, stats
+
+def save_timeline(timeline: List[Dict], output_file: str) -> None:
+    """Save the timeline as CSV, one row per environment, range and period of presence."""
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=TIMELINE_FIELDS)
+        writer.writeheader()
+        writer.writerows(timeline)
@@ -4,10 +4,14 @@ import os
 import sys
 import json
 import argparse
-from collections import defaultdict
+from collections import Counter, defaultdict
 import re
 import logging
 import mimetypes
+import hashlib
+import heapq
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 """
 Project Structure and Dependency Analyzer
@@ -15,7 +19,11 @@ Project Structure and Dependency Analyzer
 This script analyzes the structure and dependencies of a project directory.
 
 Usage:
-    python project_analyzer.py [project_dir] [-o OUTPUT] [-d DEPTH]
+    python project_analyzer.py [project_dir] [-o OUTPUT] [-d DEPTH] [--stats-depth N]
+                               [--json-output JSON] [--rules RULES] [--no-scan]
+                               [--shard-dir DIR [--shard-size SIZE] [--workers N]]
+    python project_analyzer.py --shard-dir DIR --get-section PATH
+    python project_analyzer.py --diff OLD_MANIFEST NEW_MANIFEST [--json-output JSON]
 
 Arguments:
     project_dir    Project directory to analyze (default: current directory)
@@ -23,15 +31,59 @@ Arguments:
 Options:
     -o, --output   Output file name (default: project_name_analysis.txt)
     -d, --depth    Maximum depth for directory analysis
+    --stats-depth  Directory depth of the per-directory code statistics (default: 1)
+    --json-output  Also write the analysis (without file contents) as JSON
+    --rules        JSON file with content scanner rules added to the built-in ones
+    --no-scan      Do not scan file contents (see CONTENT_RULES)
+    --shard-dir    Write the analysis as a summary, shards and an index to this directory
+    --shard-size   Maximum size of a shard, e.g. 512K or 64M (default: 64M)
+    --workers      Threads writing shards (default: number of CPUs, at most 8)
+    --get-section  Print the section of one file (relative path) from --shard-dir and exit
+    --manifest     Also write a manifest of the run (one line per file)
+    --diff         Compare two manifests and print the changes (JSON with --json-output)
 
 Examples:
     python project_analyzer.py /path/to/project
     python project_analyzer.py -o my_analysis.txt
     python project_analyzer.py /path/to/project -d 3
+    python project_analyzer.py /path/to/project --json-output analysis.json --rules rules.json
+    python project_analyzer.py /path/to/project --shard-dir analysis/ --shard-size 128M
+    python project_analyzer.py --shard-dir analysis/ --get-section src/app/main.py
+    python project_analyzer.py release-1.0/ --manifest 1.0.manifest
+    python project_analyzer.py --diff 1.0.manifest 1.1.manifest
 
 The script will generate a detailed analysis of the project structure,
-including file types, dependencies, and configuration files. The analysis
-is written to the specified output file or a default file named after the project.
+including file types, dependencies, configuration files and code statistics
+(files, bytes, lines of code, comment and blank lines per language and per
+directory). File contents are scanned for hardcoded secrets, private and hardcoded
+IPs, TODO/FIXME markers and license headers (CONTENT_RULES, extensible with
+--rules). The analysis is written to the specified output file or a default
+file named after the project.
+
+Every file is read once, as bytes: the code statistics and the content scan run
+on the raw bytes, and the decoded text is only used for the content and
+dependency analysis.
+
+With --shard-dir the file contents are not written to one monolithic file:
+summary.txt holds the analysis without them, the sections of the files are
+handed, as the files are read, to a pool of threads writing shard-00000.txt,
+shard-00001.txt, ... of at most --shard-size bytes, and index.json maps every
+file path to its shard, byte offset, length and SHA-256, so a single section is
+read with one seek. The contents are thus never all held in memory. -o cannot
+be combined with --shard-dir (the summary is always summary.txt).
+
+A manifest (--manifest) records the project root, then one JSON line per file
+sorted by path: [path, size, content hash, dependency set hash]. --diff merges
+two manifests in one pass and reports added, removed and changed files; only
+the files whose dependency hash differs and the changed configuration files
+are re-read (from the recorded roots) to report dependency and configuration
+changes.
+
+A rules file is a JSON list of rules like those in CONTENT_RULES, e.g.:
+    [{"name": "internal-host", "category": "network", "literals": ["corp.example.com"]},
+     {"name": "todo", "enabled": false}]
+A rule with a regex and no literals is searched for on its own, in one
+combined pass with the other such rules.
 """
 
 # Set up logging
@@ -84,15 +136,116 @@ IGNORED_FILES = {
     '.DS_Store?', '._*', '.Spotlight-V100', '.Trashes', 'ehthumbs.db', 'Thumbs.db',
 }
 
+# Languages of the code statistics, by file extension or by full file name
+LANGUAGES = {
+    '.py': 'Python', '.sh': 'Shell', '.bash': 'Shell', '.zsh': 'Shell', '.ps1': 'PowerShell',
+    '.js': 'JavaScript', '.jsx': 'JavaScript', '.mjs': 'JavaScript', '.ts': 'TypeScript', '.tsx': 'TypeScript',
+    '.java': 'Java', '.kt': 'Kotlin', '.scala': 'Scala', '.groovy': 'Groovy', '.go': 'Go', '.rs': 'Rust',
+    '.c': 'C', '.h': 'C', '.cpp': 'C++', '.cc': 'C++', '.hpp': 'C++', '.cs': 'C#', '.php': 'PHP',
+    '.rb': 'Ruby', '.swift': 'Swift', '.tf': 'Terraform', '.hcl': 'Terraform',
+    '.yml': 'YAML', '.yaml': 'YAML', '.json': 'JSON', '.toml': 'TOML', '.ini': 'INI', '.cfg': 'INI',
+    '.conf': 'Config', '.sql': 'SQL', '.html': 'HTML', '.htm': 'HTML', '.xml': 'XML',
+    '.css': 'CSS', '.scss': 'SCSS', '.md': 'Markdown', '.txt': 'Text',
+    'Dockerfile': 'Dockerfile', 'Makefile': 'Makefile', 'Jenkinsfile': 'Groovy', '.env': 'Dotenv',
+}
+
+# Comment syntax per language: (line comment prefixes, block comment delimiters)
+HASH_COMMENTS = ((b'#',), ())
+C_COMMENTS = ((b'//',), ((b'/*', b'*/'),))
+MARKUP_COMMENTS = ((), ((b'<!--', b'-->'),))
+COMMENT_SYNTAX = {
+    'Python': HASH_COMMENTS, 'Shell': HASH_COMMENTS, 'Ruby': HASH_COMMENTS, 'YAML': HASH_COMMENTS,
+    'TOML': HASH_COMMENTS, 'Config': HASH_COMMENTS, 'Dockerfile': HASH_COMMENTS,
+    'Makefile': HASH_COMMENTS, 'Dotenv': HASH_COMMENTS,
+    'PowerShell': ((b'#',), ((b'<#', b'#>'),)),
+    'JavaScript': C_COMMENTS, 'TypeScript': C_COMMENTS, 'Java': C_COMMENTS, 'Kotlin': C_COMMENTS,
+    'Scala': C_COMMENTS, 'Groovy': C_COMMENTS, 'Go': C_COMMENTS, 'Rust': C_COMMENTS, 'C': C_COMMENTS,
+    'C++': C_COMMENTS, 'C#': C_COMMENTS, 'Swift': C_COMMENTS, 'SCSS': C_COMMENTS,
+    'PHP': ((b'//', b'#'), ((b'/*', b'*/'),)),
+    'Terraform': ((b'#', b'//'), ((b'/*', b'*/'),)),
+    'CSS': ((), ((b'/*', b'*/'),)),
+    'SQL': ((b'--',), ((b'/*', b'*/'),)),
+    'INI': ((b'#', b';'), ()),
+    'HTML': MARKUP_COMMENTS, 'XML': MARKUP_COMMENTS, 'Markdown': MARKUP_COMMENTS,
+}
+
+# A whitespace-only line, matched at the newline before it
+BLANK_LINE = re.compile(rb'\n(?=[ \t\r\f\v]*\n)')
+
+# Compiled line classification patterns per language, see line_patterns()
+_LINE_PATTERNS = {}
+
+# Content scanner rules. Every rule lists the literals its matches start with; a rule
+# with a regex only matches where the regex matches at one of its literals. A rule
+# with a regex and no literals is searched for on its own (slower). Options:
+# ignore_case, max_line (only within the first lines), first_only (once per file)
+# and redact (mask the matched value in reports).
+CONTENT_RULES = [
+    {'name': 'todo', 'category': 'marker', 'literals': ['TODO']},
+    {'name': 'fixme', 'category': 'marker', 'literals': ['FIXME']},
+    {'name': 'private-key', 'category': 'secret', 'literals': ['-----BEGIN '],
+     'regex': r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |ENCRYPTED )?PRIVATE KEY-----'},
+    {'name': 'aws-access-key-id', 'category': 'secret', 'literals': ['AKIA', 'ASIA'],
+     'regex': r'(?:AKIA|ASIA)[0-9A-Z]{16}(?![0-9A-Za-z])', 'redact': True},
+    {'name': 'github-token', 'category': 'secret', 'literals': ['ghp_', 'gho_', 'ghu_', 'ghs_', 'ghr_'],
+     'regex': r'gh[pousr]_[A-Za-z0-9]{36,}', 'redact': True},
+    {'name': 'secret-assignment', 'category': 'secret', 'ignore_case': True, 'redact': True,
+     'literals': ['password', 'passwd', 'secret', 'token', 'apikey', 'api_key', 'access_key'],
+     # The key ends with the word (DB_PASSWORD, secret_key); values that are names
+     # (token_cache, CTP_TOKEN_FILE, self.token) rather than credentials are skipped
+     'regex': r'(?<![A-Za-z0-9])(?:password|passwd|secret(?:_?key)?|token|api_?key|access_key)["\']?[ \t]*[:=][ \t]*'
+              r'(?!["\']?_?[A-Za-z]+\d{0,2}(?:[_.][A-Za-z]+\d{0,2})+(?:["\']|[ \t]*$))'
+              r'(?:["\'][^"\'\s]{8,}["\']|[^\s"\'(){}\[\],;#$]{8,}[ \t]*$)'},
+    {'name': 'private-ipv4', 'category': 'network', 'literals': ['10.', '172.', '192.168.'],
+     'regex': r'(?<![\w.])(?:10(?:\.\d{1,3}){3}|172\.(?:1[6-9]|2\d|3[01])(?:\.\d{1,3}){2}|192\.168(?:\.\d{1,3}){2})'
+              r'(?:/\d{1,2})?(?!\.?\d)'},
+    {'name': 'quoted-ipv4', 'category': 'network', 'literals': [quote + digit for quote in '"\'' for digit in '0123456789'],
+     'regex': r'["\'](?:\d{1,3}\.){3}\d{1,3}(?:/\d{1,2})?["\']'},
+    {'name': 'license-header', 'category': 'license', 'max_line': 30, 'first_only': True,
+     'literals': ['SPDX-License-Identifier', 'Licensed under the Apache License', 'Permission is hereby granted, free of charge',
+                  'GNU General Public License', 'GNU Lesser General Public License', 'Mozilla Public License',
+                  'Redistribution and use in source and binary forms']},
+]
+
+# Longest excerpt of a match shown in reports
+EXCERPT_LENGTH = 80
+
+# Sharded output: file sections go to size-capped shards, located through the index
+SHARD_INDEX = 'index.json'
+SHARD_SUMMARY = 'summary.txt'
+SHARD_NAME = 'shard-{:05d}.txt'
+DEFAULT_SHARD_SIZE = 64 * 1024 * 1024
+DEFAULT_SHARD_WORKERS = min(8, os.cpu_count() or 1)
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# Manifests: one JSON line per file, sorted by path, after a header line
+MANIFEST_VERSION = 1
+MANIFEST_HASH_SIZE = 16
+NO_DEPENDENCIES = '-'
+
 def is_ignored_file(file_name):
     """Check if a file should be ignored based on its name."""
     return any(file_name.endswith(pattern.lstrip('*')) or file_name == pattern for pattern in IGNORED_FILES)
 
-def is_binary(file_path):
-    """Check if a file is binary based on its content and extension."""
+def is_binary_type(file_path):
+    """
+    Check if a file is binary based on its extension.
+
+    Files of a language in LANGUAGES (.json, .xml, .sql, .rs, ...) are text
+    whatever their mimetype; only the content sniff of is_binary applies to them.
+    """
+    file_name = os.path.basename(file_path)
+    if file_name in LANGUAGES or get_file_extension(file_name) in LANGUAGES:
+        return False
     mime_type, _ = mimetypes.guess_type(file_path)
-    if mime_type and not mime_type.startswith('text'):
+    return bool(mime_type and not mime_type.startswith('text'))
+
+def is_binary(file_path, data=None):
+    """Check if a file is binary based on its extension and content (the first 8 KiB, read if not given)."""
+    if is_binary_type(file_path):
         return True
+    if data is not None:
+        return data.find(b'\0', 0, 8192) != -1
 
     try:
         with open(file_path, 'rb') as file:
@@ -106,20 +259,101 @@ def get_file_extension(file_path):
     """Get the file extension."""
     return os.path.splitext(file_path)[1].lower()
 
-def read_file(file_path):
-    """Read a file with proper encoding."""
+def get_language(file_name):
+    """Get the language of a file for the code statistics, by file name or extension."""
+    if file_name in LANGUAGES:
+        return LANGUAGES[file_name]
+    extension = get_file_extension(file_name)
+    return LANGUAGES.get(extension, extension[1:] or 'Other')
+
+def read_bytes(file_path):
+    """Read the raw content of a file, or None if it cannot be read."""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        logging.warning(f"Unable to read file: {file_path}")
+        return None
+
+def file_size(file_path):
+    """Size of a file in bytes, 0 if it cannot be accessed."""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+def decode_content(file_path, data):
+    """Decode raw file content with proper encoding."""
     encodings = ['utf-8', 'latin-1', 'ascii']
     for encoding in encodings:
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-                logging.info(f"Successfully read file: {file_path} with encoding: {encoding}")
-                return content
+            content = data.decode(encoding)
+            logging.info(f"Successfully read file: {file_path} with encoding: {encoding}")
+            # Universal newlines, like reading in text mode
+            return content.replace('\r\n', '\n').replace('\r', '\n') if '\r' in content else content
         except UnicodeDecodeError:
             continue
     logging.warning(f"Unable to decode file: {file_path}")
     return None
 
+def read_file(file_path):
+    """Read a file with proper encoding."""
+    data = read_bytes(file_path)
+    return decode_content(file_path, data) if data is not None else None
+
+def line_patterns(language):
+    """
+    Compiled bytes patterns classifying the lines of a language: (blank, line comment, block comment).
+
+    Each pattern matches at the newline before a line; the comment patterns are None
+    if the language has no such comments. Every pattern starts with a literal
+    newline and has no top-level alternation, so the regex engine can jump from
+    newline to newline instead of trying every byte.
+    """
+    patterns = _LINE_PATTERNS.get(language)
+    if patterns is None:
+        prefixes, blocks = COMMENT_SYNTAX.get(language, ((), ()))
+        comment = block = None
+        if prefixes:
+            comment = re.compile(rb'\n[ \t]*(?:' + b'|'.join(map(re.escape, prefixes)) + rb')')
+        if blocks:
+            delimiters = b'|'.join(re.escape(start) + rb'.*?' + re.escape(end) for start, end in blocks)
+            block = re.compile(rb'\n[ \t]*(?:' + delimiters + rb')', re.DOTALL)
+        patterns = _LINE_PATTERNS[language] = (BLANK_LINE, comment, block)
+    return patterns
+
+def count_lines(data, language):
+    """
+    Count the lines of raw file content without decoding it.
+
+    A line is blank if it only contains whitespace, and a comment line if it starts
+    with a line comment or is part of a block comment starting a line.
+
+    Args:
+        data: The file content as bytes.
+        language: The language of the file (see LANGUAGES), selecting its comment syntax.
+
+    Returns:
+        Counter: lines, code, comment and blank line counts.
+    """
+    if not data:
+        return Counter(lines=0, code=0, comment=0, blank=0)
+    # Every line is preceded and followed by a newline
+    buffer = b'\n' + data if data.endswith(b'\n') else b'\n' + data + b'\n'
+    lines = buffer.count(b'\n') - 1
+    blank_pattern, comment_pattern, block_pattern = line_patterns(language)
+    blank = len(blank_pattern.findall(buffer))
+    comment = len(comment_pattern.findall(buffer)) if comment_pattern else 0
+    if block_pattern:
+        for match in block_pattern.finditer(buffer):
+            # Lines inside the block that also look blank or like line comments were counted already
+            start, end = match.start(), match.end()
+            inner_blank = len(blank_pattern.findall(buffer, start + 1, end))
+            inner_comment = len(comment_pattern.findall(buffer, start + 1, end)) if comment_pattern else 0
+            comment += buffer.count(b'\n', start, end) - inner_comment
+            blank -= inner_blank
+    return Counter(lines=lines, code=lines - comment - blank, comment=comment, blank=blank)
+
 def analyze_dependencies(file_path, content):
     """Analyze file dependencies."""
     dependencies = set()
@@ -160,6 +394,10 @@ def parse_env_file(content):
             env_vars[key.strip()] = value.strip()
     return env_vars
 
+def is_config_file(file_name):
+    """Whether a file is analyzed as configuration (see analyze_config_file)."""
+    return file_name in ['package.json', '.env'] or file_name.endswith('.tf')
+
 def analyze_config_file(file_path, content):
     """Analyze configuration files like package.json and .env."""
     config_info = {}
@@ -187,8 +425,191 @@ def analyze_config_file(file_path, content):
 
     return config_info
 
-def analyze_project(base_dir, max_depth=None, script_name=None, output_file=None):
-    """Analyze the project structure and file contents."""
+def literal_pattern(literals):
+    """
+    Compile literals into one bytes regex shaped like a trie.
+
+    Literals sharing a prefix share the branch for it, so at every position the
+    regex engine follows a single path instead of trying each literal in turn,
+    and the longest literal starting there is matched.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for byte in literal:
+            node = node.setdefault(byte, {})
+        node[None] = True
+
+    def build(node):
+        branches = [re.escape(bytes([byte])) + build(child) for byte, child in sorted(
+            (key, value) for key, value in node.items() if key is not None)]
+        if not branches:
+            return b''
+        body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+        return b'(?:' + body + b')?' if None in node else body
+
+    return re.compile(build(trie))
+
+def combined_pattern(rules):
+    """
+    Compile the regexes of rules into one bytes alternation, each with its own case flag.
+
+    Raises:
+        re.error: If a regex cannot be combined, e.g. it sets global inline flags.
+    """
+    return re.compile(b'|'.join(
+        b'(?' + (b'i' if rule.get('ignore_case') else b'') + b':' + rule['regex'].encode() + b')' for rule in rules),
+        re.MULTILINE)
+
+def redact(text):
+    """Mask the value of a secret, keeping its name or its first characters."""
+    match = re.match(r'(.*?[:=][ \t]*["\']?)', text)
+    if match:
+        return match.group(1) + '***'
+    return text[:4] + '***'
+
+class ContentScanner:
+    """
+    Scan file content for all content rules in a single pass.
+
+    All rule literals are compiled into one trie-shaped regex (see literal_pattern)
+    that finds every occurrence of any literal, overlapping ones included; the
+    regex of a rule only runs at the positions where one of its literals was found.
+    Without any ignore_case rule the raw bytes are searched, otherwise a lowercased
+    copy is, and case-sensitive literals are checked against the original bytes.
+
+    Rules with a regex but no literals are combined into one alternation that is
+    searched in a second pass over the raw bytes; at every position where it
+    matches, each of those rules' regexes is tried. The findings of both passes
+    are merged in position order.
+    """
+
+    def __init__(self, rules):
+        self.rules = [rule for rule in rules if rule.get('enabled', True)]
+        self.fold_case = any(rule.get('ignore_case') for rule in self.rules if rule.get('literals'))
+        targets = defaultdict(list)
+        self._regex_rules = []
+        for rule in self.rules:
+            flags = re.MULTILINE | (re.IGNORECASE if rule.get('ignore_case') else 0)
+            regex = re.compile(rule['regex'].encode(), flags) if rule.get('regex') else None
+            if not rule.get('literals'):
+                if regex is not None:
+                    self._regex_rules.append((rule, regex))
+                continue
+            for literal in rule['literals']:
+                literal = literal.encode()
+                targets[literal.lower() if self.fold_case else literal].append((rule, literal, regex))
+        # The pattern matches the longest literal at a position; shorter ones there are its prefixes
+        self._targets = {key: [target for prefix in targets if key.startswith(prefix) for target in targets[prefix]]
+                         for key in targets}
+        self._pattern = literal_pattern(targets) if targets else None
+        self._regex_pattern = combined_pattern(rule for rule, _ in self._regex_rules) if self._regex_rules else None
+
+    def _literal_matches(self, data):
+        """(position, end, rule) of every literal rule match, in position order."""
+        buffer = data.lower() if self.fold_case else data
+        search = self._pattern.search
+        match = search(buffer)
+        while match:
+            position = match.start()
+            for rule, literal, regex in self._targets[match.group()]:
+                if regex is not None:
+                    found = regex.match(data, position)
+                    if not found:
+                        continue
+                    end = found.end()
+                elif self.fold_case and not rule.get('ignore_case') and not data.startswith(literal, position):
+                    continue
+                else:
+                    # Markers: show the rest of the line
+                    end = data.find(b'\n', position)
+                    end = len(data) if end == -1 else end
+                yield position, end, rule
+            match = search(buffer, position + 1)
+
+    def _regex_matches(self, data):
+        """(position, end, rule) of every match of a rule without literals, in position order."""
+        search = self._regex_pattern.search
+        match = search(data)
+        while match:
+            position = match.start()
+            for rule, regex in self._regex_rules:
+                found = regex.match(data, position)
+                if found and found.end() > position:
+                    yield position, found.end(), rule
+            match = search(data, position + 1)
+
+    def scan(self, data):
+        """Return the findings in raw file content: dicts with rule, category, line and excerpt."""
+        findings = []
+        sources = []
+        if self._pattern is not None:
+            sources.append(self._literal_matches(data))
+        if self._regex_pattern is not None:
+            sources.append(self._regex_matches(data))
+        line, line_start = 1, 0
+        seen = set()
+        for position, end, rule in heapq.merge(*sources, key=lambda found: found[0]):
+            line += data.count(b'\n', line_start, position)
+            line_start = position
+            if (rule.get('max_line') and line > rule['max_line']) or (rule.get('first_only') and rule['name'] in seen):
+                continue
+            seen.add(rule['name'])
+            excerpt = data[position:min(end, position + EXCERPT_LENGTH)].decode('utf-8', 'replace').strip()
+            findings.append({
+                'rule': rule['name'],
+                'category': rule['category'],
+                'line': line,
+                'excerpt': redact(excerpt) if rule.get('redact') else excerpt,
+            })
+        return findings
+
+def load_rules(rules_file, base_rules=CONTENT_RULES):
+    """
+    Load content rules from a JSON file (a list of rules) on top of the base rules.
+
+    A rule with the name of a base rule replaces it; {"name": ..., "enabled": false}
+    disables one.
+
+    Raises:
+        ValueError: If the file does not contain a list of valid rules.
+    """
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        loaded = json.load(f)
+    if not isinstance(loaded, list):
+        raise ValueError(f"{rules_file}: expected a JSON list of rules")
+
+    rules = {rule['name']: rule for rule in base_rules}
+    for rule in loaded:
+        if not isinstance(rule, dict) or not rule.get('name'):
+            raise ValueError(f"{rules_file}: every rule needs a name: {rule}")
+        if rule.get('enabled', True):
+            literals = rule.get('literals', [])
+            if not isinstance(literals, list) or not all(isinstance(literal, str) and literal for literal in literals):
+                raise ValueError(f"{rules_file}: rule {rule['name']} needs a list of non-empty literals")
+            if not literals and not rule.get('regex'):
+                raise ValueError(f"{rules_file}: rule {rule['name']} needs literals or a regex")
+            try:
+                re.compile(rule.get('regex') or '')
+                if not literals:
+                    combined_pattern([rule])
+            except re.error as e:
+                raise ValueError(f"{rules_file}: rule {rule['name']} has an invalid regex: {e}")
+            rule.setdefault('category', 'custom')
+        rules[rule['name']] = rule
+    return list(rules.values())
+
+def analyze_project(base_dir, max_depth=None, script_name=None, output_file=None, stats_depth=1, scanner=None, exclude_dirs=(), manifest=None, shard_writer=None):
+    """
+    Analyze the project structure, file contents, code statistics and content findings (with a scanner).
+
+    With a manifest list, a manifest_entry of every file is appended to it. With
+    a ShardWriter, the section of every file is handed to it as soon as the file
+    is read, and the project structure keeps only the file names (None as content),
+    so the contents are never all held in memory.
+    """
+    if stats_depth < 1:
+        raise ValueError(f"stats_depth must be >= 1, got: {stats_depth}")
     project_structure = {'dirs': [], 'files': {}}
     all_dependencies = set()
     file_count = 0
@@ -196,6 +617,8 @@ def analyze_project(base_dir, max_depth=None, script_name=None, output_file=None
     language_stats = defaultdict(int)
     file_types = defaultdict(int)
     config_files = {}
+    code_stats = {'total': Counter(), 'languages': defaultdict(Counter), 'directories': defaultdict(Counter)}
+    findings = {}
     
     for root, dirs, files in os.walk(base_dir):
         if max_depth is not None:
@@ -205,10 +628,12 @@ def analyze_project(base_dir, max_depth=None, script_name=None, output_file=None
                 dirs[:] = []
                 continue
         
-        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith('.')]
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith('.')
+                   and os.path.join(root, d) not in exclude_dirs]
         dir_count += len(dirs)
         
         relative_path = os.path.relpath(root, base_dir)
+        stats_directory = '.' if relative_path == '.' else '/'.join(relative_path.split(os.path.sep)[:stats_depth])
         current_level = project_structure
         if relative_path != '.':
             for part in relative_path.split(os.path.sep):
@@ -223,29 +648,57 @@ def analyze_project(base_dir, max_depth=None, script_name=None, output_file=None
                 continue
             file_count += 1
             file_path = os.path.join(root, file)
+            relative_file = os.path.relpath(file_path, base_dir).replace(os.path.sep, '/')
             file_extension = get_file_extension(file_path)
+            language = get_language(file)
             
-            language_stats[file_extension] += 1
+            language_stats[language] += 1
             file_types[file_extension] += 1
             
-            if is_binary(file_path):
+            # The only read of the file: statistics on the bytes, analysis on the decoded text
+            data = None if is_binary_type(file_path) else read_bytes(file_path)
+            binary = data is None or is_binary(file_path, data)
+            if binary:
+                file_stats = Counter(files=1, bytes=len(data) if data is not None else file_size(file_path))
+            else:
+                file_stats = count_lines(data, language)
+                file_stats.update(files=1, bytes=len(data))
+            code_stats['languages'][language].update(file_stats)
+            code_stats['directories'][stats_directory].update(file_stats)
+            
+            if binary:
                 logging.info(f"Skipping binary file content: {file_path}")
                 current_level['files'][file] = "Binary file"
+                if shard_writer is not None:
+                    shard_writer.add(relative_file, "Binary file")
+                if manifest is not None:
+                    manifest.append(manifest_entry(relative_file, data if data is not None else read_bytes(file_path)))
                 continue
             
-            content = read_file(file_path)
+            if scanner is not None:
+                file_findings = scanner.scan(data)
+                if file_findings:
+                    findings[relative_file] = file_findings
+            
+            content = decode_content(file_path, data)
+            if shard_writer is not None:
+                shard_writer.add(relative_file, content if content is not None else "Error reading file: Unable to decode")
             if content is not None:
-                current_level['files'][file] = content
+                current_level['files'][file] = content if shard_writer is None else None
                 file_dependencies = analyze_dependencies(file_path, content)
                 all_dependencies.update(file_dependencies)
                 
-                if file in ['package.json', '.env'] or file.endswith('.tf'):
+                if is_config_file(file):
                     config_files[file] = analyze_config_file(file_path, content)
             else:
                 current_level['files'][file] = "Error reading file: Unable to decode"
+                file_dependencies = ()
+            if manifest is not None:
+                manifest.append(manifest_entry(relative_file, data, file_dependencies))
 
+    code_stats['total'] = sum(code_stats['languages'].values(), Counter())
     logging.info(f"Analyzed {file_count} files in {dir_count} directories")
-    return project_structure, all_dependencies, file_count, dir_count, language_stats, file_types, config_files
+    return project_structure, all_dependencies, file_count, dir_count, language_stats, file_types, config_files, code_stats, findings
 
 def generate_tree_string(structure, prefix="", is_last=True):
     """Generate a string representation of the project tree."""
@@ -265,10 +718,46 @@ def generate_tree_string(structure, prefix="", is_last=True):
     
     return lines
 
-def generate_ai_prompt(project_name, file_count, dir_count, language_stats, dependencies, project_structure, file_types, config_files):
+def format_stats_table(title, rows):
+    """Format (name, Counter) rows of code statistics as an aligned text table."""
+    width = max([len(title)] + [len(name) for name, _ in rows])
+    lines = [f"  {title:<{width}} {'Files':>7} {'Bytes':>13} {'Lines':>10} {'Code':>10} {'Comment':>9} {'Blank':>9}"]
+    for name, stats in rows:
+        lines.append(f"  {name:<{width}} {stats['files']:>7,} {stats['bytes']:>13,} {stats['lines']:>10,} "
+                     f"{stats['code']:>10,} {stats['comment']:>9,} {stats['blank']:>9,}")
+    return lines
+
+def format_code_stats(code_stats):
+    """Format the per-language and per-directory code statistics, largest first."""
+    def by_code(items):
+        return sorted(items, key=lambda item: (item[1]['code'], item[1]['bytes']), reverse=True)
+
+    lines = format_stats_table('Language', by_code(code_stats['languages'].items()) + [('Total', code_stats['total'])])
+    lines.append("")
+    lines.extend(format_stats_table('Directory', by_code(code_stats['directories'].items())))
+    return "\n".join(lines)
+
+def summarize_findings(findings):
+    """Count content findings per (category, rule), most frequent first."""
+    counts = Counter((finding['category'], finding['rule']) for file_findings in findings.values() for finding in file_findings)
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+def format_findings_summary(findings):
+    """Format the number of findings and files per rule."""
+    files_per_rule = Counter(rule for file_findings in findings.values() for rule in {f['rule'] for f in file_findings})
+    return "\n".join(f"  {category}/{rule}: {count} in {files_per_rule[rule]} files"
+                     for (category, rule), count in summarize_findings(findings))
+
+def generate_ai_prompt(project_name, file_count, dir_count, language_stats, dependencies, project_structure, file_types, config_files, code_stats=None, findings=None):
     """Generate a detailed AI prompt describing the project."""
-    top_languages = sorted(language_stats.items(), key=lambda x: x[1], reverse=True)[:5]
-    language_summary = ", ".join(f"{ext[1:]} ({count} files)" for ext, count in top_languages if ext != '.')
+    if code_stats:
+        # Rank languages by lines of code, not by file count
+        top_languages = sorted(code_stats['languages'].items(), key=lambda x: x[1]['code'], reverse=True)[:5]
+        language_summary = ", ".join(f"{language} ({stats['files']} files, {stats['code']} lines of code)"
+                                     for language, stats in top_languages)
+    else:
+        top_languages = sorted(language_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+        language_summary = ", ".join(f"{language} ({count} files)" for language, count in top_languages)
     
     tree_structure = "\n".join(generate_tree_string(project_structure))
 
@@ -281,9 +770,9 @@ def generate_ai_prompt(project_name, file_count, dir_count, language_stats, depe
         config_summary += f"  Name: {pkg.get('name')}\n"
         config_summary += f"  Version: {pkg.get('version')}\n"
         config_summary += f"  Main: {pkg.get('main')}\n"
-        config_summary += f"  Scripts: {', '.join(pkg.get('scripts', {}).keys())}\n"
-        config_summary += f"  Dependencies: {', '.join(pkg.get('dependencies', {}).keys())}\n"
-        config_summary += f"  Dev Dependencies: {', '.join(pkg.get('devDependencies', {}).keys())}\n"
+        config_summary += f"  Scripts: {', '.join((pkg.get('scripts') or {}).keys())}\n"
+        config_summary += f"  Dependencies: {', '.join((pkg.get('dependencies') or {}).keys())}\n"
+        config_summary += f"  Dev Dependencies: {', '.join((pkg.get('devDependencies') or {}).keys())}\n"
 
     if '.env' in config_files:
         env_vars = config_files['.env']['environment_variables']
@@ -300,6 +789,10 @@ def generate_ai_prompt(project_name, file_count, dir_count, language_stats, depe
             config_summary += f"    Data Sources: {', '.join(tf_config.get('data_sources', []))}\n"
             config_summary += f"    Modules: {', '.join(tf_config.get('modules', []))}\n"
 
+    code_stats_summary = f"\n\nCODE STATISTICS:\n{format_code_stats(code_stats)}" if code_stats else ""
+    if findings:
+        code_stats_summary += f"\n\nCONTENT FINDINGS (secrets are redacted):\n{format_findings_summary(findings)}"
+
     prompt = f"""Analyze the following project in depth:
 
 PROJECT OVERVIEW:
@@ -310,7 +803,7 @@ Main Languages/File Types: {language_summary}
 Key Dependencies: {', '.join(sorted(dependencies)[:20])}
 
 FILE TYPES:
-{file_type_summary}
+{file_type_summary}{code_stats_summary}
 
 CONFIGURATION FILES:{config_summary}
 
@@ -390,15 +883,18 @@ def write_structure(structure, file, indent=""):
                     file.write(f"{indent}    {line}\n")
             file.write(f"{'-'*40}\n")
 
-def write_project_analysis(project_structure, dependencies, output_file, project_name, file_count, dir_count, language_stats, file_types, config_files):
-    """Write the project analysis to a file."""
+def write_project_analysis(project_structure, dependencies, output_file, project_name, file_count, dir_count, language_stats, file_types, config_files, code_stats=None, findings=None, include_contents=True):
+    """Write the project analysis to a file (without the file contents when they are sharded, see write_shards)."""
     try:
         with open(output_file, 'w', encoding='utf-8') as out_file:
-            ai_prompt = generate_ai_prompt(project_name, file_count, dir_count, language_stats, dependencies, project_structure, file_types, config_files)
+            ai_prompt = generate_ai_prompt(project_name, file_count, dir_count, language_stats, dependencies, project_structure, file_types, config_files, code_stats, findings)
             out_file.write(ai_prompt)
             
             out_file.write("\n\nDETAILED PROJECT STRUCTURE:\n\n")
-            write_structure(project_structure, out_file)
+            if include_contents:
+                write_structure(project_structure, out_file)
+            else:
+                out_file.write(f"  File contents are written to shards, see {SHARD_INDEX}\n")
             
             out_file.write("\nPROJECT DEPENDENCIES:\n")
             for dep in sorted(dependencies):
@@ -409,18 +905,429 @@ def write_project_analysis(project_structure, dependencies, output_file, project
                 out_file.write(f"\n{file_name}:\n")
                 for key, value in config_info.items():
                     out_file.write(f"  {key}: {value}\n")
+            
+            if findings:
+                out_file.write("\nCONTENT FINDINGS:\n")
+                for path in sorted(findings):
+                    for finding in findings[path]:
+                        out_file.write(f"  {path}:{finding['line']}  {finding['category']}/{finding['rule']}  {finding['excerpt']}\n")
         
         logging.info(f"Successfully wrote project analysis to {output_file}")
     except Exception as e:
         logging.error(f"Error writing project analysis: {str(e)}")
 
+def parse_size(text):
+    """Parse a size like 4096, 512K, 64M or 1G into bytes."""
+    match = re.fullmatch(r'(\d+)\s*([KMG]?)(?:i?B)?', text.strip(), re.IGNORECASE)
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+def iter_files(structure, prefix=""):
+    """Yield (relative path, content) of every file in the project structure, in write_structure order."""
+    for dir_name in structure['dirs']:
+        yield from iter_files(structure[dir_name], f"{prefix}{dir_name}/")
+    for file_name, file_content in structure['files'].items():
+        yield f"{prefix}{file_name}", file_content
+
+def format_file_section(path, file_content):
+    """The section of one file in sharded output: like write_structure, with the full path as heading."""
+    lines = [f"{path}\n", "  File contents:\n"]
+    if file_content == "Binary file":
+        lines.append(f"    {file_content}\n")
+    elif isinstance(file_content, str):
+        lines.extend(f"    {line}\n" for line in file_content.splitlines())
+    lines.append(f"{'-'*40}\n")
+    return ''.join(lines)
+
+def write_shard(shard_dir, number, sections):
+    """Write one shard of encoded (path, section) pairs; returns its index entries."""
+    name = SHARD_NAME.format(number)
+    entries = {}
+    offset = 0
+    with open(os.path.join(shard_dir, name), 'wb') as f:
+        for path, data in sections:
+            f.write(data)
+            entries[path] = {'shard': name, 'offset': offset, 'length': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+            offset += len(data)
+    return {'name': name, 'size': offset, 'files': len(sections)}, entries
+
+class ShardWriter:
+    """
+    Writes file sections to size-capped shards, and the index of them.
+
+    Sections are encoded as they are added and cut into shards of at most
+    shard_size bytes (a single larger section gets a shard of its own). Every
+    full shard is handed to a pool of writer threads, which write and hash it
+    while the analysis goes on with the next files; at most `workers` shards are
+    in flight, which bounds the memory held for contents. close() writes the
+    last shard and the index, mapping each path to its shard, byte offset,
+    length and SHA-256; the index is replaced atomically.
+    """
+
+    def __init__(self, shard_dir, shard_size=DEFAULT_SHARD_SIZE, workers=DEFAULT_SHARD_WORKERS):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []
+        self.shards = []
+        self.files = {}
+        self.batch = []
+        self.batch_size = 0
+
+    def add(self, path, file_content):
+        """Add the section of one file (see format_file_section)."""
+        data = format_file_section(path, file_content).encode('utf-8', errors='replace')
+        if self.batch and self.batch_size + len(data) > self.shard_size:
+            self._submit()
+        self.batch.append((path, data))
+        self.batch_size += len(data)
+
+    def _submit(self):
+        number = len(self.shards) + len(self.pending)
+        self.pending.append(self.executor.submit(write_shard, self.shard_dir, number, self.batch))
+        self.batch, self.batch_size = [], 0
+        if len(self.pending) >= self.workers:
+            self._collect(self.pending.pop(0))
+
+    def _collect(self, future):
+        shard, entries = future.result()
+        self.shards.append(shard)
+        self.files.update(entries)
+
+    def close(self):
+        """
+        Write the last shard and the index, and remove shards of an earlier, larger run.
+
+        Returns:
+            dict: The index, as written to SHARD_INDEX in shard_dir.
+        """
+        if self.batch:
+            self._submit()
+        try:
+            for future in self.pending:
+                self._collect(future)
+        finally:
+            self.pending = []
+            self.executor.shutdown()
+            self.executor = None
+
+        index = {'version': 1, 'summary': SHARD_SUMMARY, 'shard_size': self.shard_size,
+                 'shards': self.shards, 'files': self.files}
+        fd, tmp_path = tempfile.mkstemp(dir=self.shard_dir, prefix='.index-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, separators=(',', ':'))
+            os.replace(tmp_path, os.path.join(self.shard_dir, SHARD_INDEX))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        number = len(self.shards)
+        while os.path.exists(os.path.join(self.shard_dir, SHARD_NAME.format(number))):
+            os.remove(os.path.join(self.shard_dir, SHARD_NAME.format(number)))
+            number += 1
+
+        logging.info(f"Successfully wrote {len(self.files)} file sections to {len(self.shards)} shards in {self.shard_dir}")
+        return index
+
+def write_shards(project_structure, shard_dir, shard_size=DEFAULT_SHARD_SIZE, workers=DEFAULT_SHARD_WORKERS):
+    """Write the file sections of an analyzed project structure to shards (see ShardWriter)."""
+    writer = ShardWriter(shard_dir, shard_size, workers)
+    for path, file_content in iter_files(project_structure):
+        writer.add(path, file_content)
+    return writer.close()
+
+def load_shard_index(shard_dir):
+    """Load the index of sharded output."""
+    with open(os.path.join(shard_dir, SHARD_INDEX), encoding='utf-8') as f:
+        return json.load(f)
+
+def read_section(shard_dir, path, index=None):
+    """
+    Read the section of one file from sharded output, with a single seek.
+
+    Args:
+        shard_dir (str): Directory written by write_shards.
+        path (str): Path of the file relative to the project, with '/' separators.
+        index (dict): The loaded index, to avoid reloading it for every lookup.
+
+    Returns:
+        bytes: The section, UTF-8 encoded.
+
+    Raises:
+        KeyError: If the path is not in the index.
+        ValueError: If the section does not match its hash (e.g. shards of another run).
+    """
+    entry = (index or load_shard_index(shard_dir))['files'][path]
+    with open(os.path.join(shard_dir, entry['shard']), 'rb') as f:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+    if hashlib.sha256(data).hexdigest() != entry['sha256']:
+        raise ValueError(f"Section of {path} in {entry['shard']} does not match the index")
+    return data
+
+def write_json_analysis(output_file, project_name, file_count, dir_count, dependencies, file_types, config_files, code_stats, findings):
+    """Write the analysis results, without file contents, as JSON."""
+    analysis = {
+        'project': project_name,
+        'files': file_count,
+        'directories': dir_count,
+        'file_types': dict(file_types),
+        'code_stats': {
+            'total': dict(code_stats['total']),
+            'languages': {language: dict(stats) for language, stats in code_stats['languages'].items()},
+            'directories': {directory: dict(stats) for directory, stats in code_stats['directories'].items()},
+        },
+        'dependencies': sorted(dependencies),
+        'config_files': config_files,
+        'findings': findings,
+        'findings_summary': [{'category': category, 'rule': rule, 'count': count}
+                             for (category, rule), count in summarize_findings(findings)],
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(analysis, f, indent=2, default=str)
+    logging.info(f"Successfully wrote JSON analysis to {output_file}")
+
+def hash_bytes(data):
+    """Content hash of the manifests."""
+    return hashlib.blake2b(data, digest_size=MANIFEST_HASH_SIZE).hexdigest()
+
+def dependency_hash(dependencies):
+    """Hash of a dependency set, independent of its order; NO_DEPENDENCIES for an empty set."""
+    if not dependencies:
+        return NO_DEPENDENCIES
+    return hash_bytes('\n'.join(sorted(dependencies)).encode('utf-8'))
+
+def manifest_entry(path, data, dependencies=()):
+    """Manifest fields of a file: [path, size, content hash, dependency set hash] (hash None if unreadable)."""
+    if data is None:
+        return [path, 0, None, NO_DEPENDENCIES]
+    return [path, len(data), hash_bytes(data), dependency_hash(dependencies)]
+
+def write_manifest(manifest_file, base_dir, project_name, entries):
+    """Write the manifest of a run: a header line, then the entries sorted by path."""
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        header = {'manifest': MANIFEST_VERSION, 'project': project_name, 'root': base_dir, 'files': len(entries)}
+        f.write(json.dumps(header) + '\n')
+        for entry in sorted(entries):
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    logging.info(f"Successfully wrote manifest of {len(entries)} files to {manifest_file}")
+
+def read_manifest(manifest_file):
+    """
+    Open a manifest.
+
+    Returns:
+        tuple: The header and an iterator over the (path, size, content hash,
+        dependency set hash) entries, which raises ValueError if they are not
+        sorted by path.
+    """
+    f = open(manifest_file, encoding='utf-8')
+    try:
+        header = json.loads(f.readline() or '{}')
+    except json.JSONDecodeError:
+        header = {}
+    if header.get('manifest') != MANIFEST_VERSION:
+        f.close()
+        raise ValueError(f"{manifest_file} is not a version {MANIFEST_VERSION} manifest")
+
+    def entries():
+        with f:
+            previous = None
+            for line in f:
+                path, size, content_hash, deps_hash = json.loads(line)
+                if previous is not None and path <= previous:
+                    raise ValueError(f"{manifest_file} is not sorted by path at {path}")
+                previous = path
+                yield path, size, content_hash, deps_hash
+
+    return header, entries()
+
+def file_details(root, path):
+    """Re-read a file of a manifest: (content hash, dependencies, configuration), or None if it is gone."""
+    file_path = os.path.join(root, *path.split('/'))
+    data = read_bytes(file_path)
+    if data is None:
+        return None
+    binary = is_binary_type(file_path) or is_binary(file_path, data)
+    content = None if binary else decode_content(file_path, data)
+    if content is None:
+        return hash_bytes(data), set(), {}
+    config = analyze_config_file(file_path, content) if is_config_file(os.path.basename(file_path)) else {}
+    return hash_bytes(data), analyze_dependencies(file_path, content), config
+
+def config_delta(old, new):
+    """Changes between two analyze_config_file results, e.g. ['environment_variables: +API_KEY, -DEBUG']."""
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        kind = after if after is not None else before
+        if isinstance(kind, dict):
+            before, after = before or {}, after or {}
+            items = ([f"+{name}" for name in sorted(set(after) - set(before))]
+                     + [f"-{name}" for name in sorted(set(before) - set(after))]
+                     + [f"~{name}" for name in sorted(set(before) & set(after)) if before[name] != after[name]])
+            changes.append(f"{key}: {', '.join(items)}")
+        elif isinstance(kind, list):
+            before, after = set(before or ()), set(after or ())
+            items = [f"+{item}" for item in sorted(after - before)] + [f"-{item}" for item in sorted(before - after)]
+            if items:
+                changes.append(f"{key}: {', '.join(items)}")
+        else:
+            changes.append(f"{key}: {before} -> {after}")
+    return changes
+
+def diff_manifests(old_file, new_file):
+    """
+    Compare the manifests of two runs.
+
+    The entries are merged in a single pass over both sorted manifests. Only
+    files whose dependency hash differs, and configuration files whose content
+    differs, are re-read from the roots recorded in the manifests, to report
+    their dependency and configuration deltas.
+
+    Returns:
+        dict: Added, removed and changed paths, dependency deltas
+        ({path: {'added': [...], 'removed': [...]}}), configuration deltas
+        ({path: [change, ...]}), and the paths that could not be re-read or
+        changed since their manifest was written.
+    """
+    old_header, old_entries = read_manifest(old_file)
+    new_header, new_entries = read_manifest(new_file)
+    added, removed, changed = [], [], []
+    reopen = []
+    old, new = next(old_entries, None), next(new_entries, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            removed.append(old[0])
+            if old[3] != NO_DEPENDENCIES or is_config_file(old[0].rsplit('/', 1)[-1]):
+                reopen.append((old, None))
+            old = next(old_entries, None)
+        elif old is None or new[0] < old[0]:
+            added.append(new[0])
+            if new[3] != NO_DEPENDENCIES or is_config_file(new[0].rsplit('/', 1)[-1]):
+                reopen.append((None, new))
+            new = next(new_entries, None)
+        else:
+            if old[1:] != new[1:]:
+                changed.append(new[0])
+                if old[3] != new[3] or (old[2] != new[2] and is_config_file(new[0].rsplit('/', 1)[-1])):
+                    reopen.append((old, new))
+            old, new = next(old_entries, None), next(new_entries, None)
+
+    dependencies, config, unavailable, stale = {}, {}, [], []
+    for old, new in reopen:
+        details = []
+        for entry, header in ((old, old_header), (new, new_header)):
+            if entry is None:
+                details.append((None, set(), {}))
+                continue
+            found = file_details(header['root'], entry[0])
+            if found is None:
+                unavailable.append(f"{header['root']}/{entry[0]}")
+                found = (None, set(), {})
+            elif found[0] != entry[2]:
+                stale.append(f"{header['root']}/{entry[0]}")
+            details.append(found)
+        path = (new or old)[0]
+        (_, old_dependencies, old_config), (_, new_dependencies, new_config) = details
+        if old_dependencies != new_dependencies:
+            dependencies[path] = {'added': sorted(new_dependencies - old_dependencies),
+                                  'removed': sorted(old_dependencies - new_dependencies)}
+        config_changes = config_delta(old_config, new_config)
+        if config_changes:
+            config[path] = config_changes
+
+    return {'old': old_header, 'new': new_header, 'added': added, 'removed': removed, 'changed': changed,
+            'dependencies': dependencies, 'config': config, 'unavailable': unavailable, 'stale': stale}
+
+def format_manifest_diff(diff):
+    """Format the result of diff_manifests as a text report."""
+    lines = [f"Comparing {diff['old'].get('root')} ({diff['old'].get('files')} files) "
+             f"with {diff['new'].get('root')} ({diff['new'].get('files')} files)",
+             f"Added: {len(diff['added'])}, removed: {len(diff['removed'])}, changed: {len(diff['changed'])}"]
+    for title, marker, paths in (("ADDED FILES", '+', diff['added']), ("REMOVED FILES", '-', diff['removed']),
+                                 ("CHANGED FILES", '~', diff['changed'])):
+        if paths:
+            lines.append(f"\n{title}:")
+            lines.extend(f"  {marker} {path}" for path in paths)
+    if diff['dependencies']:
+        lines.append("\nDEPENDENCY CHANGES:")
+        for path, delta in sorted(diff['dependencies'].items()):
+            items = [f"+{name}" for name in delta['added']] + [f"-{name}" for name in delta['removed']]
+            lines.append(f"  {path}: {', '.join(items)}")
+    if diff['config']:
+        lines.append("\nCONFIGURATION CHANGES:")
+        for path, changes in sorted(diff['config'].items()):
+            lines.append(f"  {path}:")
+            lines.extend(f"    {change}" for change in changes)
+    for title, paths in (("Could not be re-read", diff['unavailable']), ("Changed since the manifest was written", diff['stale'])):
+        if paths:
+            lines.append(f"\n{title}:")
+            lines.extend(f"  {path}" for path in paths)
+    return '\n'.join(lines) + '\n'
+
+def positive_int(text):
+    """Parse a command line value that must be an integer >= 1."""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be an integer >= 1, got: {text}")
+    return value
+
 def main():
     parser = argparse.ArgumentParser(description="Project Structure and Dependency Analyzer")
     parser.add_argument("project_dir", nargs="?", default=".", help="Project directory to analyze (default: current directory)")
     parser.add_argument("-o", "--output", help="Output file name (default: project_name_analysis.txt)")
     parser.add_argument("-d", "--depth", type=int, help="Maximum depth for directory analysis")
+    parser.add_argument("--stats-depth", type=positive_int, default=1, help="Directory depth of the per-directory code statistics (default: 1)")
+    parser.add_argument("--json-output", help="Also write the analysis (without file contents) as JSON to this file")
+    parser.add_argument("--rules", help="JSON file with content scanner rules added to (or replacing) the built-in ones")
+    parser.add_argument("--no-scan", action="store_true", help="Do not scan file contents for secrets, IPs, markers and licenses")
+    parser.add_argument("--shard-dir", help="Write a summary plus size-capped shards of the file contents, with an index, to this directory")
+    parser.add_argument("--shard-size", type=parse_size, default=DEFAULT_SHARD_SIZE, help="Maximum size of a shard, e.g. 512K or 64M (default: 64M)")
+    parser.add_argument("--workers", type=positive_int, default=DEFAULT_SHARD_WORKERS, help=f"Threads writing shards (default: {DEFAULT_SHARD_WORKERS})")
+    parser.add_argument("--get-section", metavar="PATH", help="Print the section of one file from the shards in --shard-dir and exit")
+    parser.add_argument("--manifest", help="Also write a manifest (path, size, content hash, dependency set hash of every file) to this file")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Compare two manifests, print the changes and exit")
     args = parser.parse_args()
 
+    if args.diff:
+        try:
+            diff = diff_manifests(*args.diff)
+        except (OSError, ValueError) as e:
+            parser.error(f"Unable to compare manifests: {e}")
+        sys.stdout.write(format_manifest_diff(diff))
+        if args.json_output:
+            with open(args.json_output, 'w', encoding='utf-8') as f:
+                json.dump(diff, f, indent=2, default=str)
+        return
+
+    if args.get_section:
+        if not args.shard_dir:
+            parser.error("--get-section requires --shard-dir")
+        try:
+            sys.stdout.buffer.write(read_section(args.shard_dir, args.get_section))
+        except KeyError:
+            parser.error(f"No section for {args.get_section} in {args.shard_dir}")
+        except (OSError, ValueError) as e:
+            parser.error(f"Unable to read section: {e}")
+        return
+
+    scanner = None
+    if not args.no_scan:
+        try:
+            scanner = ContentScanner(load_rules(args.rules) if args.rules else CONTENT_RULES)
+        except (OSError, ValueError) as e:
+            parser.error(f"Unable to load rules: {e}")
+
     base_directory = os.path.abspath(args.project_dir)
     project_name = os.path.basename(base_directory)
     
@@ -429,24 +1336,47 @@ def main():
     else:
         output_filename = f"{project_name}_analysis.txt"
     
+    if args.output and args.shard_dir:
+        parser.error("-o cannot be combined with --shard-dir (the summary is written to the shard directory)")
+
     script_name = os.path.basename(__file__)
+    shard_writer = None
+    if args.shard_dir:
+        summary_filename = os.path.join(args.shard_dir, SHARD_SUMMARY)
+        exclude_dirs = {os.path.abspath(args.shard_dir)}
+        shard_writer = ShardWriter(args.shard_dir, args.shard_size, args.workers)
+    else:
+        summary_filename = output_filename
+        exclude_dirs = set()
+    manifest = [] if args.manifest else None
     
     try:
         logging.info(f"Starting analysis of project: {base_directory}")
-        project_structure, dependencies, file_count, dir_count, language_stats, file_types, config_files = analyze_project(base_directory, args.depth, script_name, output_filename)
-        write_project_analysis(project_structure, dependencies, output_filename, project_name, file_count, dir_count, language_stats, file_types, config_files)
-        logging.info(f"Project analysis has been written to: {output_filename}")
+        project_structure, dependencies, file_count, dir_count, language_stats, file_types, config_files, code_stats, findings = analyze_project(base_directory, args.depth, script_name, output_filename, args.stats_depth, scanner, exclude_dirs, manifest, shard_writer)
+        write_project_analysis(project_structure, dependencies, summary_filename, project_name, file_count, dir_count, language_stats, file_types, config_files, code_stats, findings, not args.shard_dir)
+        if shard_writer:
+            shard_writer.close()
+        if args.manifest:
+            write_manifest(args.manifest, base_directory, project_name, manifest)
+        if args.json_output:
+            write_json_analysis(args.json_output, project_name, file_count, dir_count, dependencies, file_types, config_files, code_stats, findings)
+        logging.info(f"Project analysis has been written to: {args.shard_dir or output_filename}")
         logging.info(f"Total files analyzed: {file_count}")
         logging.info(f"Total directories analyzed: {dir_count}")
         logging.info("File types found:")
         for ext, count in sorted(file_types.items(), key=lambda x: x[1], reverse=True):
             logging.info(f"  {ext}: {count}")
+        logging.info(f"Code statistics:\n{format_code_stats(code_stats)}")
+        if findings:
+            logging.info(f"Content findings:\n{format_findings_summary(findings)}")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {str(e)}")
         logging.info("The script will attempt to save partial results.")
         try:
-            write_project_analysis(project_structure, dependencies, output_filename, project_name, file_count, dir_count, language_stats, file_types, config_files)
-            logging.info(f"Partial analysis has been written to: {output_filename}")
+            write_project_analysis(project_structure, dependencies, summary_filename, project_name, file_count, dir_count, language_stats, file_types, config_files, include_contents=not args.shard_dir)
+            logging.info(f"Partial analysis has been written to: {summary_filename}")
+            if shard_writer and shard_writer.executor is not None:
+                shard_writer.close()
         except Exception as write_error:
             logging.error(f"Failed to write partial results: {str(write_error)}")
 
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Whitelist Drift and Coverage Analyzer
+
+Compares the IP ranges actually present in the manifests of every environment
+with the desired state declared in ENV_CONFIG of whitelist_update.py.
+
+For each environment an interval index (sorted, merged ranges per address family)
+is built from the manifests under its path. The report then lists:
+- missing: desired ranges not covered by the manifests (coverage gaps)
+- unexpected: ranges in the manifests that ENV_CONFIG does not declare
+- baseline-only / lower-only: ranges present in the baseline environment (prod)
+  but in none of the lower environments, and vice versa
+
+Usage:
+    ./whitelist_drift.py [--config path/to/whitelist_update.py] [--base-dir DIR]
+                         [--path env=dir ...] [--baseline prod] [--json report.json]
+
+Examples:
+    # Compare all environments declared in ENV_CONFIG
+    ./whitelist_drift.py --base-dir ~/repos/k8s-manifests
+
+    # Point an environment at a different directory and keep a JSON report
+    ./whitelist_drift.py --path prod=pt-bdo-tp-prod/b2c-eshop-prod --json drift.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from ipaddress import ip_address, summarize_address_range
+from typing import Dict, List, Tuple
+
+from ip_extractor import build_interval_index, extract_ip_addresses, find_yaml_files
+
+DEFAULT_CONFIG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'Kubernetes Ingress Whitelist IP Updater',
+    'whitelist_update.py'
+)
+
+# Order matters: everything before the baseline counts as a lower environment
+ENV_ORDER = ['dev', 'stage', 'preprod', 'prod']
+
+IntervalIndex = Dict[int, List[Tuple[int, int]]]
+
+def load_env_config(config_path: str) -> Dict[str, Dict]:
+    """Load ENV_CONFIG from a whitelist_update.py file without running its CLI."""
+    spec = importlib.util.spec_from_file_location('whitelist_update', config_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ENV_CONFIG
+
+def subtract_intervals(left: List[Tuple[int, int]], right: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Return the parts of `left` not covered by `right`. Both inputs must be sorted and merged.
+
+    A single two-pointer sweep, linear in len(left) + len(right).
+    """
+    result = []
+    j = 0
+    for start, end in left:
+        while j < len(right) and right[j][1] < start:
+            j += 1
+        k = j
+        while k < len(right) and right[k][0] <= end:
+            if right[k][0] > start:
+                result.append((start, right[k][0] - 1))
+            start = max(start, right[k][1] + 1)
+            if start > end:
+                break
+            k += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+def union_indexes(indexes: List[IntervalIndex]) -> IntervalIndex:
+    """Merge several interval indexes into one."""
+    merged: IntervalIndex = {4: [], 6: []}
+    for version in merged:
+        intervals = sorted(interval for index in indexes for interval in index[version])
+        for start, end in intervals:
+            if merged[version] and start <= merged[version][-1][1] + 1:
+                if end > merged[version][-1][1]:
+                    merged[version][-1] = (merged[version][-1][0], end)
+            else:
+                merged[version].append((start, end))
+    return merged
+
+def difference(left: IntervalIndex, right: IntervalIndex) -> IntervalIndex:
+    """Per address family set difference of two interval indexes."""
+    return {version: subtract_intervals(left[version], right[version]) for version in left}
+
+def to_cidrs(index: IntervalIndex) -> List[str]:
+    """Render an interval index as the minimal list of CIDR blocks, IPv4 first."""
+    cidrs = []
+    for version in (4, 6):
+        for start, end in index[version]:
+            first = ip_address(start) if version == 4 else ip_address(start.to_bytes(16, 'big'))
+            last = ip_address(end) if version == 4 else ip_address(end.to_bytes(16, 'big'))
+            cidrs.extend(str(net) for net in summarize_address_range(first, last))
+    return cidrs
+
+def scan_environment(path: str) -> Tuple[IntervalIndex, int]:
+    """Build the interval index of all ranges found in the manifests under `path`."""
+    files = find_yaml_files([path], prefixes=None)
+    found = set()
+    for file in files:
+        found.update(extract_ip_addresses(file))
+    return build_interval_index(found), len(files)
+
+def analyze(env_config: Dict[str, Dict], env_paths: Dict[str, str], baseline: str) -> Dict:
+    """Compute desired-vs-actual drift per environment and baseline-vs-lower differences."""
+    report = {'environments': {}, 'baseline': baseline}
+    actual: Dict[str, IntervalIndex] = {}
+
+    for env in sorted(env_paths, key=lambda e: ENV_ORDER.index(e) if e in ENV_ORDER else len(ENV_ORDER)):
+        path = env_paths[env]
+        if not os.path.isdir(path):
+            report['environments'][env] = {'path': path, 'error': 'directory not found'}
+            continue
+        actual[env], file_count = scan_environment(path)
+        desired = build_interval_index(env_config.get(env, {}).get('ips', []))
+        report['environments'][env] = {
+            'path': path,
+            'files': file_count,
+            'missing': to_cidrs(difference(desired, actual[env])),
+            'unexpected': to_cidrs(difference(actual[env], desired)),
+        }
+
+    if baseline in actual:
+        lower = [env for env in actual if env != baseline and
+                 (baseline not in ENV_ORDER or env not in ENV_ORDER or ENV_ORDER.index(env) < ENV_ORDER.index(baseline))]
+        lower_index = union_indexes([actual[env] for env in lower])
+        report['lower_environments'] = lower
+        report['baseline_only'] = to_cidrs(difference(actual[baseline], lower_index))
+        report['lower_only'] = to_cidrs(difference(lower_index, actual[baseline]))
+
+    return report
+
+def print_report(report: Dict) -> None:
+    """Print the drift report in a human readable form."""
+    print("\n=== Whitelist Drift Report ===")
+    for env, result in report['environments'].items():
+        print(f"\n{env.upper()} ({result['path']})")
+        if 'error' in result:
+            print(f"  × {result['error']}")
+            continue
+        print(f"  Files scanned: {result['files']}")
+        print(f"  Missing (desired, not in manifests): {len(result['missing'])}")
+        for cidr in result['missing']:
+            print(f"    - {cidr}")
+        print(f"  Unexpected (in manifests, not desired): {len(result['unexpected'])}")
+        for cidr in result['unexpected']:
+            print(f"    + {cidr}")
+
+    if 'baseline_only' in report:
+        baseline = report['baseline'].upper()
+        lower = ', '.join(env.upper() for env in report['lower_environments']) or 'none'
+        print(f"\n=== {baseline} vs lower environments ({lower}) ===")
+        print(f"Only in {baseline}: {len(report['baseline_only'])}")
+        for cidr in report['baseline_only']:
+            print(f"  • {cidr}")
+        print(f"Only in lower environments: {len(report['lower_only'])}")
+        for cidr in report['lower_only']:
+            print(f"  • {cidr}")
+
+def main():
+    """Parse arguments, run the analysis and print or save the report."""
+    parser = argparse.ArgumentParser(
+        description='Compare manifest whitelists with the desired ENV_CONFIG across environments',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Path to whitelist_update.py holding ENV_CONFIG')
+    parser.add_argument('--base-dir', default='.', help='Directory the ENV_CONFIG paths are relative to')
+    parser.add_argument('--path', action='append', default=[], metavar='ENV=DIR',
+                        help='Override the manifest directory of an environment (repeatable)')
+    parser.add_argument('--baseline', default='prod', help='Environment compared against the lower ones (default: prod)')
+    parser.add_argument('--json', help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    env_config = load_env_config(args.config)
+    env_paths = {env: os.path.join(args.base_dir, config['path']) for env, config in env_config.items()}
+    for override in args.path:
+        env, sep, path = override.partition('=')
+        if not sep:
+            parser.error(f"--path expects ENV=DIR, got: {override}")
+        env_paths[env] = path
+
+    started = time.perf_counter()
+    report = analyze(env_config, env_paths, args.baseline)
+    elapsed = time.perf_counter() - started
+
+    print_report(report)
+    print(f"\nAnalysis took {elapsed:.3f}s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"JSON report written to {args.json}")
+
+    has_drift = any(result.get('missing') or result.get('unexpected') for result in report['environments'].values())
+    sys.exit(1 if has_drift else 0)
+
+if __name__ == "__main__":
+    main()